@@ -0,0 +1,109 @@
+"""Artist discovery: genre, fee range and availability for a booker's date.
+
+``?genre=afrobeats,highlife`` reads the matching artists from the genre
+inverted index (``ArtistGenre``), within the fee range of
+``?min_fee=``/``?max_fee=`` when given; without a genre the fee range uses
+the ``base_fee`` index. ``?date=`` (a day in the site's timezone) or
+``?start=``/``?end=`` drop artists with an overlapping non-cancelled event
+in one NOT EXISTS anti-join on the ``(artist, date_time, ends_at)`` index.
+
+Results are ranked by how many of the requested genres an artist has, then
+by fee, cheapest first.
+"""
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from events.models import Event
+from musicapp.tags import names
+
+from .models import Artist, ArtistGenre
+
+
+def _fee(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({'error': f"{name} must be a number"})
+    field = Artist._meta.get_field('base_fee')
+    try:
+        if not value.is_finite():
+            raise DjangoValidationError('not finite')
+        # Bounds the range scan by what the column can hold, as SQLite would overflow a huge value
+        for validator in field.validators:
+            validator(value)
+    except DjangoValidationError:
+        raise ValidationError({'error': f"{name} must be a number with at most {field.max_digits} digits, "
+                                        f"{field.decimal_places} after the point"})
+    return value
+
+
+def _aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def window(params):
+    """``(start, end)`` of the period the artist must be free, None when not asked."""
+    if params.get('date'):
+        try:
+            day = parse_date(params['date'])
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({'error': "date must be YYYY-MM-DD"})
+        start = _aware(datetime.datetime.combine(day, datetime.time.min))
+        return start, _aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+    if params.get('start') or params.get('end'):
+        try:
+            start, end = parse_datetime(params.get('start', '')), parse_datetime(params.get('end', ''))
+        except ValueError:
+            start = end = None
+        if start is None or end is None or end <= start:
+            raise ValidationError({'error': "start and end must be ISO 8601 datetimes with start before end"})
+        return _aware(start), _aware(end)
+    return None
+
+
+def busy(start, end):
+    """Events of the outer artist that overlap ``[start, end)``."""
+    return Event.objects.filter(
+        artist=OuterRef('pk'), date_time__lt=end, ends_at__gt=start
+    ).exclude(status='cancelled')
+
+
+def discover(params):
+    """Ranked queryset of the artists matching the discovery ``params``."""
+    artists = Artist.objects.all()
+    ordering = ['base_fee', 'pk']
+
+    min_fee, max_fee = _fee(params, 'min_fee'), _fee(params, 'max_fee')
+    fees = {}
+    if min_fee is not None:
+        fees['base_fee__gte'] = min_fee
+    if max_fee is not None:
+        fees['base_fee__lte'] = max_fee
+    artists = artists.filter(**fees)
+
+    genres = sorted(names(','.join(params.getlist('genre')).split(',')))
+    if genres:
+        # The fee range narrows the index scan of the genres, not just the artists it finds
+        artists = artists.filter(pk__in=ArtistGenre.objects.filter(name__in=genres, **fees).values('artist'))
+        if len(genres) > 1:
+            matched = ArtistGenre.objects.filter(artist=OuterRef('pk'), name__in=genres).values('artist').annotate(
+                total=Count('pk')
+            ).values('total')
+            artists = artists.annotate(matched_genres=Subquery(matched, output_field=IntegerField()))
+            ordering.insert(0, '-matched_genres')
+
+    period = window(params)
+    if period:
+        artists = artists.filter(~Exists(busy(*period)))
+    return artists.order_by(*ordering)
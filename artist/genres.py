@@ -0,0 +1,16 @@
+"""Genre inverted index of artists.
+
+``Artist.genres`` stays a JSON list for reading, and every save mirrors it
+into ``ArtistGenre`` rows with the names normalized and the artist's fee, so
+discovery finds the artists of a genre in a fee range with one scan of the
+``(name, base_fee, artist)`` index.
+"""
+from musicapp import tags
+
+from .models import ArtistGenre
+
+
+def sync(artists):
+    """Make the genre rows of ``artists`` match their ``genres`` lists and fees."""
+    tags.sync(ArtistGenre, 'artist', {artist.pk: tags.names(artist.genres) for artist in artists},
+              copied={artist.pk: {'base_fee': artist.base_fee} for artist in artists})
@@ -0,0 +1,106 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from django.utils import timezone
+
+from artist import discovery, genres
+from artist.models import Artist
+from events.models import Event
+from musicapp import tags
+from musicapp.benchmarking import create_users, scratch_database, timer
+from venue.models import Venue
+
+INSERT_BATCH = 10000
+GENRES = [
+    'afrobeats', 'highlife', 'fuji', 'juju', 'apala', 'amapiano', 'gospel', 'hip hop', 'r&b', 'reggae',
+    'dancehall', 'jazz', 'soul', 'afro-fusion', 'alte', 'street pop', 'makossa', 'soukous', 'rock', 'classical',
+]
+QUERIES = {
+    'afrobeats under 500k, free': 'genre=afrobeats&max_fee=500000',
+    'two genres ranked, free': 'genre=afrobeats,highlife&max_fee=500000',
+    'fee range only, free': 'min_fee=200000&max_fee=250000',
+}
+
+
+class Command(BaseCommand):
+    help = "Time artist discovery queries over many artists and events, against a JSON genre scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=50000)
+        parser.add_argument('--events-per-artist', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=10, help="Searches timed per query.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['artists'], options['events_per_artist'], options['repeat'])
+
+    def run(self, count, events_per_artist, repeat):
+        rng = random.Random(0)
+        saturday = timezone.localdate() + timedelta(days=(5 - timezone.localdate().weekday()) % 7 + 7)
+        with timer() as seeded:
+            users = create_users(count)
+            venue = Venue.objects.create(owner=users[0], name='Bench Arena', address='1 Bench Road', city='Lagos',
+                                         country='Nigeria', capacity=1000)
+            for start in range(0, count, INSERT_BATCH):
+                artists = Artist.objects.bulk_create(
+                    Artist(user=user, name=f'Artist {i}', genres=rng.sample(GENRES, rng.randint(1, 3)),
+                           base_fee=Decimal(rng.randrange(50, 2000) * 1000))
+                    for i, user in enumerate(users[start:start + INSERT_BATCH], start)
+                )
+                genres.sync(artists)
+                events = []
+                for artist in artists:
+                    for _ in range(events_per_artist):
+                        # A tenth of the shows fall on the Saturday being searched
+                        day = saturday if rng.random() < 0.1 else saturday + timedelta(days=rng.randint(1, 90))
+                        begins = timezone.make_aware(datetime.combine(day, time(rng.randint(12, 22))))
+                        events.append(Event(
+                            artist=artist, venue=venue, title='Bench Night', description='Benchmark event',
+                            date_time=begins, ends_at=begins + timedelta(minutes=120), duration=120,
+                            ticket_price=Decimal('5000.00'), total_tickets=100, available_tickets=100,
+                            status='published',
+                        ))
+                Event.objects.bulk_create(events)
+        self.stdout.write(f"seeded:      {count} artists, {count * events_per_artist} events "
+                          f"in {seeded['elapsed']:.1f}s")
+
+        self.stdout.write(f"{'query':<30} {'matches':>8} {'JSON scan':>11} {'indexed':>10}")
+        for label, query in QUERIES.items():
+            params = QueryDict(f'{query}&date={saturday.isoformat()}')
+            indexed, (total, page) = self.measure(lambda: discovery.discover(params), repeat)
+            scan, (_, scan_page) = self.measure(lambda: self.json_scan(params), repeat)
+            if scan_page != page:
+                self.stderr.write(self.style.ERROR(f"{label}: the two searches return different pages"))
+            self.stdout.write(f"{label:<30} {total:>8} {scan * 1000:>8.1f} ms {indexed * 1000:>7.1f} ms")
+
+    def json_scan(self, params):
+        """The same search with the genre read from the JSON column of every artist."""
+        wanted = sorted(tags.names(params['genre'].split(','))) if params.get('genre') else []
+        artists = Artist.objects.all()
+        if wanted:
+            placeholders = ', '.join(['%s'] * len(wanted))
+            artists = artists.extra(where=[
+                f"EXISTS (SELECT 1 FROM json_each(artist_artist.genres) WHERE lower(value) IN ({placeholders}))"
+            ], params=wanted)
+        rest = params.copy()
+        rest.pop('genre', None)
+        indexed = discovery.discover(rest)
+        ordering = ['base_fee', 'pk']
+        if len(wanted) > 1:
+            matched = ', '.join(['%s'] * len(wanted))
+            artists = artists.extra(select={'matched_genres': (
+                f"SELECT COUNT(*) FROM json_each(artist_artist.genres) WHERE lower(value) IN ({matched})"
+            )}, select_params=wanted)
+            ordering.insert(0, '-matched_genres')
+        return artists.filter(pk__in=indexed.values('pk')).order_by(*ordering)
+
+    def measure(self, search, repeat):
+        """Time the total and the first page of 20, the same queries the endpoint runs."""
+        with timer() as elapsed:
+            for _ in range(repeat):
+                total = search().count()
+                page = list(search().values_list('pk', flat=True)[:20])
+        return elapsed['elapsed'] / repeat, (total, page)
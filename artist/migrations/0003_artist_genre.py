@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-18 14:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of musicapp.tags.names as of this migration, so it keeps running whatever the app code becomes
+def names(genres):
+    normalized = (str(name).strip().casefold()[:100] for name in genres or ())
+    return {name for name in normalized if name}
+
+
+def fill_genres(apps, schema_editor):
+    Artist = apps.get_model('artist', 'Artist')
+    ArtistGenre = apps.get_model('artist', 'ArtistGenre')
+    ArtistGenre.objects.bulk_create(
+        (ArtistGenre(artist_id=pk, name=name, base_fee=base_fee)
+         for pk, genres, base_fee in Artist.objects.values_list('pk', 'genres', 'base_fee').iterator()
+         for name in names(genres)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artist', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('base_fee', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['base_fee', 'id'], name='artist_base_fee'),
+        ),
+        migrations.AddField(
+            model_name='artistgenre',
+            name='artist',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='genre_rows', to='artist.artist'),
+        ),
+        migrations.AddIndex(
+            model_name='artistgenre',
+            index=models.Index(fields=['name', 'base_fee', 'artist'], name='artist_genre_name_fee'),
+        ),
+        migrations.AddConstraint(
+            model_name='artistgenre',
+            constraint=models.UniqueConstraint(fields=('artist', 'name'), name='artist_genre_unique_name'),
+        ),
+        migrations.RunPython(fill_genres, migrations.RunPython.noop),
+    ]
@@ -16,5 +16,38 @@ class Artist(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [  # Fee range filter and order of artist discovery
+            models.Index(fields=['base_fee', 'id'], name='artist_base_fee'),
+        ]
+
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'genres', 'base_fee'} & set(update_fields):
+            from .genres import sync
+            sync([self])
+
+
+class ArtistGenre(models.Model):
+    """One genre of an artist, normalized from ``Artist.genres`` as an inverted index for discovery.
+
+    The artist's fee is copied along so a genre and fee range is one range scan.
+    """
+    artist = models.ForeignKey(Artist, on_delete=models.CASCADE, related_name='genre_rows')
+    name = models.CharField(max_length=100)
+    base_fee = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['artist', 'name'], name='artist_genre_unique_name'),
+        ]
+        indexes = [
+            models.Index(fields=['name', 'base_fee', 'artist'], name='artist_genre_name_fee'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} of artist {self.artist_id}"
@@ -1,18 +1,25 @@
 from rest_framework import serializers
 from .models import Artist
 from authentication.serializers import CustomUserSerializer
+from musicapp.flat import FlatReader
+from musicapp.sparse import SparseFieldsMixin
 
 
-class ArtistSerializer(serializers.ModelSerializer):
+class ArtistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = CustomUserSerializer(read_only=True)
 
     class Meta:
         model = Artist
         fields = '__all__'
+        empty_list_fields = ['genres', 'social_media', 'portfolio_links']
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['genres'] = instance.genres or []
-        representation['social_media'] = instance.social_media or []
-        representation['portfolio_links'] = instance.portfolio_links or []
+        for field in self.Meta.empty_list_fields:
+            if field in representation:  # Unless left out by ?fields=
+                representation[field] = representation[field] or []
         return representation
+
+
+class ArtistReader(FlatReader):
+    serializer_class = ArtistSerializer
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.utils import timezone
+
+from musicapp.testing import BudgetTestCase, seed_catalogue
+
+
+class ArtistQueryBudgetTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue()
+        cls.owner = cls.data['owners'][0]
+
+    def test_list(self):
+        self.assertBudget('/api/artist/', max_queries=3, max_seconds=0.2)
+
+    def test_retrieve(self):
+        self.assertBudget(f'/api/artist/{self.owner.artist_profile.pk}/', max_queries=2, max_seconds=0.1,
+                          paginated=False)
+
+    def test_my_profile(self):
+        self.assertBudget('/api/artist/my_profile/', max_queries=1, max_seconds=0.1, user=self.owner,
+                          paginated=False)
+        response, _, _ = self.request('/api/artist/my_profile/', self.owner)
+        self.assertEqual(response.json()['id'], self.owner.artist_profile.pk)
+        response, _, _ = self.request('/api/artist/my_profile/', self.data['customer'])
+        self.assertEqual(response.status_code, 404)
+
+    def test_retrieve_sparse_fields(self):
+        response, _, _ = self.request(f'/api/artist/{self.owner.artist_profile.pk}/', fields='name')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {'name': self.owner.artist_profile.name})
+
+
+class ArtistDiscoveryTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from decimal import Decimal
+
+        cls.data = seed_catalogue(owners=5, bookings_per_event=0)
+        cls.artists = [owner.artist_profile for owner in cls.data['owners']]
+        profiles = [
+            (['Afrobeats', 'Highlife'], '450000.00'), (['afrobeats'], '300000.00'), (['highlife'], '200000.00'),
+            (['afrobeats'], '900000.00'), (['Fuji'], '100000.00'),
+        ]
+        for artist, (genres, fee) in zip(cls.artists, profiles):
+            artist.genres, artist.base_fee = genres, Decimal(fee)
+            artist.save()
+        cls.first_show = cls.artists[1].events.order_by('date_time').first()
+
+    def ids(self, **params):
+        response, _, _ = self.request('/api/artist/discover/', **params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_genre_and_fee(self):
+        self.assertEqual(self.ids(genre='AFROBEATS', max_fee='500000'), [self.artists[1].pk, self.artists[0].pk])
+
+    def test_fee_changes_reach_the_genre_index(self):
+        from decimal import Decimal
+
+        artist = self.artists[1]
+        artist.base_fee = Decimal('600000.00')
+        artist.save(update_fields=['base_fee'])
+        self.assertEqual(self.ids(genre='afrobeats', max_fee='500000'), [self.artists[0].pk])
+
+    def test_ranked_by_matched_genres(self):
+        response, _, _ = self.request('/api/artist/discover/', genre='afrobeats,highlife')
+        results = response.json()['results']
+        self.assertEqual([item['id'] for item in results],
+                         [self.artists[0].pk, self.artists[2].pk, self.artists[1].pk, self.artists[3].pk])
+        self.assertEqual(results[0]['matched_genres'], 2)
+
+    def test_overlapping_events_exclude_artists(self):
+        day = timezone.localtime(self.first_show.date_time).date().isoformat()
+        self.assertNotIn(self.artists[1].pk, self.ids(genre='afrobeats', date=day))
+        self.first_show.status = 'cancelled'
+        self.first_show.save()
+        self.assertIn(self.artists[1].pk, self.ids(genre='afrobeats', date=day))
+
+    def test_window_edges_do_not_overlap(self):
+        start = self.first_show.date_time
+        self.assertIn(self.artists[1].pk, self.ids(start=(start - timedelta(hours=2)).isoformat(),
+                                                   end=start.isoformat()))
+        self.assertIn(self.artists[1].pk, self.ids(start=self.first_show.ends_at.isoformat(),
+                                                   end=(self.first_show.ends_at + timedelta(hours=1)).isoformat()))
+        self.assertNotIn(self.artists[1].pk, self.ids(start=(start + timedelta(minutes=119)).isoformat(),
+                                                      end=(start + timedelta(hours=3)).isoformat()))
+
+    def test_invalid_parameters(self):
+        for params in ({'max_fee': 'cheap'}, {'max_fee': 'NaN'}, {'min_fee': '-Infinity'}, {'max_fee': '1e999999'},
+                       {'max_fee': '123456789.00'}, {'min_fee': '1.005'}, {'date': 'Saturday'}, {'date': '2024-13-45'},
+                       {'start': '2026-01-02T00:00', 'end': '2026-01-01'}):
+            response, _, _ = self.request('/api/artist/discover/', **params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_genre_rows_follow_the_list(self):
+        from .models import ArtistGenre
+
+        artist = self.artists[0]
+        kept = ArtistGenre.objects.get(artist=artist, name='afrobeats').pk
+        artist.genres = [' AFROBEATS ', 'Juju', 'juju']
+        artist.save()
+        rows = ArtistGenre.objects.filter(artist=artist)
+        self.assertEqual(sorted(rows.values_list('name', 'base_fee')),
+                         [('afrobeats', artist.base_fee), ('juju', artist.base_fee)])
+        self.assertEqual(rows.get(name='afrobeats').pk, kept)
+
+    def test_budget(self):
+        self.assertBudget('/api/artist/discover/', max_queries=2, max_seconds=0.2, genre='afrobeats,highlife',
+                          max_fee='500000', date='2030-01-01')
@@ -23,16 +23,20 @@ urlpatterns = [
         'post': 'create'
     }), name='artist-list-create'),
 
+    path('api/artist/discover/', ArtistViewSet.as_view({
+        'get': 'discover'
+    }), name='artist-discover'),
+
+    path('api/artist/my_profile/', ArtistViewSet.as_view({
+        'get': 'my_profile'
+    }), name='artist-my-profile'),
+
     path('api/artist/<int:pk>/', ArtistViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
         'delete': 'destroy'
     }), name='artist-detail'),
 
-    path('api/artist/<int:pk>/my_profile/', ArtistViewSet.as_view({
-        'get': 'my_profile'
-    }), name='artist-my-profile'),
-
     path('api/artist/<int:pk>/verify/', ArtistViewSet.as_view({
         'post': 'verify'
     }), name='artist-verify'),
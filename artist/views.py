@@ -6,14 +6,14 @@ from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from .models import Artist
-from rest_framework.pagination import PageNumberPagination
-from .serializers import ArtistSerializer
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from . import discovery
+from musicapp.pagination import StandardResultsSetPagination
+from .serializers import ArtistSerializer, ArtistReader
+from musicapp.prefetch import optimize
+from musicapp.response_cache import cached_response
+from musicapp.conditional import conditional, user_version
+from musicapp.single_flight import single_flight
+from django.db.models import Count, Max
 
 
 class ArtistViewSet(viewsets.ViewSet):
@@ -24,12 +24,33 @@ class ArtistViewSet(viewsets.ViewSet):
         operation_summary="Get a list of all artists",
         responses={200: ArtistSerializer(many=True)}
     )
+    @conditional(lambda self, request: artist_list_validators(Artist.objects.all()), tags=('artist', 'user'))
+    @cached_response('artist', 'user')
     def list(self, request):
-        artists = Artist.objects.all()
+        reader = ArtistReader(request)
+        paginator = StandardResultsSetPagination()
+        rows = paginator.paginate_queryset(reader.rows(Artist.objects.order_by('pk')), request)
+        return paginator.get_paginated_response(reader.render(rows))
+
+    @swagger_auto_schema(
+        operation_summary="Find artists by ?genre=, ?min_fee=/?max_fee= and free on ?date= or ?start=/?end=",
+        responses={200: ArtistSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    @cached_response('artist', 'event', 'user')
+    def discover(self, request):
+        artists = discovery.discover(request.query_params)
+        reader = ArtistReader(request)
+        ranked = 'matched_genres' in artists.query.annotations
         paginator = StandardResultsSetPagination()
-        artists = paginator.paginate_queryset(artists, request)
-        serializer = ArtistSerializer(artists, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        rows = paginator.paginate_queryset(
+            artists.values_list(*reader.lookups, *(['matched_genres'] if ranked else [])), request
+        )
+        items = reader.render(rows)
+        if ranked:
+            for item, row in zip(items, rows):
+                item['matched_genres'] = row[len(reader.lookups)]
+        return paginator.get_paginated_response(items)
 
     @swagger_auto_schema(
         operation_summary="Get a specific artist by ID",
@@ -38,10 +59,12 @@ class ArtistViewSet(viewsets.ViewSet):
             404: "Artist not found"
         }
     )
+    @conditional(lambda self, request, pk=None: artist_validators(pk))
+    @single_flight
     def retrieve(self, request, pk=None):
-        queryset = Artist.objects.all()
+        queryset = optimize(Artist.objects.all(), ArtistSerializer, request)
         artist = get_object_or_404(queryset, pk=pk)
-        serializer = ArtistSerializer(artist)
+        serializer = ArtistSerializer(artist, context={'request': request})
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -71,7 +94,7 @@ class ArtistViewSet(viewsets.ViewSet):
         }
     )
     def update(self, request, pk=None):
-        artist = get_object_or_404(Artist, pk=pk)
+        artist = get_object_or_404(optimize(Artist.objects.all(), ArtistSerializer), pk=pk)
 
         # Check if the user owns this artist profile
         if artist.user != request.user:
@@ -95,7 +118,7 @@ class ArtistViewSet(viewsets.ViewSet):
         }
     )
     def partial_update(self, request, pk=None):
-        artist = get_object_or_404(Artist, pk=pk)
+        artist = get_object_or_404(optimize(Artist.objects.all(), ArtistSerializer), pk=pk)
 
         # Check if the user owns this artist profile
         if artist.user != request.user:
@@ -137,8 +160,8 @@ class ArtistViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_profile(self, request):  # Get the logged-in user's artist profile
         try:
-            artist = Artist.objects.get(user=request.user)
-            serializer = ArtistSerializer(artist)
+            artist = optimize(Artist.objects.all(), ArtistSerializer, request).get(user=request.user)
+            serializer = ArtistSerializer(artist, context={'request': request})
             return Response(serializer.data)
         except Artist.DoesNotExist:
             return Response(
@@ -155,8 +178,18 @@ class ArtistViewSet(viewsets.ViewSet):
     )
     @action(detail=True, methods=['post'])
     def verify(self, request, pk=None):  # Admin action to verify an artist
-        artist = get_object_or_404(Artist, pk=pk)
+        artist = get_object_or_404(optimize(Artist.objects.all(), ArtistSerializer), pk=pk)
         artist.is_verified = True
         artist.save()
         serializer = ArtistSerializer(artist)
         return Response(serializer.data)
+
+
+def artist_validators(pk):
+    updated_at = Artist.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    return None if updated_at is None else ((updated_at, user_version()), updated_at)
+
+
+def artist_list_validators(artists):
+    totals = artists.aggregate(count=Count('pk'), last=Max('pk'), updated=Max('updated_at'))
+    return (sorted(totals.items()), user_version()), totals['updated']
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        from musicapp.response_cache import invalidate_on_change
+        # Only artists and venue owners are embedded in catalog responses, and logins save every user
+        invalidate_on_change(self.get_model('CustomUser'), 'user', condition=_in_catalog)
+
+
+def _in_catalog(user):
+    return hasattr(user, 'artist_profile') or user.venues.exists()
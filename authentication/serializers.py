@@ -2,9 +2,10 @@ from rest_framework import serializers
 from .models import CustomUser
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django_countries.serializer_fields import CountryField
+from musicapp.sparse import SparseFieldsMixin
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     country = CountryField()
     password = serializers.CharField(write_only=True, min_length=8)
 
@@ -0,0 +1,15 @@
+from musicapp.testing import BudgetTestCase, seed_catalogue
+
+
+class UserQueryBudgetTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=60, events_per_venue=0)
+
+    def test_list(self):
+        self.assertBudget('/api/users/', max_queries=2, max_seconds=0.2, user=self.data['admin'])
+
+    def test_retrieve(self):
+        customer = self.data['customer']
+        self.assertBudget(f'/api/users/{customer.pk}', max_queries=1, max_seconds=0.1, user=customer,
+                          paginated=False)
@@ -5,16 +5,11 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import viewsets, status
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from musicapp.pagination import StandardResultsSetPagination
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import MyTokenObtainPairSerializer
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from musicapp.prefetch import optimize
 
 
 class UserViewSet(viewsets.ViewSet):
@@ -47,10 +42,10 @@ class UserViewSet(viewsets.ViewSet):
         responses={200: CustomUserSerializer(many=True)},
     )
     def list(self, request):
-        users = CustomUser.objects.all()
+        users = optimize(CustomUser.objects.order_by('pk'), CustomUserSerializer, request)
         paginator = StandardResultsSetPagination()
         users = paginator.paginate_queryset(users, request)
-        serializer = CustomUserSerializer(users, many=True)
+        serializer = CustomUserSerializer(users, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(
@@ -61,8 +56,8 @@ class UserViewSet(viewsets.ViewSet):
         },
     )
     def retrieve(self, request, pk=None):
-        user = get_object_or_404(CustomUser, id=pk)
-        serializer = CustomUserSerializer(user)
+        user = get_object_or_404(optimize(CustomUser.objects.all(), CustomUserSerializer, request), id=pk)
+        serializer = CustomUserSerializer(user, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
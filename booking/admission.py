@@ -0,0 +1,203 @@
+"""Waiting room that meters users into booking creation during flash sales.
+
+Each gated event hands out queue tokens with increasing positions. A scheduler
+moves the event's admitted position forward at the gate's rate, and a token may
+book once its position is admitted. Status checks only compare two numbers, so
+polling stays cheap while the booking path runs at a steady concurrency.
+"""
+import secrets
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Least
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import AdmissionGate, AdmissionTicket
+from .services import retry_on_contention
+
+
+class NotAdmitted(Exception):
+    """A gated event was booked without an admitted queue token."""
+
+
+def _status(position, admitted, used):
+    if used:
+        return {'state': 'used', 'position': position, 'ahead': 0}
+    if position <= admitted:
+        return {'state': 'admitted', 'position': position, 'ahead': 0}
+    return {'state': 'waiting', 'position': position, 'ahead': position - admitted - 1}
+
+
+class DatabaseAdmissionQueue:
+    """Queue kept in the AdmissionGate/AdmissionTicket tables, shared by every worker."""
+
+    def open(self, event_id, rate):
+        AdmissionGate.objects.update_or_create(event_id=event_id, defaults={'rate': rate, 'is_open': True})
+
+    def close(self, event_id):
+        AdmissionGate.objects.filter(event_id=event_id).update(is_open=False)
+
+    def is_gated(self, event_id):
+        return AdmissionGate.objects.filter(event_id=event_id, is_open=True).exists()
+
+    def enqueue(self, event_id, user_id):
+        token = secrets.token_urlsafe(24)
+        with transaction.atomic():
+            AdmissionGate.objects.filter(event_id=event_id).update(issued_position=F('issued_position') + 1)
+            position = AdmissionGate.objects.values_list('issued_position', flat=True).get(event_id=event_id)
+            AdmissionTicket.objects.create(token=token, event_id=event_id, user_id=user_id, position=position)
+        return token, position
+
+    def status(self, token):
+        row = AdmissionTicket.objects.filter(token=token).values_list(
+            'position', 'event__admission_gate__admitted_position', 'used_at'
+        ).first()
+        return _status(*row) if row else None
+
+    def _admitted(self, token, event_id, user_id):
+        admitted = AdmissionGate.objects.filter(event_id=OuterRef('event_id')).values('admitted_position')
+        return AdmissionTicket.objects.filter(
+            token=token, event_id=event_id, user_id=user_id, used_at__isnull=True,
+            position__lte=Subquery(admitted),
+        )
+
+    def admits(self, token, event_id, user_id):
+        return self._admitted(token, event_id, user_id).exists()
+
+    def consume(self, token, event_id, user_id):
+        return bool(self._admitted(token, event_id, user_id).update(used_at=timezone.now()))
+
+    def restore(self, token):
+        """Nothing to do, the booking's transaction rolls back the consumed token."""
+
+    def advance(self, seconds):
+        """Admit ``rate * seconds`` more users on every open gate in one statement."""
+        return AdmissionGate.objects.filter(is_open=True).update(
+            admitted_position=Least(F('admitted_position') + F('rate') * seconds, F('issued_position'))
+        )
+
+
+class InProcessAdmissionQueue:
+    """Queue held in memory with its own scheduler thread, for a single worker process.
+
+    Its gates live in the server process, so they are opened with
+    ``PUT /api/events/<id>/queue/`` rather than the ``admission_gate`` command.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gates = {}  # event id -> {'rate', 'issued', 'admitted'}
+        self._tickets = {}  # token -> [event id, user id, position, used]
+        self._scheduler = None
+
+    def open(self, event_id, rate):
+        with self._lock:
+            gate = self._gates.setdefault(event_id, {'issued': 0, 'admitted': 0})
+            gate['rate'] = rate
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._run, daemon=True)
+                self._scheduler.start()
+
+    def close(self, event_id):
+        with self._lock:
+            self._gates.pop(event_id, None)
+
+    def is_gated(self, event_id):
+        return event_id in self._gates
+
+    def enqueue(self, event_id, user_id):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            gate = self._gates[event_id]
+            gate['issued'] += 1
+            self._tickets[token] = [event_id, user_id, gate['issued'], False]
+            return token, gate['issued']
+
+    def status(self, token):
+        ticket = self._tickets.get(token)
+        if ticket is None:
+            return None
+        gate = self._gates.get(ticket[0], {'admitted': ticket[2]})
+        return _status(ticket[2], gate['admitted'], ticket[3])
+
+    def _admits(self, ticket, event_id, user_id):
+        gate = self._gates.get(event_id)
+        return not (ticket is None or gate is None or ticket[3] or ticket[:2] != [event_id, user_id]
+                    or ticket[2] > gate['admitted'])
+
+    def admits(self, token, event_id, user_id):
+        with self._lock:
+            return self._admits(self._tickets.get(token), event_id, user_id)
+
+    def consume(self, token, event_id, user_id):
+        with self._lock:
+            ticket = self._tickets.get(token)
+            if not self._admits(ticket, event_id, user_id):
+                return False
+            ticket[3] = True
+            return True
+
+    def restore(self, token):
+        """Make a consumed token usable again, the booking it was consumed for failed."""
+        with self._lock:
+            if token in self._tickets:
+                self._tickets[token][3] = False
+
+    def advance(self, seconds):
+        with self._lock:
+            for gate in self._gates.values():
+                gate['admitted'] = min(gate['admitted'] + gate['rate'] * seconds, gate['issued'])
+            return len(self._gates)
+
+    def _run(self):
+        while True:
+            time.sleep(1)
+            self.advance(1)
+
+
+@lru_cache(maxsize=None)
+def get_queue():
+    return import_string(settings.ADMISSION_QUEUE_BACKEND)()
+
+
+@retry_on_contention
+def admit_booking(request, events, book):
+    """Run ``book()`` with the request's queue tokens for the gated ``events``, return its result.
+
+    Clients send their tokens in the ``X-Queue-Token`` header, comma separated
+    when a cart covers several gated events. Raises NotAdmitted, consuming
+    nothing, when a gated event has no admitted token. The tokens are consumed
+    in the booking's transaction, so a booking that fails leaves them usable.
+    """
+    queue = get_queue()
+    user_id = request.user.pk
+    tokens = [token.strip() for token in request.headers.get('X-Queue-Token', '').split(',') if token.strip()]
+    chosen = {}
+    for event in events:
+        if queue.is_gated(event.pk):
+            token = next((token for token in tokens if token not in chosen.values()
+                          and queue.admits(token, event.pk, user_id)), None)
+            if token is None:
+                raise NotAdmitted(f"Event #{event.pk} has a waiting room and no admitted token was sent")
+            chosen[event.pk] = token
+    if not chosen:
+        return book()
+
+    consumed = []
+    try:
+        with transaction.atomic():
+            for event_id, token in chosen.items():
+                if not queue.consume(token, event_id, user_id):
+                    # Spent by a concurrent request since the check
+                    raise NotAdmitted(f"The queue token for event #{event_id} was already used")
+                consumed.append(token)
+            return book()
+    except BaseException:
+        for token in consumed:
+            queue.restore(token)
+        raise
@@ -0,0 +1,114 @@
+"""Background fan-out when an event is cancelled.
+
+The event's bookings are walked in primary key order, one short transaction
+per chunk: paid bookings become refunded, unpaid ones failed, and one
+notification per booking goes into the outbox. The job row stores the keyset
+cursor, so progress is visible while it runs and a crashed run resumes where
+it stopped. Each chunk is claimed by moving that cursor with a conditional
+UPDATE, so runs racing on one job never notify a booking twice.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Booking, BookingNotification, CancellationJob, TicketHold
+from .services import retry_on_contention
+
+# Status a booking moves to when its event is cancelled
+CANCELLED_STATUS = {
+    'completed': 'refunded',
+    'pending': 'failed',
+}
+
+
+def enqueue(event):
+    job, created = CancellationJob.objects.get_or_create(
+        event=event, defaults={'total_bookings': lambda: Booking.objects.filter(event=event).count()}
+    )
+    if not created and job.status == 'done':
+        created = _restart(job)
+    if created and settings.CANCELLATION_RUN_IN_PROCESS:
+        transaction.on_commit(lambda: start(job.pk))
+    return job
+
+
+def _restart(job):
+    """Queue a finished job again for what was booked or held since it ran, True when it was.
+
+    An event cancelled, restored and cancelled again takes new bookings in
+    between. They all come after the job's cursor, so the job picks up from
+    there and the bookings it already handled are not notified twice.
+    """
+    later = Booking.objects.filter(event_id=job.event_id, pk__gt=job.last_booking_id)
+    if not later.exists() and not TicketHold.objects.filter(event_id=job.event_id).exists():
+        return False  # Saved again while cancelled, nothing new to do
+    restarted = CancellationJob.objects.filter(pk=job.pk, status='done').update(
+        status='queued', total_bookings=later.count(), processed=0, finished_at=None
+    )
+    job.refresh_from_db()
+    return bool(restarted)
+
+
+def start(job_id):
+    threading.Thread(target=_run_in_thread, args=(job_id,), daemon=True).start()
+
+
+def _run_in_thread(job_id):
+    try:
+        run(job_id)
+    finally:
+        connection.close()
+
+
+@retry_on_contention
+def process_chunk(job, chunk_size):
+    """Handle the next chunk of bookings, returning how many were processed.
+
+    The chunk is claimed by moving the job's cursor on from the position this
+    run last saw. When another run moved it first, nothing is written and the
+    job is reloaded from where that run left it.
+    """
+    cursor = job.last_booking_id
+    claimed = CancellationJob.objects.filter(pk=job.pk, last_booking_id=cursor).exclude(status='done')
+    with transaction.atomic():
+        rows = list(
+            Booking.objects.filter(event_id=job.event_id, pk__gt=cursor)
+            .order_by('pk').values_list('pk', 'user_id', 'payment_status')[:chunk_size]
+        )
+        if rows:
+            moved = claimed.update(status='running', processed=F('processed') + len(rows), last_booking_id=rows[-1][0])
+        else:
+            moved = claimed.update(status='done', finished_at=timezone.now())
+        if not moved:
+            job.refresh_from_db(fields=['status', 'processed', 'last_booking_id'])
+            return 0
+        if not rows:
+            TicketHold.objects.filter(event_id=job.event_id).delete()
+            job.status = 'done'
+            return 0
+        for source, target in CANCELLED_STATUS.items():
+            ids = [pk for pk, _, payment_status in rows if payment_status == source]
+            if ids:
+                Booking.objects.filter(pk__in=ids, payment_status=source).update(payment_status=target)
+        title = job.event.title
+        BookingNotification.objects.bulk_create(
+            BookingNotification(
+                user_id=user_id, booking_id=pk, kind='event_cancelled',
+                message=f"{title} has been cancelled."
+                        + (" Your payment will be refunded." if payment_status == 'completed' else ""),
+            )
+            for pk, user_id, payment_status in rows
+        )
+    job.last_booking_id = rows[-1][0]
+    return len(rows)
+
+
+def run(job_id, chunk_size=None):
+    """Process the job to the end; concurrent runs of the same job share its chunks."""
+    chunk_size = chunk_size or settings.CANCELLATION_CHUNK_SIZE
+    job = CancellationJob.objects.select_related('event').get(pk=job_id)
+    while job.status != 'done':
+        process_chunk(job, chunk_size)
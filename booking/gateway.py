@@ -0,0 +1,39 @@
+"""Stand-in payment gateway for exercising the callback endpoint offline."""
+import json
+import random
+import uuid
+
+from .payments import sign
+
+
+class FakeGateway:
+    """Produces signed callback batches the way a real gateway would.
+
+    ``duplicate_rate`` re-sends that share of notifications and ``failure_rate``
+    reports that share of payments as failed, both shuffled into the stream.
+    """
+
+    def __init__(self, duplicate_rate=0.1, failure_rate=0.05, seed=None):
+        self.duplicate_rate = duplicate_rate
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+
+    def notifications(self, booking_ids):
+        sent = [
+            {
+                'transaction_id': f"txn_{uuid.UUID(int=self.random.getrandbits(128)).hex}",
+                'booking_id': booking_id,
+                'status': 'failed' if self.random.random() < self.failure_rate else 'completed',
+            }
+            for booking_id in booking_ids
+        ]
+        sent += self.random.sample(sent, int(len(sent) * self.duplicate_rate))
+        self.random.shuffle(sent)
+        return sent
+
+    def batches(self, booking_ids, size=500):
+        """Yield ``(body, signature)`` pairs ready to POST."""
+        notifications = self.notifications(booking_ids)
+        for start in range(0, len(notifications), size):
+            body = json.dumps(notifications[start:start + size]).encode()
+            yield body, sign(body)
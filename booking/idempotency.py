@@ -0,0 +1,96 @@
+"""``Idempotency-Key`` support for booking and payment endpoints.
+
+The first request with a key stores its response, retries with the same key
+replay it without running the view again. A retry that arrives while the first
+request is still running waits for it instead of racing it.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+POLL_INTERVAL = 0.05  # seconds between checks on an in-flight request
+# Responses a client is expected to retry are not stored
+RETRYABLE_STATUS = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """Insert the in-flight record, returning None when it is ours or the existing record."""
+    expires_at = timezone.now() + settings.IDEMPOTENCY_KEY_TTL
+    while True:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(user=user, key=key, request_hash=fingerprint, expires_at=expires_at)
+            return None
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue
+            if record.expires_at <= timezone.now():
+                IdempotencyKey.objects.filter(pk=record.pk).delete()
+                continue
+            return record
+
+
+def _wait(record):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while record is not None and record.status_code is None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def idempotent(view_method):
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = _fingerprint(request)
+        record = _claim(request.user, key, fingerprint)
+        if record is not None:
+            if record.request_hash != fingerprint:
+                return Response(
+                    {"error": "Idempotency-Key was already used for a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            record = _wait(record)
+            if record is None or record.status_code is None:
+                return Response(
+                    {"error": "The original request is still in progress, retry later."},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+        stored = IdempotencyKey.objects.filter(user=request.user, key=key)
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            stored.delete()
+            raise
+        if response.status_code >= 500 or response.status_code in RETRYABLE_STATUS:
+            stored.delete()
+        else:
+            stored.update(status_code=response.status_code, response=response.data)
+        return response
+    return wrapper
+
+
+def purge_expired_keys(now=None):
+    return IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()[0]
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.admission import InProcessAdmissionQueue, get_queue
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Open or close the waiting room in front of an event's booking path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--rate', type=int, default=50, help="Users admitted per second.")
+        parser.add_argument('--close', action='store_true')
+
+    def handle(self, *args, **options):
+        if not Event.objects.filter(pk=options['event_id']).exists():
+            raise CommandError(f"Event {options['event_id']} does not exist")
+        queue = get_queue()
+        if isinstance(queue, InProcessAdmissionQueue):
+            # This command's process would hold the gate, not the server's
+            raise CommandError("The in-process queue lives in the server, open its gates with "
+                               "PUT /api/events/<id>/queue/")
+        if options['close']:
+            queue.close(options['event_id'])
+            self.stdout.write(self.style.SUCCESS(f"Waiting room for event {options['event_id']} closed"))
+        else:
+            queue.open(options['event_id'], options['rate'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Waiting room for event {options['event_id']} admits {options['rate']} users/s"
+            ))
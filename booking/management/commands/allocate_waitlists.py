@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking.models import WaitlistEntry
+from booking.services import allocate_waitlist
+
+
+class Command(BaseCommand):
+    help = "Hand released tickets to waitlisted users in FIFO order."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, allocating every INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            event_ids = (
+                WaitlistEntry.objects.filter(allocated_at__isnull=True)
+                .values_list('event_id', flat=True).distinct()
+            )
+            allocated = sum(allocate_waitlist(event_id) for event_id in event_ids)
+            if options['verbosity'] > 1 or not options['interval']:
+                self.stdout.write(f"Allocated {allocated} waitlist entries")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
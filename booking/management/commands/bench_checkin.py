@@ -0,0 +1,45 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from booking import tickets
+from booking.models import Booking
+from musicapp.benchmarking import create_event, create_users, scratch_database, timer
+
+
+class Command(BaseCommand):
+    help = "Measure bulk door check-in throughput with a share of double scans and forged tokens."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=5000)
+        parser.add_argument('--tickets', type=int, default=2, help="Tickets per booking.")
+        parser.add_argument('--batch', type=int, default=500, help="Tokens per check-in request.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['bookings'], options['tickets'], options['batch'])
+
+    def run(self, bookings, per_booking, batch):
+        users = create_users(1)
+        event = create_event(users[0], total_tickets=bookings * per_booking)
+        Booking.objects.bulk_create(
+            Booking(event=event, user=users[0], tickets=per_booking, total_amount=0, payment_method='card')
+            for _ in range(bookings)
+        )
+        tokens = [token for booking in Booking.objects.filter(event=event) for token in tickets.ticket_tokens(booking)]
+        scans = tokens + random.sample(tokens, len(tokens) // 10) + ['1.1.0.forged'] * (len(tokens) // 100)
+        random.shuffle(scans)
+
+        totals = {'admitted': 0, 'duplicate': 0, 'invalid': 0}
+        with timer() as elapsed:
+            for start in range(0, len(scans), batch):
+                for outcome, found in tickets.check_in(event.pk, scans[start:start + batch]).items():
+                    totals[outcome] += len(found)
+
+        self.stdout.write(f"scans:       {len(scans)}")
+        for outcome, count in totals.items():
+            self.stdout.write(f"{outcome + ':':<12} {count}")
+        self.stdout.write(f"elapsed:     {elapsed['elapsed']:.3f}s")
+        self.stdout.write(f"throughput:  {len(scans) / elapsed['elapsed']:.0f} scans/s")
+        if totals['admitted'] != len(tokens):
+            self.stderr.write(self.style.ERROR("Admitted count does not match the tickets issued"))
@@ -0,0 +1,77 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from booking.models import TicketHold
+from booking.services import sweep_expired_holds
+from events import cards
+from events.models import Event, EventCard
+from musicapp.benchmarking import create_event, create_users, scratch_database, timer
+
+INSERT_BATCH = 10000
+
+
+class Command(BaseCommand):
+    help = "Time sweeping many expired checkout holds back into their events' stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expired', type=int, default=100000, help="Expired holds to sweep.")
+        parser.add_argument('--live', type=int, default=100000, help="Holds still within their TTL.")
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['expired'], options['live'], options['events'], options['batch_size'])
+
+    def run(self, expired, live, events, batch_size):
+        rng = random.Random(0)
+        owner, = create_users(1)
+        template = create_event(owner, total_tickets=1000)
+        Event.objects.bulk_create(
+            Event(artist=template.artist, venue=template.venue, title=f'Night {i}', description='Benchmark event',
+                  date_time=template.date_time + timedelta(days=i + 1), duration=120,
+                  ticket_price=Decimal('5000.00'), total_tickets=1000, available_tickets=1000, status='published')
+            for i in range(events - 1)
+        )
+        cards.rebuild()
+        event_ids = list(Event.objects.values_list('pk', flat=True))
+
+        now = timezone.now()
+        held = {}
+        for start in range(0, expired + live, INSERT_BATCH):
+            holds = []
+            for i in range(start, min(start + INSERT_BATCH, expired + live)):
+                event_id = rng.choice(event_ids)
+                held[event_id] = held.get(event_id, 0) + 1
+                expires_at = now - timedelta(seconds=i + 1) if i < expired else now + timedelta(minutes=10)
+                holds.append(TicketHold(event_id=event_id, user=owner, tickets=1, expires_at=expires_at))
+            TicketHold.objects.bulk_create(holds)
+        for event_id, tickets in held.items():  # The holds' tickets were taken from the stock
+            Event.objects.filter(pk=event_id).update(available_tickets=F('available_tickets') - tickets)
+            EventCard.objects.filter(pk=event_id).update(available_tickets=F('available_tickets') - tickets)
+
+        batches = swept = 0
+        with timer() as elapsed:
+            while True:
+                count = sweep_expired_holds(now=now, batch_size=batch_size)
+                if not count:
+                    break
+                swept += count
+                batches += 1
+
+        stock = Event.objects.aggregate(total=Sum('available_tickets'))['total']
+        expected = events * 1000 - live
+        self.stdout.write(f"expired holds:      {expired}")
+        self.stdout.write(f"live holds:         {live}")
+        self.stdout.write(f"events:             {events}")
+        self.stdout.write(f"swept:              {swept} in {batches} batches of up to {batch_size}")
+        self.stdout.write(f"elapsed:            {elapsed['elapsed']:.3f}s")
+        if swept != expired or stock != expected or TicketHold.objects.count() != live:
+            self.stderr.write(self.style.ERROR(f"Stock mismatch: {stock} tickets left, expected {expected}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every expired hold returned its tickets"))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from booking.models import Booking
+from musicapp.benchmarking import create_event, create_users, scratch_database, timer
+from musicapp.pagination import StandardResultsSetPagination
+
+INSERT_BATCH = 20000
+
+
+class Command(BaseCommand):
+    help = "Compare page-number and keyset pagination of one user's bookings at increasing depth."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5, help="Requests timed per depth.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['rows'], options['page_size'], options['repeat'])
+
+    def run(self, rows, page_size, repeat):
+        users = create_users(1)
+        event = create_event(users[0], total_tickets=1)
+        with timer() as seeded:
+            for start in range(0, rows, INSERT_BATCH):
+                Booking.objects.bulk_create(
+                    Booking(event=event, user=users[0], tickets=1, total_amount=5000, payment_method='card')
+                    for _ in range(min(INSERT_BATCH, rows - start))
+                )
+        self.stdout.write(f"seeded:      {rows} bookings in {seeded['elapsed']:.1f}s")
+
+        bookings = Booking.objects.filter(user=users[0]).order_by('-created_at', '-pk').values_list(
+            'id', 'tickets', 'payment_status', 'created_at'
+        )
+        factory = APIRequestFactory()
+        last_page = (rows + page_size - 1) // page_size
+        self.stdout.write(f"{'page':>10} {'page number':>14} {'cursor':>10}")
+        for page in (1, last_page // 100 or 1, last_page // 2 or 1, last_page):
+            offset = (page - 1) * page_size
+            paginator = StandardResultsSetPagination()
+            if offset:
+                # The cursor a client would hold after walking to this page
+                row = bookings[offset - 1]
+                cursor = paginator.encode_cursor(False, [row[3].isoformat(), row[0]])
+            else:
+                cursor = ''
+            numbered = self.measure(factory.get('/', {'page': page, 'page_size': page_size}), bookings, repeat)
+            keyset = self.measure(factory.get('/', {'cursor': cursor, 'page_size': page_size}), bookings, repeat)
+            if numbered[1] != keyset[1]:
+                self.stderr.write(self.style.ERROR(f"Page {page} differs between the two modes"))
+            self.stdout.write(f"{page:>10} {numbered[0] * 1000:>11.2f} ms {keyset[0] * 1000:>7.2f} ms")
+
+    def measure(self, request, queryset, repeat):
+        with timer() as elapsed:
+            for _ in range(repeat):
+                page = list(StandardResultsSetPagination().paginate_queryset(queryset, Request(request)))
+        return elapsed['elapsed'] / repeat, [row[:4] for row in page]
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+
+from booking.gateway import FakeGateway
+from booking.models import Booking
+from booking.views import PaymentCallbackViewSet
+from musicapp.benchmarking import create_event, create_users, scratch_database, timer
+
+
+class Command(BaseCommand):
+    help = "Replay a burst of fake gateway callbacks through the payment callback endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--callbacks', type=int, default=10000, help="Distinct payments to report.")
+        parser.add_argument('--batch', type=int, default=500, help="Callbacks per request.")
+        parser.add_argument('--duplicate-rate', type=float, default=0.1)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['callbacks'], options['batch'], options['duplicate_rate'])
+
+    def run(self, callbacks, batch, duplicate_rate):
+        users = create_users(1)
+        event = create_event(users[0], total_tickets=callbacks)
+        Booking.objects.bulk_create(
+            Booking(event=event, user=users[0], tickets=1, total_amount=event.ticket_price, payment_method='card')
+            for _ in range(callbacks)
+        )
+        booking_ids = list(Booking.objects.values_list('pk', flat=True))
+        factory = APIRequestFactory()
+        view = PaymentCallbackViewSet.as_view({'post': 'create'})
+        totals = {}
+
+        with timer() as elapsed:
+            for body, signature in FakeGateway(duplicate_rate=duplicate_rate, seed=1).batches(booking_ids, batch):
+                request = factory.post('/api/payments/callbacks/', body, content_type='application/json',
+                                       HTTP_X_GATEWAY_SIGNATURE=signature)
+                for key, count in view(request).data.items():
+                    totals[key] = totals.get(key, 0) + count
+
+        for key, count in totals.items():
+            self.stdout.write(f"{key + ':':<12} {count}")
+        self.stdout.write(f"elapsed:     {elapsed['elapsed']:.3f}s")
+        self.stdout.write(f"throughput:  {totals['received'] / elapsed['elapsed']:.0f} callbacks/s")
+        pending = Booking.objects.filter(payment_status='pending').count()
+        if pending or totals['applied'] != callbacks:
+            self.stderr.write(self.style.ERROR(f"{pending} bookings were left pending"))
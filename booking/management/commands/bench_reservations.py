@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from events.inventory import enable_sharding
+from events.models import Event
+from musicapp.benchmarking import create_event, create_users, scratch_database, timer
+from booking.models import Booking
+from booking.services import SoldOut, create_booking
+
+
+class Command(BaseCommand):
+    help = "Run simultaneous bookers against one event and check that nothing is oversold."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookers', type=int, default=300, help="Concurrent booking threads.")
+        parser.add_argument('--inventory', type=int, default=200, help="Tickets on sale.")
+        parser.add_argument('--tickets', type=int, default=1, help="Tickets per booking.")
+        parser.add_argument('--shards', type=int, default=0, help="Inventory shards for the event.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['bookers'], options['inventory'], options['tickets'], options['shards'])
+
+    def run(self, bookers, inventory, tickets, shards):
+        users = create_users(bookers + 1)
+        event = create_event(users[-1], total_tickets=inventory)
+        if shards:
+            enable_sharding(event.pk, shards)
+            event.refresh_from_db()
+        start = threading.Barrier(bookers)
+        outcomes = {'booked': 0, 'sold_out': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def book(user):
+            start.wait()
+            try:
+                create_booking(event=event, user=user, tickets=tickets, payment_method='card')
+                outcome = 'booked'
+            except SoldOut:
+                outcome = 'sold_out'
+            except OperationalError:
+                outcome = 'errors'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+
+        with timer() as elapsed:
+            with ThreadPoolExecutor(max_workers=bookers) as pool:
+                list(pool.map(book, users[:bookers]))
+
+        event = Event.objects.get(pk=event.pk)
+        sold = sum(Booking.objects.filter(event=event).values_list('tickets', flat=True))
+        left = event.tickets_left()
+        oversold = max(0, sold - inventory)
+        self.stdout.write(f"bookers:            {bookers}")
+        self.stdout.write(f"tickets on sale:    {inventory}")
+        self.stdout.write(f"bookings created:   {outcomes['booked']}")
+        self.stdout.write(f"rejected sold out:  {outcomes['sold_out']}")
+        self.stdout.write(f"lock errors:        {outcomes['errors']}")
+        self.stdout.write(f"tickets sold:       {sold}")
+        self.stdout.write(f"inventory shards:   {shards}")
+        self.stdout.write(f"tickets left:       {left}")
+        self.stdout.write(f"elapsed:            {elapsed['elapsed']:.3f}s")
+        self.stdout.write(f"throughput:         {bookers / elapsed['elapsed']:.1f} attempts/s")
+
+        if oversold or left != inventory - sold:
+            self.stderr.write(self.style.ERROR(f"Inventory mismatch, oversold by {oversold}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No oversell"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from booking.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses past their expiry."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Purged {purge_expired_keys()} expired idempotency keys")
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking.admission import get_queue
+
+
+class Command(BaseCommand):
+    help = "Admit queued users into booking at each waiting room's rate."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tick', type=int, default=1, help="Seconds between admissions.")
+
+    def handle(self, *args, **options):
+        queue = get_queue()
+        while True:
+            started = time.monotonic()
+            queue.advance(options['tick'])
+            time.sleep(max(0, options['tick'] - (time.monotonic() - started)))
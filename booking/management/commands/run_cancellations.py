@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking import cancellation
+from booking.models import CancellationJob
+
+
+class Command(BaseCommand):
+    help = "Process queued or interrupted event cancellation jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, polling for new jobs every INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            for job_id in CancellationJob.objects.exclude(status='done').values_list('pk', flat=True):
+                cancellation.run(job_id, options['chunk_size'])
+                self.stdout.write(f"Finished cancellation job {job_id}")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking.services import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Return the tickets of expired checkout holds to their events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, sweeping every INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            swept = 0
+            while True:
+                count = sweep_expired_holds(batch_size=options['batch_size'])
+                swept += count
+                if count < options['batch_size']:
+                    break
+            if options['verbosity'] > 1 or not options['interval']:
+                self.stdout.write(f"Swept {swept} expired holds")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0005_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='seats',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='tickethold',
+            name='seats',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
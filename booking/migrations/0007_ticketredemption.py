@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 13:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_event_seat_map_event_seat_map_version'),
+        ('booking', '0006_booking_seats_tickethold_seats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket', models.PositiveIntegerField()),
+                ('redeemed_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='booking.booking')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='events.event')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ticketredemption',
+            constraint=models.UniqueConstraint(fields=('booking', 'ticket'), name='ticket_redeemed_once'),
+        ),
+    ]
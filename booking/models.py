@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from events.models import Event
 from django.conf import settings
@@ -18,17 +19,170 @@ class Booking(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS, default='pending')
     payment_method = models.CharField(max_length=50)
-    transaction_id = models.CharField(max_length=100, blank=True)
+    transaction_id = models.CharField(max_length=100, blank=True, db_index=True)
+    seats = models.JSONField(default=list, blank=True)  # Seat numbers for events with a seat map
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [  # Keyset pagination of a user's bookings
+            models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_at'),
+        ]
+
     def __str__(self):
         return f"Booking #{self.id} for {self.event.title}"
 
     def save(self, *args, **kwargs):
-        if not self.pk:  # New booking
+        if not self.pk:  # New booking, inventory is reserved by booking.services
             tickets_int = int(self.tickets)
             self.total_amount = Decimal(tickets_int) * self.event.ticket_price
-            self.event.available_tickets -= self.tickets
-            self.event.save()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class TicketHold(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='holds')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ticket_holds')
+    tickets = models.PositiveIntegerField()
+    seats = models.JSONField(default=list, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Hold #{self.id} of {self.tickets} tickets for event #{self.event_id}"
+
+
+class AdmissionGate(models.Model):
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='admission_gate')
+    rate = models.PositiveIntegerField(help_text="Users admitted to the booking path per second")
+    is_open = models.BooleanField(default=True)
+    issued_position = models.PositiveBigIntegerField(default=0)
+    admitted_position = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Waiting room for event #{self.event_id}"
+
+
+class AdmissionTicket(models.Model):
+    token = models.CharField(max_length=64, unique=True)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='admission_tickets')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='admission_tickets')
+    position = models.PositiveBigIntegerField()
+    used_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Queue position {self.position} for event #{self.event_id}"
+
+
+class WaitlistEntry(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='waitlist_entries')
+    tickets = models.PositiveIntegerField()
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    allocated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'user'], condition=models.Q(allocated_at__isnull=True),
+                name='waitlist_one_waiting_entry_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['event', 'created_at', 'id'], condition=models.Q(allocated_at__isnull=True),
+                name='waitlist_waiting_fifo',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} waiting for {self.tickets} tickets to event #{self.event_id}"
+
+
+class TicketRedemption(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='redemptions')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='redemptions')
+    ticket = models.PositiveIntegerField()  # Index of the ticket within its booking
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['booking', 'ticket'], name='ticket_redeemed_once'),
+        ]
+
+    def __str__(self):
+        return f"Ticket {self.ticket} of booking #{self.booking_id} redeemed"
+
+
+class PaymentNotification(models.Model):
+    transaction_id = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=Booking.PAYMENT_STATUS)
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_id', 'status'], name='payment_notification_once'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_id} {self.status}"
+
+
+class CancellationJob(models.Model):
+    STATUS = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    )
+
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='cancellation_job')
+    status = models.CharField(max_length=20, choices=STATUS, default='queued')
+    total_bookings = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    last_booking_id = models.PositiveBigIntegerField(default=0)  # Keyset cursor into the event's bookings
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Cancellation of event #{self.event_id} ({self.status})"
+
+
+class BookingNotification(models.Model):
+    KINDS = (
+        ('event_cancelled', 'Event cancelled'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    kind = models.CharField(max_length=30, choices=KINDS)
+    message = models.TextField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(sent_at__isnull=True), name='notification_outbox'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # null while the request is in flight
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_unique_per_user'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of user #{self.user_id}"
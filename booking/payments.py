@@ -0,0 +1,81 @@
+"""Batched ingestion of payment gateway callbacks.
+
+The gateway posts JSON lists of ``{"transaction_id", "booking_id", "status"}``
+signed with PAYMENT_WEBHOOK_SECRET. Each (transaction, status) pair is applied
+once: duplicates are found through the PaymentNotification unique index and
+status changes go out as one UPDATE per target status and chunk.
+"""
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+
+from .models import Booking, PaymentNotification
+
+CHUNK_SIZE = 500
+# Target status -> statuses a booking may move from, applied in this order
+TRANSITIONS = {
+    'completed': ('pending', 'failed'),
+    'failed': ('pending',),
+    'refunded': ('completed',),
+}
+
+
+def sign(body):
+    return hmac.new(settings.PAYMENT_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature):
+    return bool(signature) and hmac.compare_digest(sign(body), signature)
+
+
+def ingest(notifications):
+    """Apply a batch of callbacks, returning counts of what happened to them."""
+    result = {'received': len(notifications), 'rejected': 0, 'duplicate': 0, 'applied': 0, 'ignored': 0}
+    batch = {}
+    for notification in notifications:
+        try:
+            key = (str(notification['transaction_id'])[:100], str(notification['status']))
+            booking_id = int(notification['booking_id'])
+        except (KeyError, TypeError, ValueError):
+            result['rejected'] += 1
+            continue
+        if key[1] not in TRANSITIONS or not key[0]:
+            result['rejected'] += 1
+        elif key in batch:
+            result['duplicate'] += 1
+        else:
+            batch[key] = booking_id
+
+    with transaction.atomic():
+        seen = set(PaymentNotification.objects.filter(
+            transaction_id__in={transaction_id for transaction_id, _ in batch}
+        ).values_list('transaction_id', 'status'))
+        fresh = {key: booking_id for key, booking_id in batch.items() if key not in seen}
+        result['duplicate'] += len(batch) - len(fresh)
+        existing = set(Booking.objects.filter(pk__in=set(fresh.values())).values_list('pk', flat=True))
+        PaymentNotification.objects.bulk_create(
+            [PaymentNotification(transaction_id=transaction_id, status=status,
+                                 booking_id=booking_id if booking_id in existing else None)
+             for (transaction_id, status), booking_id in fresh.items()],
+            batch_size=CHUNK_SIZE, ignore_conflicts=True,
+        )
+
+        for target, sources in TRANSITIONS.items():
+            updates = [(booking_id, transaction_id) for (transaction_id, status), booking_id in fresh.items()
+                       if status == target]
+            for start in range(0, len(updates), CHUNK_SIZE):
+                chunk = updates[start:start + CHUNK_SIZE]
+                result['applied'] += Booking.objects.filter(
+                    pk__in=[booking_id for booking_id, _ in chunk], payment_status__in=sources
+                ).update(
+                    payment_status=target,
+                    transaction_id=Case(
+                        *[When(pk=booking_id, then=Value(transaction_id)) for booking_id, transaction_id in chunk],
+                        output_field=models.CharField(),
+                    ),
+                )
+    result['ignored'] = len(fresh) - result['applied']
+    return result
@@ -0,0 +1,69 @@
+"""Receipt rows for single bookings and streaming bulk exports."""
+import csv
+import json
+
+# Receipt key -> Booking lookup it is read from
+RECEIPT_FIELDS = {
+    "booking_id": 'id',
+    "event": 'event__title',
+    "user": 'user__email',
+    "tickets": 'tickets',
+    "total_amount": 'total_amount',
+    "payment_status": 'payment_status',
+    "payment_method": 'payment_method',
+    "transaction_id": 'transaction_id',
+    "booking_date": 'created_at',
+}
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _receipt(values):
+    receipt = dict(zip(RECEIPT_FIELDS, values))
+    receipt["total_amount"] = str(receipt["total_amount"])
+    receipt["booking_date"] = receipt["booking_date"].strftime("%Y-%m-%d %H:%M:%S")
+    return receipt
+
+
+def receipt_data(booking):
+    """Receipt of a booking loaded with its event and user."""
+    return _receipt((
+        booking.id, booking.event.title, booking.user.email, booking.tickets, booking.total_amount,
+        booking.payment_status, booking.payment_method, booking.transaction_id, booking.created_at,
+    ))
+
+
+def iter_receipts(bookings):
+    """Receipts for a Booking queryset from one joined query read in chunks through a cursor."""
+    rows = bookings.order_by('pk').values_list(*RECEIPT_FIELDS.values())
+    for values in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _receipt(values)
+
+
+ROWS_PER_WRITE = 500
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _buffered(lines):
+    """Join lines into larger writes so the response is not sent row by row."""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_csv(receipts):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(RECEIPT_FIELDS)
+    yield from _buffered(writer.writerow(receipt.values()) for receipt in receipts)
+
+
+def stream_jsonl(receipts):
+    yield from _buffered(json.dumps(receipt) + "\n" for receipt in receipts)
@@ -1,18 +1,122 @@
 from rest_framework import serializers
 from events.models import Event
-from .models import Booking
+from .models import Booking, CancellationJob, TicketHold, WaitlistEntry
+from .services import checkout_cart, create_booking, hold_tickets
+from events.seating import labels
+from musicapp.prefetch import optimize
 from events.serializers import EventSerializer
 from authentication.serializers import CustomUserSerializer
+from musicapp.sparse import SparseFieldsMixin
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     event = EventSerializer(read_only=True)
     user = CustomUserSerializer(read_only=True)
     event_id = serializers.PrimaryKeyRelatedField(
         queryset=Event.objects.all(), source='event', write_only=True
     )
+    seat_labels = serializers.SerializerMethodField()
 
     class Meta:
         model = Booking
         fields = '__all__'
-        read_only_fields = ['total_amount', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['total_amount', 'seats', 'created_at', 'updated_at']
+        select_related = {'seat_labels': ['event__venue']}
+        required_columns = ['user']  # Owner checks in the views
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if isinstance(self.instance, Booking):
+            # Stock only moves through the reservation engine, an update keeps the booked tickets
+            for name in ('event_id', 'tickets'):
+                if name in fields:
+                    fields[name].read_only = True
+        return fields
+
+    def get_seat_labels(self, obj):
+        if not obj.seats:
+            return []
+        return labels(obj.event.venue.seat_layout, obj.seats)
+
+    def validate_tickets(self, value):
+        if value < 1:
+            raise serializers.ValidationError("At least one ticket must be booked")
+        return value
+
+    def create(self, validated_data):
+        return create_booking(**validated_data)
+
+
+class CartItemSerializer(serializers.Serializer):
+    event_id = serializers.IntegerField()
+    tickets = serializers.IntegerField(min_value=1)
+
+
+class CartCheckoutSerializer(serializers.Serializer):
+    items = CartItemSerializer(many=True, allow_empty=False)
+    payment_method = serializers.CharField(max_length=50)
+    transaction_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate_items(self, items):
+        quantities = {}
+        for item in items:
+            quantities[item['event_id']] = quantities.get(item['event_id'], 0) + item['tickets']
+        events = optimize(Event.objects.all(), EventSerializer).in_bulk(quantities)
+        missing = sorted(set(quantities) - set(events))
+        if missing:
+            raise serializers.ValidationError(f"Unknown events: {', '.join(map(str, missing))}")
+        return [(events[event_id], tickets) for event_id, tickets in quantities.items()]
+
+    def create(self, validated_data):
+        return checkout_cart(**validated_data)
+
+
+class TicketHoldSerializer(serializers.ModelSerializer):
+    event_id = serializers.PrimaryKeyRelatedField(
+        queryset=Event.objects.all(), source='event', write_only=True
+    )
+
+    class Meta:
+        model = TicketHold
+        fields = ['id', 'event', 'event_id', 'user', 'tickets', 'seats', 'expires_at', 'created_at']
+        read_only_fields = ['event', 'user', 'seats', 'expires_at', 'created_at']
+
+    def validate_tickets(self, value):
+        if value < 1:
+            raise serializers.ValidationError("At least one ticket must be held")
+        return value
+
+    def create(self, validated_data):
+        return hold_tickets(**validated_data)
+
+
+class HoldConfirmSerializer(serializers.Serializer):
+    payment_method = serializers.CharField(max_length=50)
+    transaction_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    event_title = serializers.CharField(source='event.title', read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'event', 'event_title', 'tickets', 'booking', 'allocated_at', 'created_at']
+        read_only_fields = ['event', 'booking', 'allocated_at', 'created_at']
+
+    def validate_tickets(self, value):
+        if value < 1:
+            raise serializers.ValidationError("At least one ticket must be requested")
+        return value
+
+
+class CancellationJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CancellationJob
+        fields = ['event', 'status', 'total_bookings', 'processed', 'progress', 'created_at', 'finished_at']
+
+    def get_progress(self, obj):
+        if obj.status == 'done' or not obj.total_bookings:
+            return 1.0 if obj.status == 'done' else 0.0
+        return round(min(obj.processed / obj.total_bookings, 1.0), 4)
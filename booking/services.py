@@ -0,0 +1,281 @@
+import random
+import time
+from decimal import Decimal
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, Q, Sum, Window
+from django.utils import timezone
+
+from events import cards, inventory, seating
+from events.models import Event
+from .models import Booking, TicketHold, WaitlistEntry
+
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.01  # seconds, doubled on every attempt
+RELEASE_CHUNK_SIZE = 500  # events per bulk release statement
+
+
+class SoldOut(Exception):
+    """The event cannot cover the requested number of tickets."""
+
+
+class EventCancelled(SoldOut):
+    """The event was cancelled, nothing more can be booked for it."""
+
+
+class HoldExpired(Exception):
+    """The hold no longer exists, it was released or swept after its TTL."""
+
+
+def _is_contention(exc):
+    # SQLite reports "database is locked", PostgreSQL serialization failures and deadlocks.
+    if 'locked' in str(exc):
+        return True
+    return getattr(exc.__cause__, 'pgcode', None) in ('40001', '40P01')
+
+
+def retry_on_contention(func):
+    """Re-run ``func`` when the database rejects it because of lock contention.
+
+    Retrying is only safe at the outermost transaction, so inside an atomic block
+    the error is propagated to the caller that owns the transaction.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(MAX_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if (attempt == MAX_RETRIES - 1 or not _is_contention(exc)
+                        or transaction.get_connection().in_atomic_block):
+                    raise
+                time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+    return wrapper
+
+
+def reserve_tickets(event, tickets):
+    """Take ``tickets`` from the event's inventory with a single guarded UPDATE.
+
+    Sharded events claim from their counter shards first, the event row only
+    holds stock the rebalancer has not spread yet. Events with a seat map claim
+    the best block of adjacent seats instead. Returns the claimed seat numbers,
+    empty for general admission.
+    """
+    if event.status == 'cancelled':
+        raise EventCancelled(f"{event.title} has been cancelled")
+    if event.seat_map is not None:
+        seats = seating.claim(event.pk, tickets)
+        if seats is None:
+            raise SoldOut("Not enough adjacent seats available")
+        return seats
+    if event.inventory_shards and inventory.claim(event.pk, event.inventory_shards, tickets):
+        return []
+    updated = Event.objects.filter(pk=event.pk, available_tickets__gte=tickets).exclude(status='cancelled').update(
+        available_tickets=F('available_tickets') - tickets
+    )
+    if not updated:
+        raise SoldOut("Not enough tickets available")
+    cards.adjust_stock({event.pk: -tickets})
+    return []
+
+
+def release_tickets(event, tickets, seats=()):
+    """Give ``tickets`` back to the event's inventory."""
+    if seats:
+        seating.release(event.pk, seats)
+        return
+    if event.inventory_shards and inventory.release(event.pk, event.inventory_shards, tickets):
+        return
+    Event.objects.filter(pk=event.pk).update(
+        available_tickets=F('available_tickets') + tickets
+    )
+    cards.adjust_stock({event.pk: tickets})
+
+
+def release_tickets_bulk(totals):
+    """Give tickets back to many events at once, ``totals`` maps event id to tickets.
+
+    Stock goes back to the event row even for sharded events, the rebalancer
+    spreads it over the shards later. Seated stock is released with the seats.
+    Events getting the same number of tickets back share one UPDATE, so a
+    sweep runs a statement per distinct count and chunk instead of compiling
+    a CASE branch per event.
+    """
+    for tickets, event_ids in cards.by_delta(totals).items():
+        for start in range(0, len(event_ids), RELEASE_CHUNK_SIZE):
+            Event.objects.filter(pk__in=event_ids[start:start + RELEASE_CHUNK_SIZE]).update(
+                available_tickets=F('available_tickets') + tickets
+            )
+    cards.adjust_stock(totals)
+
+
+@retry_on_contention
+def create_booking(*, event, user, tickets, **fields):
+    """Reserve the tickets and insert the booking in one transaction."""
+    with transaction.atomic():
+        seats = reserve_tickets(event, tickets)
+        event.refresh_from_db(fields=['available_tickets', 'inventory_shards'])
+        booking = Booking(event=event, user=user, tickets=tickets, seats=seats, **fields)
+        booking.save()
+    return booking
+
+
+@retry_on_contention
+def checkout_cart(*, user, items, **fields):
+    """Book several events at once, all or nothing.
+
+    ``items`` is a list of ``(event, tickets)`` pairs with the events already
+    loaded, so pricing needs no further queries. Inventory is taken in primary
+    key order so concurrent carts lock events in the same order.
+    """
+    items = sorted(items, key=lambda item: item[0].pk)
+    with transaction.atomic():
+        seats = []
+        for event, tickets in items:
+            try:
+                seats.append(reserve_tickets(event, tickets))
+            except EventCancelled:
+                raise
+            except SoldOut:
+                raise SoldOut(f"Not enough tickets available for {event.title}")
+        bookings = Booking.objects.bulk_create(
+            Booking(
+                event=event, user=user, tickets=tickets, seats=event_seats,
+                total_amount=Decimal(tickets) * event.ticket_price, **fields
+            )
+            for (event, tickets), event_seats in zip(items, seats)
+        )
+        left = dict(Event.objects.filter(pk__in=[event.pk for event, _ in items])
+                    .values_list('pk', 'available_tickets'))
+    for event, _ in items:
+        event.available_tickets = left[event.pk]
+    return bookings
+
+
+@retry_on_contention
+def hold_tickets(*, event, user, tickets, ttl=None):
+    """Reserve tickets for a checkout that has not been paid yet."""
+    ttl = ttl or settings.TICKET_HOLD_TTL
+    with transaction.atomic():
+        seats = reserve_tickets(event, tickets)
+        hold = TicketHold.objects.create(
+            event=event, user=user, tickets=tickets, seats=seats, expires_at=timezone.now() + ttl
+        )
+    return hold
+
+
+@retry_on_contention
+def confirm_hold(hold, **fields):
+    """Turn a live hold into a booking, its tickets are already reserved.
+
+    The booking stays ``pending`` until the payment callback completes it.
+    """
+    with transaction.atomic():
+        if not TicketHold.objects.filter(pk=hold.pk, expires_at__gt=timezone.now()).delete()[0]:
+            raise HoldExpired("The hold has expired")
+        booking = Booking(event=hold.event, user=hold.user, tickets=hold.tickets, seats=hold.seats, **fields)
+        booking.save()
+    return booking
+
+
+@retry_on_contention
+def cancel_hold(hold):
+    """Release a hold before it expires."""
+    with transaction.atomic():
+        if TicketHold.objects.filter(pk=hold.pk).delete()[0]:
+            if hold.seats:
+                seating.release(hold.event_id, hold.seats)
+            else:
+                release_tickets_bulk({hold.event_id: hold.tickets})
+
+
+@retry_on_contention
+def sweep_expired_holds(now=None, batch_size=5000):
+    """Return the tickets of up to ``batch_size`` expired holds, oldest first.
+
+    One SELECT on the ``expires_at`` index, one DELETE and one UPDATE per
+    distinct ticket count and chunk of events, so the cost follows the expired
+    holds and not the number of live ones. Seated holds free their seats with one bitmap swap per event. Returns
+    how many holds were swept.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(
+            TicketHold.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=now).order_by('expires_at')
+            .annotate(seated=ExpressionWrapper(~Q(seats=[]), output_field=BooleanField()))
+            .values_list('pk', 'event_id', 'tickets', 'seated')[:batch_size]
+        )
+        if not expired:
+            return 0
+        totals, seated = {}, []
+        for pk, event_id, tickets, is_seated in expired:
+            if is_seated:
+                seated.append(pk)
+            else:
+                totals[event_id] = totals.get(event_id, 0) + tickets
+        # Only seated holds have their seat list read back, decoding JSON is most of a read
+        seats = {}
+        for event_id, hold_seats in TicketHold.objects.filter(pk__in=seated).values_list('event_id', 'seats'):
+            seats.setdefault(event_id, []).extend(hold_seats)
+        TicketHold.objects.filter(pk__in=[row[0] for row in expired]).delete()
+        release_tickets_bulk(totals)
+        for event_id, event_seats in seats.items():
+            seating.release(event_id, event_seats)
+    return len(expired)
+
+
+@retry_on_contention
+def cancel_booking(booking):
+    """Delete the booking and give its tickets back in the same transaction."""
+    with transaction.atomic():
+        if Booking.objects.filter(pk=booking.pk).delete()[0]:
+            release_tickets(booking.event, booking.tickets, booking.seats)
+    transaction.on_commit(lambda: allocate_waitlist(booking.event_id), robust=True)
+
+
+@retry_on_contention
+def allocate_waitlist(event_id):
+    """Book freed tickets for waitlisted users, first come first served.
+
+    A running sum over the waiting entries picks the longest FIFO prefix that
+    fits the stock in one query, the winners are then reserved one by one,
+    booked and marked in bulk. Returns the number of entries allocated.
+    """
+    with transaction.atomic():
+        event = Event.objects.filter(pk=event_id).exclude(status='cancelled').first()
+        if event is None:
+            return 0
+        queue = WaitlistEntry.objects.filter(event_id=event_id, allocated_at__isnull=True).annotate(
+            running=Window(Sum('tickets'), order_by=[F('created_at').asc(), F('id').asc()])
+        )
+        winners = list(queue.filter(running__lte=event.tickets_left()).order_by('created_at', 'id'))
+        if not winners:
+            return 0
+        # Stock that adds up may still not cover a winner: seats need an adjacent
+        # block and sharded stock is split between the shards and the event row.
+        # Reserve winner by winner and stop at the first that does not fit.
+        seats = []
+        for entry in winners:
+            try:
+                seats.append(reserve_tickets(event, entry.tickets))
+            except SoldOut:
+                break
+        winners = winners[:len(seats)]
+        if not winners:
+            return 0
+        bookings = Booking.objects.bulk_create(
+            Booking(
+                event=event, user_id=entry.user_id, tickets=entry.tickets, seats=entry_seats,
+                total_amount=Decimal(entry.tickets) * event.ticket_price, payment_method='waitlist'
+            )
+            for entry, entry_seats in zip(winners, seats)
+        )
+        now = timezone.now()
+        for entry, booking in zip(winners, bookings):
+            entry.booking = booking
+            entry.allocated_at = now
+        WaitlistEntry.objects.bulk_update(winners, ['booking', 'allocated_at'])
+    return len(winners)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from events.models import Event
+from . import cancellation
+
+
+@receiver(post_save, sender=Event)
+def cancel_event_bookings(sender, instance, **kwargs):
+    if instance.status == 'cancelled':
+        cancellation.enqueue(instance)
@@ -1,3 +1,787 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from events import inventory
+from events.models import Event
+from musicapp.benchmarking import create_event, create_users
+from musicapp.pagination import StandardResultsSetPagination
+from musicapp.prefetch import optimize
+from musicapp.testing import BudgetTestCase, seed_catalogue
+
+from . import cancellation, payments, receipts, tickets
+from .admission import InProcessAdmissionQueue, get_queue
+from .idempotency import purge_expired_keys
+from .models import (
+    Booking, BookingNotification, CancellationJob, IdempotencyKey, TicketHold, TicketRedemption, WaitlistEntry,
+)
+from .serializers import BookingSerializer
+from .services import (
+    EventCancelled, HoldExpired, SoldOut, allocate_waitlist, cancel_booking, cancel_hold, checkout_cart, confirm_hold,
+    create_booking, hold_tickets, release_tickets_bulk, reserve_tickets, sweep_expired_holds,
+)
+
+
+class BookingQueryBudgetTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=15)
+        cls.customer = cls.data['customer']
+        cls.booking = Booking.objects.filter(event__venue__seat_layout__isnull=True).first()
+
+    def test_list(self):
+        self.assertBudget('/api/bookings/', max_queries=3, max_seconds=0.3, user=self.customer)
+
+    def test_retrieve(self):
+        self.assertBudget(f'/api/bookings/{self.booking.pk}/', max_queries=2, max_seconds=0.1,
+                          user=self.customer, paginated=False)
+
+    def test_receipt(self):
+        self.assertBudget(f'/api/bookings/{self.booking.pk}/receipt/', max_queries=1, max_seconds=0.1,
+                          user=self.customer, paginated=False)
+
+    def test_export_csv(self):
+        self.assertBudget('/api/bookings/export/', max_queries=1, max_seconds=0.3, user=self.data['admin'],
+                          paginated=False, event=self.booking.event_id)
+
+    def test_export_jsonl(self):
+        self.assertBudget('/api/bookings/export/', max_queries=1, max_seconds=0.3, user=self.data['admin'],
+                          paginated=False, event=self.booking.event_id, output='jsonl')
+
+    def test_waitlist(self):
+        self.assertBudget('/api/waitlist/', max_queries=2, max_seconds=0.1, user=self.customer)
+
+
+class BookingCursorPaginationTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=4)
+        cls.customer = cls.data['customer']
+
+    def walk(self, response, link):
+        ids = []
+        while True:
+            body = response.json()
+            ids.extend(item['id'] for item in body['results'])
+            if not body[link]:
+                return ids, body
+            response = self.client.get(body[link])
+
+    def test_cursor_walk_matches_page_order(self):
+        listed, _, _ = self.request('/api/bookings/', self.customer, page_size=100)
+        expected = [item['id'] for item in listed.json()['results']]
+        response, sql, _ = self.request('/api/bookings/', self.customer, cursor='', page_size=5)
+        self.assertFalse(any('COUNT(' in query for query in sql))
+        forward, last = self.walk(response, 'next')
+        self.assertEqual(forward, expected)
+
+        backward, first = self.walk(self.client.get(last['previous']), 'previous')
+        self.assertEqual(sorted(backward), sorted(expected[:len(expected) - len(last['results'])]))
+        self.assertIsNone(first['previous'])
+
+    def test_cursor_budget(self):
+        self.assertBudget('/api/bookings/', max_queries=3, max_seconds=0.3, user=self.customer, cursor='')
+
+    def test_requested_count(self):
+        response, _, _ = self.request('/api/bookings/', self.customer, cursor='', count='cached')
+        self.assertEqual(response.json()['count'], self.customer.bookings.count())
+
+    def test_invalid_cursor(self):
+        response, _, _ = self.request('/api/bookings/', self.customer, cursor='not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_values_must_fit_the_ordering(self):
+        paginator = StandardResultsSetPagination()
+        booking = self.customer.bookings.order_by('-created_at', '-pk').first()
+        valid = [booking.created_at.isoformat(), booking.pk]
+        response, _, _ = self.request('/api/bookings/', self.customer, cursor=paginator.encode_cursor(False, valid))
+        self.assertEqual(response.status_code, 200)
+        for position in (['2024-13-45T00:00:00', 1], [valid[0], 'abc'], [{'id': 1}, 1], [[1], 1], [None, 1],
+                         valid[:1], 'abc'):
+            cursor = paginator.encode_cursor(False, position)
+            response, _, _ = self.request('/api/bookings/', self.customer, cursor=cursor)
+            self.assertEqual(response.status_code, 404, position)
+
+
+class ReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(3)
+        cls.event = create_event(cls.users[0], total_tickets=5)
+
+    def test_reserve_never_goes_below_zero(self):
+        reserve_tickets(self.event, 3)
+        with self.assertRaises(SoldOut):
+            reserve_tickets(self.event, 3)
+        reserve_tickets(self.event, 2)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 0)
+
+    def test_booking_takes_its_tickets(self):
+        booking = create_booking(event=self.event, user=self.users[1], tickets=2, payment_method='card')
+        self.assertEqual(booking.event.available_tickets, 3)
+        self.assertEqual(booking.total_amount, 2 * self.event.ticket_price)
+
+    def test_admin_update_keeps_the_booked_tickets(self):
+        booking = create_booking(event=self.event, user=self.users[1], tickets=2, payment_method='card')
+        other = create_event(self.users[0], total_tickets=5)
+        admin = self.users[2]
+        admin.is_staff = True
+        admin.save()
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.put(f'/api/bookings/{booking.pk}/', {
+            'event_id': other.pk, 'tickets': 5, 'payment_method': 'card', 'payment_status': 'completed'
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        booking.refresh_from_db()
+        self.assertEqual((booking.event_id, booking.tickets, booking.payment_status), (self.event.pk, 2, 'completed'))
+        self.assertEqual(Event.objects.get(pk=self.event.pk).available_tickets, 3)
+        self.assertEqual(Event.objects.get(pk=other.pk).available_tickets, 5)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def test_concurrent_bookers_never_oversell(self):
+        bookers = 12
+        users = create_users(bookers + 1)
+        event = create_event(users[-1], total_tickets=5)
+        start = threading.Barrier(bookers)
+        outcomes = []
+
+        def book(user):
+            start.wait()
+            try:
+                # The shared-cache test database reports table locks at once, keep retrying until decided
+                for _ in range(500):
+                    try:
+                        create_booking(event=Event.objects.get(pk=event.pk), user=user, tickets=1,
+                                       payment_method='card')
+                        outcomes.append('booked')
+                        return
+                    except SoldOut:
+                        outcomes.append('sold_out')
+                        return
+                    except OperationalError:
+                        time.sleep(0.005)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(user,)) for user in users[:bookers]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        self.assertEqual(sorted(outcomes), ['booked'] * 5 + ['sold_out'] * (bookers - 5))
+        self.assertEqual(Booking.objects.filter(event=event).count(), 5)
+        self.assertEqual(event.available_tickets, 0)
+
+
+class TicketHoldTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(3)
+        cls.event = create_event(cls.users[0], total_tickets=10)
+
+    def stock(self):
+        return Event.objects.get(pk=self.event.pk).available_tickets
+
+    def test_hold_reserves_until_its_ttl(self):
+        hold = hold_tickets(event=self.event, user=self.users[1], tickets=4, ttl=timedelta(minutes=5))
+        self.assertAlmostEqual(hold.expires_at, timezone.now() + timedelta(minutes=5), delta=timedelta(seconds=5))
+        self.assertEqual(self.stock(), 6)
+        with self.assertRaises(SoldOut):
+            hold_tickets(event=self.event, user=self.users[2], tickets=7)
+
+    def test_confirm_books_the_held_tickets_pending_payment(self):
+        hold = hold_tickets(event=self.event, user=self.users[1], tickets=4)
+        booking = confirm_hold(hold, payment_method='card')
+        self.assertEqual((booking.tickets, booking.payment_status), (4, 'pending'))
+        self.assertEqual(self.stock(), 6)
+        self.assertFalse(TicketHold.objects.exists())
+
+    def test_expired_hold_cannot_be_confirmed(self):
+        hold = hold_tickets(event=self.event, user=self.users[1], tickets=4)
+        TicketHold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(HoldExpired):
+            confirm_hold(hold, payment_method='card')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_cancel_returns_the_tickets_once(self):
+        hold = hold_tickets(event=self.event, user=self.users[1], tickets=4)
+        cancel_hold(hold)
+        cancel_hold(hold)
+        self.assertEqual(self.stock(), 10)
+
+    def test_sweep_returns_only_expired_holds(self):
+        now = timezone.now()
+        for tickets in (1, 2, 3):
+            hold_tickets(event=self.event, user=self.users[1], tickets=tickets)
+        live = hold_tickets(event=self.event, user=self.users[2], tickets=4, ttl=timedelta(hours=1))
+        self.assertEqual(self.stock(), 0)
+
+        later = now + timedelta(minutes=30)
+        self.assertEqual(sweep_expired_holds(now=later, batch_size=2), 2)
+        self.assertEqual(sweep_expired_holds(now=later, batch_size=2), 1)
+        self.assertEqual(sweep_expired_holds(now=later), 0)
+        self.assertEqual(self.stock(), 6)
+        self.assertEqual(list(TicketHold.objects.values_list('pk', flat=True)), [live.pk])
+
+    def test_api_confirm_leaves_the_booking_pending(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.post('/api/holds/', {'event_id': self.event.pk, 'tickets': 2}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        hold_id = response.json()['id']
+
+        response = client.post(f'/api/holds/{hold_id}/confirm/', {'payment_method': 'card'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['payment_status'], 'pending')
+
+        response = client.post(f'/api/holds/{hold_id}/confirm/', {'payment_method': 'card'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class CartCheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(2)
+        cls.events = [create_event(cls.users[0], total_tickets=total) for total in (5, 5, 2)]
+
+    def stock(self):
+        return list(Event.objects.filter(pk__in=[event.pk for event in self.events])
+                    .order_by('pk').values_list('available_tickets', flat=True))
+
+    def test_books_every_event_in_the_cart(self):
+        bookings = checkout_cart(user=self.users[1], items=[(event, 2) for event in self.events],
+                                 payment_method='card')
+        self.assertEqual(sorted(booking.event_id for booking in bookings), [event.pk for event in self.events])
+        self.assertEqual(self.stock(), [3, 3, 0])
+        self.assertEqual([event.available_tickets for event in self.events], [3, 3, 0])
+
+    def test_one_sold_out_event_books_nothing(self):
+        with self.assertRaisesMessage(SoldOut, self.events[2].title):
+            checkout_cart(user=self.users[1], items=[(event, 3) for event in self.events], payment_method='card')
+        self.assertEqual(self.stock(), [5, 5, 2])
+        self.assertFalse(Booking.objects.exists())
+
+    def test_api_merges_items_and_rejects_the_whole_cart(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        first, second, small = self.events
+        response = client.post('/api/bookings/checkout/', {'payment_method': 'card', 'items': [
+            {'event_id': first.pk, 'tickets': 1}, {'event_id': small.pk, 'tickets': 2},
+            {'event_id': first.pk, 'tickets': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(sorted((item['event']['id'], item['tickets']) for item in response.json()),
+                         [(first.pk, 3), (small.pk, 2)])
+
+        response = client.post('/api/bookings/checkout/', {'payment_method': 'card', 'items': [
+            {'event_id': second.pk, 'tickets': 1}, {'event_id': small.pk, 'tickets': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), [2, 5, 0])
+
+        response = client.post('/api/bookings/checkout/', {'payment_method': 'card', 'items': [
+            {'event_id': second.pk, 'tickets': 1}, {'event_id': 0, 'tickets': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+class AdmissionQueueTests(TestCase):
+    backend = 'booking.admission.DatabaseAdmissionQueue'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(4)
+        cls.users[0].is_staff = True
+        cls.users[0].save()
+        cls.event = create_event(cls.users[0], total_tickets=2)
+        cls.other = create_event(cls.users[0], total_tickets=10)
+
+    def setUp(self):
+        self.enterContext(override_settings(ADMISSION_QUEUE_BACKEND=self.backend))
+        # Tests advance the gates themselves
+        self.enterContext(mock.patch.object(InProcessAdmissionQueue, '_run'))
+        get_queue.cache_clear()
+        self.addCleanup(get_queue.cache_clear)
+        self.queue = get_queue()
+        self.client = APIClient()
+        self.open(self.event)
+
+    def open(self, event, user=None, rate=1):
+        self.client.force_authenticate(user or self.users[0])
+        return self.client.put(f'/api/events/{event.pk}/queue/', {'rate': rate}, format='json')
+
+    def join(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.post(f'/api/events/{self.event.pk}/queue/')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['token']
+
+    def book(self, user, token=None, event=None, tickets=1):
+        self.client.force_authenticate(user)
+        headers = {'HTTP_X_QUEUE_TOKEN': token} if token else {}
+        return self.client.post('/api/bookings/', {
+            'event_id': (event or self.event).pk, 'tickets': tickets, 'payment_method': 'card'
+        }, format='json', **headers)
+
+    def states(self, tokens):
+        return [(state['state'], state['ahead']) for state in map(self.queue.status, tokens)]
+
+    def test_users_are_admitted_in_arrival_order(self):
+        tokens = [self.join(user) for user in self.users[1:]]
+        self.assertEqual(self.states(tokens), [('waiting', 0), ('waiting', 1), ('waiting', 2)])
+        self.queue.advance(2)
+        self.assertEqual(self.states(tokens), [('admitted', 0), ('admitted', 0), ('waiting', 0)])
+        self.queue.advance(60)  # Never admits past the last issued position
+        self.assertEqual(self.states(tokens)[-1], ('admitted', 0))
+        self.assertEqual(self.book(self.users[3], tokens[2]).status_code, 201)
+        self.assertEqual(self.states(tokens[2:]), [('used', 0)])
+
+    def test_booking_needs_an_admitted_token_of_the_user(self):
+        first, second = self.join(self.users[1]), self.join(self.users[2])
+        self.assertEqual(self.book(self.users[1]).status_code, 429)
+        self.assertEqual(self.book(self.users[2], second).status_code, 429)
+        self.queue.advance(2)
+        self.assertEqual(self.book(self.users[2], first).status_code, 429)
+        self.assertEqual(self.book(self.users[1], first).status_code, 201)
+        self.assertEqual(self.book(self.users[1], first).status_code, 429)
+        self.assertEqual(self.book(self.users[3], event=self.other).status_code, 201)
+
+    def test_failed_booking_keeps_the_token(self):
+        token = self.join(self.users[1])
+        self.queue.advance(1)
+        self.assertEqual(self.book(self.users[1], token, tickets=3).status_code, 400)
+        self.assertEqual(self.queue.status(token)['state'], 'admitted')
+        self.assertEqual(self.book(self.users[1], token, tickets=2).status_code, 201)
+
+    def test_only_staff_open_and_close_gates(self):
+        self.assertEqual(self.open(self.other, user=self.users[1]).status_code, 403)
+        self.assertEqual(self.open(self.other, rate=0).status_code, 400)
+        self.assertFalse(self.queue.is_gated(self.other.pk))
+        self.assertEqual(self.book(self.users[1]).status_code, 429)
+        self.client.force_authenticate(self.users[1])
+        self.assertEqual(self.client.delete(f'/api/events/{self.event.pk}/queue/').status_code, 403)
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.delete(f'/api/events/{self.event.pk}/queue/').status_code, 204)
+        self.assertEqual(self.book(self.users[1]).status_code, 201)
+        self.client.force_authenticate(self.users[1])
+        self.assertEqual(self.client.post(f'/api/events/{self.event.pk}/queue/').status_code, 404)
+
+    def test_cart_consumes_nothing_unless_every_gated_event_is_admitted(self):
+        self.assertEqual(self.open(self.other).status_code, 200)
+        token = self.join(self.users[1])
+        self.queue.advance(1)
+        self.client.force_authenticate(self.users[1])
+        response = self.client.post('/api/bookings/checkout/', {'payment_method': 'card', 'items': [
+            {'event_id': self.event.pk, 'tickets': 1}, {'event_id': self.other.pk, 'tickets': 1},
+        ]}, format='json', HTTP_X_QUEUE_TOKEN=token)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.queue.status(token)['state'], 'admitted')
+        self.assertFalse(Booking.objects.exists())
+
+
+class InProcessAdmissionQueueTests(AdmissionQueueTests):
+    backend = 'booking.admission.InProcessAdmissionQueue'
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(3)
+        cls.event = create_event(cls.users[0], total_tickets=10)
+
+    def book(self, user, key, tickets=1):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/bookings/', {
+            'event_id': self.event.pk, 'tickets': tickets, 'payment_method': 'card'
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.book(self.users[1], 'order-1', tickets=2)
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+        replay = self.book(self.users[1], 'order-1', tickets=2)
+        self.assertEqual((replay.status_code, replay['Idempotent-Replayed']), (201, 'true'))
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).available_tickets, 8)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.assertEqual(self.book(self.users[1], 'order-1', tickets=2).status_code, 201)
+        self.assertEqual(self.book(self.users[1], 'order-1', tickets=3).status_code, 422)
+        self.assertEqual(self.book(self.users[2], 'order-1', tickets=3).status_code, 201)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_client_errors_replay_and_expired_keys_run_again(self):
+        self.assertEqual(self.book(self.users[1], 'order-1', tickets=11).status_code, 400)
+        self.assertEqual(self.book(self.users[1], 'order-1', tickets=11)['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.book(self.users[1], 'x' * 256).status_code, 400)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertNotIn('Idempotent-Replayed', self.book(self.users[1], 'order-1', tickets=11))
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(purge_expired_keys(), 1)
+
+
+class WaitlistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(5)
+        cls.event = create_event(cls.users[0], total_tickets=4)
+
+    def join(self, user, tickets):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(f'/api/events/{self.event.pk}/waitlist/', {'tickets': tickets}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def allocated(self):
+        return list(WaitlistEntry.objects.filter(allocated_at__isnull=False)
+                    .order_by('allocated_at', 'pk').values_list('user_id', 'booking__tickets'))
+
+    def test_freed_tickets_go_to_the_longest_fifo_prefix(self):
+        booking = create_booking(event=self.event, user=self.users[0], tickets=4, payment_method='card')
+        first, second, third = self.users[1:4]
+        self.assertIsNone(self.join(first, 2)['booking'])
+        self.join(second, 3)
+        self.join(third, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_booking(booking)  # Frees 4: the second entry does not fit, so the third waits behind it
+        self.assertEqual(self.allocated(), [(first.pk, 2)])
+        self.assertEqual(Event.objects.get(pk=self.event.pk).available_tickets, 2)
+
+        release_tickets_bulk({self.event.pk: 2})
+        self.assertEqual(allocate_waitlist(self.event.pk), 2)
+        self.assertEqual(self.allocated(), [(first.pk, 2), (second.pk, 3), (third.pk, 1)])
+        self.assertEqual(Event.objects.get(pk=self.event.pk).available_tickets, 0)
+        self.assertEqual(set(Booking.objects.filter(payment_method='waitlist').values_list('user_id', flat=True)),
+                         {first.pk, second.pk, third.pk})
+
+    def test_joining_with_stock_books_at_once(self):
+        entry = self.join(self.users[1], 3)
+        self.assertIsNotNone(entry['booking'])
+        self.assertEqual(Event.objects.get(pk=self.event.pk).available_tickets, 1)
+
+    def test_sharded_stock_split_with_the_event_row(self):
+        inventory.enable_sharding(self.event.pk, 2)  # [2, 2]
+        reserve_tickets(Event.objects.get(pk=self.event.pk), 2)
+        release_tickets_bulk({self.event.pk: 2})  # Back on the event row: 2 there, 2 in one shard
+        entry = self.join(self.users[1], 3)
+        self.join(self.users[2], 1)
+        self.assertIsNone(entry['booking'])
+        self.assertEqual(self.allocated(), [])
+        self.assertEqual(Event.objects.get(pk=self.event.pk).tickets_left(), 4)
+
+        inventory.enable_sharding(self.event.pk, 0)
+        self.assertEqual(allocate_waitlist(self.event.pk), 2)
+        self.assertEqual(self.allocated(), [(self.users[1].pk, 3), (self.users[2].pk, 1)])
+
+
+class CheckInTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(2)
+        cls.event = create_event(cls.users[0], total_tickets=10)
+        cls.paid = create_booking(event=cls.event, user=cls.users[1], tickets=3, payment_method='card',
+                                  payment_status='completed')
+        cls.unpaid = create_booking(event=cls.event, user=cls.users[1], tickets=1, payment_method='card')
+
+    def setUp(self):
+        tickets._redeemed.clear()  # Row ids are reused between tests
+
+    def test_each_paid_ticket_is_admitted_once(self):
+        first, second, third = tickets.ticket_tokens(self.paid)
+        unpaid, = tickets.ticket_tokens(self.unpaid)
+        result = tickets.check_in(self.event.pk, [first, second, first, unpaid, first[:-2] + 'xx', 'garbage'])
+        self.assertEqual(result, {
+            'admitted': [first, second], 'duplicate': [first], 'invalid': [first[:-2] + 'xx', 'garbage', unpaid],
+        })
+        result = tickets.check_in(self.event.pk, [second, third])
+        self.assertEqual((result['admitted'], result['duplicate']), ([third], [second]))
+        self.assertEqual(TicketRedemption.objects.count(), 3)
+
+    def test_tokens_of_other_events_and_tickets_are_invalid(self):
+        other = create_event(self.users[0], total_tickets=10)
+        key = tickets.scanner_key(self.event.pk)
+        beyond = f'{self.event.pk}.{self.paid.pk}.3'
+        foreign, = tickets.ticket_tokens(self.unpaid)
+        result = tickets.check_in(other.pk, [foreign, f'{beyond}.{tickets._signature(key, beyond)}'])
+        self.assertEqual(len(result['invalid']), 2)
+        result = tickets.check_in(self.event.pk, [f'{beyond}.{tickets._signature(key, beyond)}'])
+        self.assertEqual(len(result['invalid']), 1)
+
+    def test_redemptions_made_elsewhere_are_duplicates(self):
+        first, second, third = tickets.ticket_tokens(self.paid)
+        tickets.check_in(self.event.pk, [])  # Loads this node's set before the other node redeems
+        TicketRedemption.objects.create(event=self.event, booking=self.paid, ticket=1)
+        result = tickets.check_in(self.event.pk, [first, second, third])
+        self.assertEqual((result['admitted'], result['duplicate']), ([first, third], [second]))
+
+    def test_failed_insert_leaves_the_tickets_redeemable(self):
+        first, _, _ = tickets.ticket_tokens(self.paid)
+        with mock.patch.object(TicketRedemption.objects, 'bulk_create', side_effect=OperationalError('disk I/O')):
+            with self.assertRaises(OperationalError):
+                tickets.check_in(self.event.pk, [first])
+        self.assertEqual(tickets.check_in(self.event.pk, [first])['admitted'], [first])
+
+
+class PaymentCallbackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(2)
+        cls.event = create_event(cls.users[0], total_tickets=10)
+        cls.bookings = [
+            create_booking(event=cls.event, user=cls.users[1], tickets=1, payment_method='card') for _ in range(3)
+        ]
+
+    def post(self, notifications, signature=None):
+        body = json.dumps(notifications).encode()
+        return APIClient().post('/api/payments/callbacks/', body, content_type='application/json',
+                                HTTP_X_GATEWAY_SIGNATURE=signature or payments.sign(body))
+
+    def callback(self, booking, status, transaction_id=None):
+        if transaction_id is None:
+            transaction_id = f'tx-{booking.pk}'
+        return {'transaction_id': transaction_id, 'booking_id': booking.pk, 'status': status}
+
+    def statuses(self):
+        return [booking.payment_status for booking in Booking.objects.filter(
+            pk__in=[booking.pk for booking in self.bookings]).order_by('pk')]
+
+    def test_transitions_apply_once(self):
+        first, second, third = self.bookings
+        response = self.post([self.callback(first, 'completed'), self.callback(first, 'completed'),
+                              self.callback(second, 'failed'), self.callback(third, 'refunded')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(),
+                         {'received': 4, 'rejected': 0, 'duplicate': 1, 'applied': 2, 'ignored': 1})
+        self.assertEqual(self.statuses(), ['completed', 'failed', 'pending'])
+        self.assertEqual(Booking.objects.get(pk=first.pk).transaction_id, f'tx-{first.pk}')
+
+        response = self.post([self.callback(first, 'completed'), self.callback(first, 'refunded'),
+                              self.callback(second, 'completed', 'tx-retry')])
+        self.assertEqual(response.json(),
+                         {'received': 3, 'rejected': 0, 'duplicate': 1, 'applied': 2, 'ignored': 0})
+        self.assertEqual(self.statuses(), ['refunded', 'completed', 'pending'])
+
+    def test_malformed_callbacks_are_rejected(self):
+        first = self.bookings[0]
+        response = self.post([
+            self.callback(first, ['completed']), self.callback(first, {'status': 'completed'}),
+            self.callback(first, 'pending'), {'transaction_id': 'tx', 'status': 'completed'},
+            self.callback(first, 'completed', ''), {**self.callback(first, 'completed'), 'booking_id': 'one'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rejected'], 6)
+        self.assertEqual(self.statuses(), ['pending'] * 3)
+
+    def test_unknown_bookings_are_recorded_and_ignored(self):
+        response = self.post({'transaction_id': 'tx-lost', 'booking_id': 0, 'status': 'completed'})
+        self.assertEqual((response.json()['applied'], response.json()['ignored']), (0, 1))
+
+    def test_unsigned_batches_are_refused(self):
+        response = self.post([self.callback(self.bookings[0], 'completed')], signature='0' * 64)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.statuses(), ['pending'] * 3)
+
+
+@override_settings(CANCELLATION_RUN_IN_PROCESS=False)
+class CancellationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(3)
+        cls.event = create_event(cls.users[0], total_tickets=10)
+        for i in range(5):
+            create_booking(event=cls.event, user=cls.users[1 + i % 2], tickets=1, payment_method='card',
+                           payment_status='completed' if i % 2 else 'pending')
+        hold_tickets(event=cls.event, user=cls.users[1], tickets=2)
+        cls.event.status = 'cancelled'
+        cls.event.save()
+        cls.job = CancellationJob.objects.get(event=cls.event)
+
+    def notified(self):
+        return sorted(BookingNotification.objects.values_list('booking_id', flat=True))
+
+    def test_bookings_are_refunded_or_failed_in_chunks(self):
+        self.assertEqual((self.job.status, self.job.total_bookings), ('queued', 5))
+        job = CancellationJob.objects.select_related('event').get(pk=self.job.pk)
+        self.assertEqual(cancellation.process_chunk(job, 2), 2)
+        self.assertEqual(CancellationJob.objects.values_list('status', 'processed').get(pk=job.pk), ('running', 2))
+
+        cancellation.run(job.pk, chunk_size=2)  # A new run resumes after the stored cursor
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('done', 5))
+        self.assertIsNotNone(job.finished_at)
+        bookings = Booking.objects.filter(event=self.event).order_by('pk')
+        self.assertEqual([booking.payment_status for booking in bookings],
+                         ['failed', 'refunded', 'failed', 'refunded', 'failed'])
+        self.assertEqual(self.notified(), [booking.pk for booking in bookings])
+        self.assertFalse(TicketHold.objects.filter(event=self.event).exists())
+
+    def test_racing_runs_notify_each_booking_once(self):
+        first, second = (CancellationJob.objects.select_related('event').get(pk=self.job.pk) for _ in range(2))
+        self.assertEqual(cancellation.process_chunk(first, 3), 3)
+        self.assertEqual(cancellation.process_chunk(second, 3), 0)  # Lost the claim, catches up instead
+        self.assertEqual(second.last_booking_id, first.last_booking_id)
+        cancellation.run(second.pk, chunk_size=3)
+        cancellation.run(first.pk, chunk_size=3)
+        self.assertEqual(len(self.notified()), 5)
+        self.assertEqual(len(set(self.notified())), 5)
+        self.assertEqual(CancellationJob.objects.get(pk=self.job.pk).processed, 5)
+
+    def test_cancelling_again_handles_the_bookings_made_since(self):
+        cancellation.run(self.job.pk)
+        first = self.notified()
+        event = Event.objects.get(pk=self.event.pk)
+        event.status = 'published'
+        event.save()
+        event.save()  # Saving while published leaves the finished job alone
+        self.assertEqual(CancellationJob.objects.get(pk=self.job.pk).status, 'done')
+        late = create_booking(event=event, user=self.users[1], tickets=1, payment_method='card',
+                              payment_status='completed')
+        event.status = 'cancelled'
+        event.save()
+        job = CancellationJob.objects.get(pk=self.job.pk)
+        self.assertEqual((job.status, job.total_bookings), ('queued', 1))
+        cancellation.run(job.pk)
+        self.assertEqual(self.notified(), sorted([*first, late.pk]))
+        self.assertEqual(Booking.objects.get(pk=late.pk).payment_status, 'refunded')
+        event.save()
+        self.assertEqual(CancellationJob.objects.values_list('status', 'processed').get(pk=job.pk), ('done', 1))
+
+    def test_cancelled_events_cannot_be_booked(self):
+        event = Event.objects.get(pk=self.event.pk)
+        for book in (lambda: create_booking(event=event, user=self.users[1], tickets=1, payment_method='card'),
+                     lambda: hold_tickets(event=event, user=self.users[1], tickets=1),
+                     lambda: checkout_cart(user=self.users[1], items=[(event, 1)], payment_method='card')):
+            with self.assertRaises(EventCancelled):
+                book()
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.post('/api/bookings/', {'event_id': event.pk, 'tickets': 1, 'payment_method': 'card'},
+                               format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cancelled', response.json()['error'])
+
+    def test_progress_is_visible_to_staff_and_organisers(self):
+        client = APIClient()
+        url = f'/api/events/{self.event.pk}/cancellation/'
+        client.force_authenticate(self.users[1])
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_authenticate(self.users[0])  # Owns the venue and the artist
+        self.assertEqual(client.get(url).json()['total_bookings'], 5)
+        self.users[1].is_staff = True
+        client.force_authenticate(self.users[1])
+        self.assertEqual(client.get(url).status_code, 200)
+
+
+class ReceiptExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(3)
+        cls.admin = cls.users[2]
+        cls.admin.is_staff = True
+        cls.admin.save()
+        cls.event = create_event(cls.users[0], total_tickets=10, ticket_price=Decimal('2500.00'))
+        cls.other = create_event(cls.users[0], total_tickets=10)
+        cls.bookings = [
+            create_booking(event=cls.event, user=cls.users[1], tickets=tickets, payment_method='card',
+                           transaction_id=f'tx-{tickets}')
+            for tickets in (1, 2, 3)
+        ]
+        create_booking(event=cls.other, user=cls.users[1], tickets=1, payment_method='card')
+
+    def export(self, user=None, **params):
+        client = APIClient()
+        client.force_authenticate(user or self.admin)
+        response = client.get('/api/bookings/export/', params)
+        if response.status_code != 200:
+            return response, None
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_booking_of_the_event(self):
+        with mock.patch.object(receipts, 'ROWS_PER_WRITE', 2):  # Rows span several writes
+            response, body = self.export(event=self.event.pk)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(list(rows[0]), list(receipts.RECEIPT_FIELDS))
+        self.assertEqual([(int(row['booking_id']), row['tickets'], row['total_amount'], row['transaction_id'])
+                          for row in rows],
+                         [(booking.pk, str(booking.tickets), str(booking.total_amount), booking.transaction_id)
+                          for booking in self.bookings])
+        self.assertEqual({(row['event'], row['user'], row['payment_status']) for row in rows},
+                         {('Bench Night', self.users[1].email, 'pending')})
+
+    def test_jsonl_by_date_range(self):
+        today = timezone.localdate().isoformat()
+        response, body = self.export(start=today, end=today, output='jsonl')
+        self.assertEqual(response['Content-Type'], 'application/jsonl')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[0], receipts.receipt_data(Booking.objects.get(pk=self.bookings[0].pk)))
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.export(start=tomorrow, output='jsonl')[1], '')
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.export(self.users[1], event=self.event.pk)[0].status_code, 403)
+        for params in ({}, {'event': 'abc'}, {'event': '1;2'}, {'start': '2024-13-45'}, {'end': 'yesterday'},
+                       {'event': self.event.pk, 'output': 'xml'}):
+            response, _ = self.export(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+
+class NestedSerializerOptimizeTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=4, bookings_per_event=2)
+
+    def render(self, bookings):
+        with CaptureQueriesContext(connection) as queries:
+            data = BookingSerializer(bookings, many=True).data
+        return data, len(queries)
+
+    def test_joins_follow_the_nested_serializers(self):
+        query = optimize(Booking.objects.all(), BookingSerializer).query
+        self.assertTrue({'user', 'event'} <= set(query.select_related))
+        self.assertTrue({'artist', 'venue'} <= set(query.select_related['event']))
+        self.assertIn('user', query.select_related['event']['artist'])
+        self.assertIn('owner', query.select_related['event']['venue'])
+
+    def test_queries_stay_constant_whatever_the_page_size(self):
+        bookings = Booking.objects.order_by('pk')
+        few, few_queries = self.render(optimize(bookings, BookingSerializer)[:2])
+        many, many_queries = self.render(optimize(bookings, BookingSerializer))
+        self.assertEqual(len(many), bookings.count())
+        self.assertEqual(few_queries, many_queries)
+        self.assertLessEqual(many_queries, 2)  # The page, and the shards of sharded events
+
+        plain, plain_queries = self.render(bookings)
+        self.assertEqual(plain, many)
+        self.assertGreater(plain_queries, 3 * len(many))
+
+    def test_sparse_fields_load_only_their_columns(self):
+        response, sql, _ = self.request('/api/bookings/', self.data['customer'], fields='id,tickets')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'tickets'})
+        self.assertNotIn('total_amount', sql[-1])
+        self.assertNotIn('events_event', sql[-1])
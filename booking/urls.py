@@ -1,4 +1,7 @@
-from .views import BookingViewSet
+from .views import (
+    AdmissionQueueViewSet, AdmissionStatusViewSet, BookingViewSet, CancellationJobViewSet, CheckInViewSet,
+    PaymentCallbackViewSet, TicketHoldViewSet, WaitlistViewSet
+)
 from django.urls import path
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
@@ -22,6 +25,12 @@ urlpatterns = [
         'get': 'list',
         'post': 'create'
     })),
+    path('api/bookings/export/', BookingViewSet.as_view({
+        'get': 'export'
+    })),
+    path('api/bookings/checkout/', BookingViewSet.as_view({
+        'post': 'checkout'
+    })),
     path('api/bookings/<int:pk>/', BookingViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
@@ -30,6 +39,46 @@ urlpatterns = [
     path('api/bookings/<int:pk>/receipt/', BookingViewSet.as_view({
         'get': 'receipt'
     })),
+    path('api/bookings/<int:pk>/tickets/', BookingViewSet.as_view({
+        'get': 'tickets'
+    })),
+    path('api/holds/', TicketHoldViewSet.as_view({
+        'post': 'create'
+    })),
+    path('api/holds/<int:pk>/', TicketHoldViewSet.as_view({
+        'get': 'retrieve',
+        'delete': 'destroy'
+    })),
+    path('api/holds/<int:pk>/confirm/', TicketHoldViewSet.as_view({
+        'post': 'confirm'
+    })),
+    path('api/events/<int:pk>/queue/', AdmissionQueueViewSet.as_view({
+        'post': 'join',
+        'put': 'open',
+        'delete': 'close'
+    })),
+    path('api/queue/<str:token>/', AdmissionStatusViewSet.as_view({
+        'get': 'retrieve'
+    })),
+    path('api/events/<int:pk>/waitlist/', WaitlistViewSet.as_view({
+        'post': 'create',
+        'delete': 'destroy'
+    })),
+    path('api/waitlist/', WaitlistViewSet.as_view({
+        'get': 'list'
+    })),
+    path('api/events/<int:pk>/checkin/', CheckInViewSet.as_view({
+        'post': 'create'
+    })),
+    path('api/events/<int:pk>/scanner_key/', CheckInViewSet.as_view({
+        'get': 'scanner_key'
+    })),
+    path('api/events/<int:pk>/cancellation/', CancellationJobViewSet.as_view({
+        'get': 'retrieve'
+    })),
+    path('api/payments/callbacks/', PaymentCallbackViewSet.as_view({
+        'post': 'create'
+    })),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
\ No newline at end of file
@@ -1,23 +1,30 @@
-from decimal import Decimal
-from django.db.models import F
 from rest_framework import viewsets, status, mixins
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Booking
-from .serializers import BookingSerializer
-from rest_framework.pagination import PageNumberPagination
+from django.utils.dateparse import parse_date
+from events.models import Event
+from .admission import NotAdmitted, admit_booking, get_queue
+from .idempotency import idempotent
+from musicapp.prefetch import optimize
+from . import payments, receipts
+from . import tickets as ticket_tokens
+from .models import Booking, CancellationJob, TicketHold, WaitlistEntry
+from .serializers import (
+    BookingSerializer, CancellationJobSerializer, CartCheckoutSerializer, HoldConfirmSerializer, TicketHoldSerializer,
+    WaitlistEntrySerializer
+)
+from .services import (
+    EventCancelled, HoldExpired, SoldOut, allocate_waitlist, cancel_booking, cancel_hold, confirm_hold
+)
+from musicapp.pagination import StandardResultsSetPagination
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
 class BookingViewSet(viewsets.ViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -27,10 +34,12 @@ class BookingViewSet(viewsets.ViewSet):
         responses={200: BookingSerializer(many=True)}
     )
     def list(self, request):
-        bookings = Booking.objects.filter(user=request.user)
+        bookings = optimize(
+            Booking.objects.filter(user=request.user).order_by('-created_at', '-pk'), BookingSerializer, request
+        )
         paginator = StandardResultsSetPagination()
         result_page = paginator.paginate_queryset(bookings, request)
-        serializer = BookingSerializer(result_page, many=True)
+        serializer = BookingSerializer(result_page, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(
@@ -38,13 +47,13 @@ class BookingViewSet(viewsets.ViewSet):
         responses={200: BookingSerializer()}
     )
     def retrieve(self, request, pk=None):
-        booking = get_object_or_404(Booking, pk=pk)  # Only owner or admin can view booking details
-        if booking.user != request.user and not request.user.is_staff:
+        booking = get_object_or_404(optimize(Booking.objects.all(), BookingSerializer, request), pk=pk)  # Only owner or admin can view booking details
+        if booking.user_id != request.user.pk and not request.user.is_staff:
             return Response(
                 {"error": "You do not have permission to view this booking."},
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer = BookingSerializer(booking)
+        serializer = BookingSerializer(booking, context={'request': request})
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -52,35 +61,35 @@ class BookingViewSet(viewsets.ViewSet):
         request_body=BookingSerializer,
         responses={201: BookingSerializer()}
     )
+    @idempotent
     def create(self, request):
         serializer = BookingSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             try:
-                event = serializer.validated_data['event']
-                tickets = int(serializer.validated_data['tickets'])
-
-                # Check ticket availability
-                if tickets > event.available_tickets:
-                    return Response(
-                        {"error": "Not enough tickets available"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                total_amount = Decimal(tickets) * event.ticket_price
+                booking = admit_booking(
+                    request, [serializer.validated_data['event']], lambda: serializer.save(user=request.user)
+                )
 
-                # Atomically update available tickets also Event.objects.filter(getting it dynamically)
-                event.__class__.objects.filter(pk=event.pk).update(
-                    available_tickets=F('available_tickets') - tickets
+                return Response(
+                    BookingSerializer(booking).data,
+                    status=status.HTTP_201_CREATED
                 )
 
-                booking = serializer.save(
-                    user=request.user,
-                    total_amount=total_amount
+            except NotAdmitted:
+                return Response(
+                    {"error": "This event has a waiting room, book with an admitted X-Queue-Token."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
                 )
 
+            except EventCancelled as e:
                 return Response(
-                    BookingSerializer(booking).data,
-                    status=status.HTTP_201_CREATED
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            except SoldOut:
+                return Response(
+                    {"error": "Not enough tickets available"},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
 
             except Exception as e:
@@ -91,13 +100,45 @@ class BookingViewSet(viewsets.ViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(
+        operation_summary="Book tickets for several events in one transaction.",
+        request_body=CartCheckoutSerializer,
+        responses={201: BookingSerializer(many=True)}
+    )
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def checkout(self, request):
+        serializer = CartCheckoutSerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                bookings = admit_booking(
+                    request, [event for event, _ in serializer.validated_data['items']],
+                    lambda: serializer.save(user=request.user)
+                )
+            except NotAdmitted:
+                return Response(
+                    {"error": "An event in the cart has a waiting room, send its admitted X-Queue-Token."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+            except SoldOut as e:
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(
+                BookingSerializer(bookings, many=True).data,
+                status=status.HTTP_201_CREATED
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
     @swagger_auto_schema(
         operation_summary="Update booking status (admin only).",
         request_body=BookingSerializer,
         responses={200: BookingSerializer()}
     )
+    @idempotent
     def update(self, request, pk=None):
-        booking = get_object_or_404(Booking, pk=pk)  # Only admin can update booking status
+        booking = get_object_or_404(optimize(Booking.objects.all(), BookingSerializer), pk=pk)  # Only admin can update booking status
         if not request.user.is_staff:
             return Response(
                 {"error": "Only admin can update booking status."},
@@ -122,33 +163,330 @@ class BookingViewSet(viewsets.ViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        booking.delete()
+        cancel_booking(booking)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @swagger_auto_schema(
+        operation_summary="Get the signed ticket tokens of a booking.",
+        responses={200: "List of ticket tokens"}
+    )
+    @action(detail=True, methods=['get'])
+    def tickets(self, request, pk=None):
+        booking = get_object_or_404(Booking, pk=pk)  # Only owner or admin can fetch the tickets
+        if booking.user != request.user and not request.user.is_staff:
+            return Response(
+                {"error": "You do not have permission to view these tickets."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response({"booking_id": booking.id, "tickets": ticket_tokens.ticket_tokens(booking)})
+
     @swagger_auto_schema(
         operation_summary="Get booking receipt.",
         responses={200: "Receipt data"}
     )
     @action(detail=True, methods=['get'])
     def receipt(self, request, pk=None):
-        booking = get_object_or_404(Booking, pk=pk)  # Only owner, booker or admin can view receipt
+        booking = get_object_or_404(Booking.objects.select_related('event', 'user'), pk=pk)  # Only owner, booker or admin can view receipt
         if booking.user != request.user and not request.user.is_staff:
             return Response(
                 {"error": "You do not have permission to view this receipt."},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Generate receipt data
-        receipt_data = {
-            "booking_id": booking.id,
-            "event": booking.event.title,
-            "user": booking.user.username,
-            "tickets": booking.tickets,
-            "total_amount": str(booking.total_amount),
-            "payment_status": booking.payment_status,
-            "payment_method": booking.payment_method,
-            "transaction_id": booking.transaction_id,
-            "booking_date": booking.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        }
-
-        return Response(receipt_data)
+        return Response(receipts.receipt_data(booking))
+
+    @swagger_auto_schema(
+        operation_summary="Stream every receipt of an event or date range as CSV or JSON lines (admin only).",
+        responses={200: "CSV or JSONL file"}
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Only admin can export receipts."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        bookings = Booking.objects.all()
+        event = request.query_params.get('event', None)
+        if event:
+            if not event.isdigit():
+                return Response({"error": "event must be an event id."}, status=status.HTTP_400_BAD_REQUEST)
+            bookings = bookings.filter(event_id=event)
+
+        dates = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name, '')
+            try:
+                dates[name] = parse_date(value) if value else None
+            except ValueError:  # Well formed but out of range, like 2024-13-45
+                dates[name] = None
+            if value and dates[name] is None:
+                return Response({"error": f"{name} must be a YYYY-MM-DD date."}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = dates['start'], dates['end']
+        if start:
+            bookings = bookings.filter(created_at__date__gte=start)
+        if end:
+            bookings = bookings.filter(created_at__date__lte=end)
+
+        if not (event or start or end):
+            return Response(
+                {"error": "Filter the export by event or by start/end date."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        output = request.query_params.get('output', 'csv')
+        if output == 'jsonl':
+            content, content_type = receipts.stream_jsonl(receipts.iter_receipts(bookings)), 'application/jsonl'
+        elif output == 'csv':
+            content, content_type = receipts.stream_csv(receipts.iter_receipts(bookings)), 'text/csv'
+        else:
+            return Response({"error": "output must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="receipts.{output}"'
+        return response
+
+
+class TicketHoldViewSet(viewsets.ViewSet):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Hold tickets while the user pays.",
+        request_body=TicketHoldSerializer,
+        responses={201: TicketHoldSerializer()}
+    )
+    def create(self, request):
+        serializer = TicketHoldSerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                hold = admit_booking(
+                    request, [serializer.validated_data['event']], lambda: serializer.save(user=request.user)
+                )
+            except NotAdmitted:
+                return Response(
+                    {"error": "This event has a waiting room, book with an admitted X-Queue-Token."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+            except EventCancelled as e:
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            except SoldOut:
+                return Response(
+                    {"error": "Not enough tickets available"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(TicketHoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve a ticket hold.",
+        responses={200: TicketHoldSerializer()}
+    )
+    def retrieve(self, request, pk=None):
+        hold = get_object_or_404(TicketHold, pk=pk, user=request.user)
+        return Response(TicketHoldSerializer(hold).data)
+
+    @swagger_auto_schema(
+        operation_summary="Release a ticket hold.",
+        responses={204: "No Content"}
+    )
+    def destroy(self, request, pk=None):
+        hold = get_object_or_404(TicketHold, pk=pk, user=request.user)
+        cancel_hold(hold)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @swagger_auto_schema(
+        operation_summary="Turn the hold into a booking awaiting payment.",
+        request_body=HoldConfirmSerializer,
+        responses={201: BookingSerializer(), 410: "Hold expired"}
+    )
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def confirm(self, request, pk=None):
+        hold = get_object_or_404(TicketHold.objects.select_related('event', 'user'), pk=pk, user=request.user)
+        serializer = HoldConfirmSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            booking = confirm_hold(hold, **serializer.validated_data)
+        except HoldExpired:
+            return Response(
+                {"error": "The hold has expired."},
+                status=status.HTTP_410_GONE
+            )
+        return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
+
+
+class AdmissionQueueViewSet(viewsets.ViewSet):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Join the waiting room of an event.",
+        responses={201: "Queue token and position"}
+    )
+    def join(self, request, pk=None):
+        queue = get_queue()
+        if not queue.is_gated(pk):
+            return Response(
+                {"error": "This event has no waiting room, book directly."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        token, position = queue.enqueue(pk, request.user.pk)
+        return Response({"token": token, "position": position}, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_summary="Open the waiting room of an event, admitting ?rate= users per second (admin only).",
+        responses={200: "Gate rate"}
+    )
+    def open(self, request, pk=None):
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Only admin can open a waiting room."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        event = get_object_or_404(Event, pk=pk)
+        rate = request.data.get('rate', 50)
+        if isinstance(rate, bool) or not isinstance(rate, int) or rate < 1:
+            return Response({"error": "rate must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+        # Through the API the gate opens in the server's own queue, which the in-process backend needs
+        get_queue().open(event.pk, rate)
+        return Response({"event_id": event.pk, "rate": rate})
+
+    @swagger_auto_schema(
+        operation_summary="Close the waiting room of an event (admin only).",
+        responses={204: "Closed"}
+    )
+    def close(self, request, pk=None):
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Only admin can close a waiting room."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        get_queue().close(pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AdmissionStatusViewSet(viewsets.ViewSet):
+    # The queue token is the credential, polling skips JWT verification entirely
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_summary="Check a waiting room token.",
+        responses={200: "Queue state, position and users ahead"}
+    )
+    def retrieve(self, request, token=None):
+        queue_status = get_queue().status(token)
+        if queue_status is None:
+            return Response({"error": "Unknown queue token."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(queue_status)
+
+
+class WaitlistViewSet(viewsets.ViewSet):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="List the current user's waitlist entries and their allocated bookings.",
+        responses={200: WaitlistEntrySerializer(many=True)}
+    )
+    def list(self, request):
+        entries = optimize(WaitlistEntry.objects.filter(user=request.user).order_by('-created_at'), WaitlistEntrySerializer)
+        paginator = StandardResultsSetPagination()
+        result_page = paginator.paginate_queryset(entries, request)
+        serializer = WaitlistEntrySerializer(result_page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_summary="Join the waitlist of an event.",
+        request_body=WaitlistEntrySerializer,
+        responses={201: WaitlistEntrySerializer()}
+    )
+    def create(self, request, pk=None):
+        event = get_object_or_404(Event, pk=pk)
+        serializer = WaitlistEntrySerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                with transaction.atomic():
+                    entry = serializer.save(event=event, user=request.user)
+            except IntegrityError:
+                return Response(
+                    {"error": "You are already on the waitlist for this event."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            allocate_waitlist(event.pk)
+            entry.refresh_from_db()
+            return Response(WaitlistEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(
+        operation_summary="Leave the waitlist of an event.",
+        responses={204: "No Content"}
+    )
+    def destroy(self, request, pk=None):
+        WaitlistEntry.objects.filter(event_id=pk, user=request.user, allocated_at__isnull=True).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CheckInViewSet(viewsets.ViewSet):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Get the key door scanners use to verify an event's tickets offline.",
+        responses={200: "Hex encoded HMAC-SHA256 key"}
+    )
+    def scanner_key(self, request, pk=None):
+        event = get_object_or_404(Event, pk=pk)
+        return Response({"event_id": event.id, "key": ticket_tokens.scanner_key(event.id).hex()})
+
+    @swagger_auto_schema(
+        operation_summary="Redeem a batch of scanned ticket tokens at the door.",
+        responses={200: "Admitted, duplicate and invalid tokens"}
+    )
+    def create(self, request, pk=None):
+        tokens = request.data.get('tokens')
+        if not isinstance(tokens, list):
+            return Response({"error": "tokens must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        result = ticket_tokens.check_in(int(pk), tokens)
+        return Response({key: {"count": len(value), "tokens": value} for key, value in result.items()})
+
+
+class PaymentCallbackViewSet(viewsets.ViewSet):
+    # The gateway authenticates with the X-Gateway-Signature HMAC of the raw body
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_summary="Ingest a batch of payment gateway callbacks.",
+        responses={200: "Counts of applied, duplicate, ignored and rejected callbacks"}
+    )
+    def create(self, request):
+        if not payments.verify_signature(request.body, request.headers.get('X-Gateway-Signature')):
+            return Response({"error": "Invalid gateway signature."}, status=status.HTTP_403_FORBIDDEN)
+        notifications = request.data if isinstance(request.data, list) else [request.data]
+        return Response(payments.ingest(notifications))
+
+
+class CancellationJobViewSet(viewsets.ViewSet):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Progress of the refunds and notifications for a cancelled event.",
+        responses={200: CancellationJobSerializer()}
+    )
+    def retrieve(self, request, pk=None):
+        job = get_object_or_404(CancellationJob.objects.select_related('event__venue', 'event__artist'), event_id=pk)
+        # Only staff and the event's organisers, its venue owner and its artist, follow the refunds
+        if not request.user.is_staff and request.user.pk not in (job.event.venue.owner_id, job.event.artist.user_id):
+            return Response(
+                {"error": "You do not have permission to perform this action."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(CancellationJobSerializer(job).data)
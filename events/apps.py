@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        from musicapp.response_cache import invalidate_on_change
+        invalidate_on_change(self.get_model('Event'), 'event')
+
+        from . import cards
+        cards.connect()
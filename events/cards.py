@@ -0,0 +1,111 @@
+"""Event cards, a denormalized read model of the event catalog.
+
+``EventCard`` holds one row per event with just what a catalog card shows,
+copied from the event, its artist and its venue, so the card list is a single
+index scan with no joins. Cards are kept up to date incrementally:
+
+* saving an event, artist or venue refreshes the cards built from it;
+* the booking path moves ``available_tickets`` with ``adjust_stock`` in the
+  same transaction as the inventory it takes or gives back, since those
+  UPDATE statements send no signals.
+
+Stock on a card includes the inventory shards, so rebalancing does not touch
+it. ``manage.py rebuild_event_cards`` recomputes every card from the source
+rows, for example after bulk edits that bypass ``save()``.
+"""
+from django.db.models import F, Sum
+from django.db.models.signals import post_save
+
+from .models import Event, EventCard, EventInventoryShard
+
+# Card field: the event lookup it is copied from
+SOURCES = {
+    'status': 'status',
+    'title': 'title',
+    'date_time': 'date_time',
+    'ticket_price': 'ticket_price',
+    'artist_id': 'artist_id',
+    'artist_name': 'artist__name',
+    'genres': 'artist__genres',
+    'venue_id': 'venue_id',
+    'venue_name': 'venue__name',
+    'venue_city': 'venue__city',
+}
+UPDATE_FIELDS = ['available_tickets', *(field.removesuffix('_id') for field in SOURCES)]
+REBUILD_BATCH_SIZE = 1000
+STOCK_CHUNK_SIZE = 500
+
+
+def _cards(events):
+    rows = list(events.values_list('pk', 'available_tickets', 'inventory_shards', *SOURCES.values()))
+    sharded = [pk for pk, _, shards, *_ in rows if shards]
+    shard_stock = dict(
+        EventInventoryShard.objects.filter(event_id__in=sharded).values_list('event_id').annotate(Sum('available'))
+    ) if sharded else {}
+    return [
+        EventCard(event_id=pk, available_tickets=stock + (shard_stock.get(pk) or 0), **dict(zip(SOURCES, values)))
+        for pk, stock, _, *values in rows
+    ]
+
+
+def refresh(events):
+    """Recompute the cards of the ``events`` queryset from their source rows."""
+    cards = _cards(events)
+    EventCard.objects.bulk_create(
+        cards, update_conflicts=True, unique_fields=['event'], update_fields=UPDATE_FIELDS
+    )
+    return len(cards)
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute every card in primary key batches, return how many were written."""
+    written, last = 0, 0
+    while True:
+        batch = list(Event.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return written
+        written += refresh(Event.objects.filter(pk__in=batch))
+        last = batch[-1]
+
+
+def adjust_stock(deltas):
+    """Move card stock by ``deltas``, a dict of event id to the change in tickets.
+
+    Events moving by the same amount share an UPDATE; a CASE with a branch
+    per event costs more to compile than the statement takes to run.
+    """
+    for delta, event_ids in by_delta(deltas).items():
+        for start in range(0, len(event_ids), STOCK_CHUNK_SIZE):
+            EventCard.objects.filter(pk__in=event_ids[start:start + STOCK_CHUNK_SIZE]).update(
+                available_tickets=F('available_tickets') + delta
+            )
+
+
+def by_delta(deltas):
+    """``{delta: [event ids]}`` of the non-zero ``deltas``."""
+    groups = {}
+    for event_id, delta in deltas.items():
+        if delta:
+            groups.setdefault(delta, []).append(event_id)
+    return groups
+
+
+def _event_saved(sender, instance, **kwargs):
+    refresh(Event.objects.filter(pk=instance.pk))
+
+
+def _artist_saved(sender, instance, **kwargs):
+    refresh(Event.objects.filter(artist_id=instance.pk))
+
+
+def _venue_saved(sender, instance, **kwargs):
+    refresh(Event.objects.filter(venue_id=instance.pk))
+
+
+def connect():
+    from artist.models import Artist
+    from venue.models import Venue
+
+    post_save.connect(_event_saved, sender=Event, dispatch_uid='event-cards-event')
+    post_save.connect(_artist_saved, sender=Artist, dispatch_uid='event-cards-artist')
+    post_save.connect(_venue_saved, sender=Venue, dispatch_uid='event-cards-venue')
@@ -0,0 +1,107 @@
+"""Sharded inventory counters for events under heavy booking load.
+
+A sharded event keeps its unsold stock spread over ``EventInventoryShard`` rows
+so concurrent bookings update different rows instead of queueing on the event
+row. Whatever is left on ``Event.available_tickets`` still counts as stock and
+is moved into the shards by the rebalancer.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from . import cards
+from .models import Event, EventInventoryShard
+
+
+def _spread(total, shards):
+    base, extra = divmod(total, shards)
+    return [base + (1 if index < extra else 0) for index in range(shards)]
+
+
+def enable_sharding(event_id, shards):
+    """Split the event's remaining stock over ``shards`` counters, 0 folds them back."""
+    with transaction.atomic():
+        event = Event.objects.select_for_update().get(pk=event_id)
+        if event.seat_map is not None:
+            raise ValueError("Events with a seat map track inventory per seat and cannot be sharded")
+        stock = event.available_tickets + _sharded_stock(event_id)
+        EventInventoryShard.objects.filter(event_id=event_id).delete()
+        if shards:
+            EventInventoryShard.objects.bulk_create(
+                EventInventoryShard(event_id=event_id, index=index, available=available)
+                for index, available in enumerate(_spread(stock, shards))
+            )
+            stock = 0
+        Event.objects.filter(pk=event_id).update(available_tickets=stock, inventory_shards=shards)
+
+
+def _sharded_stock(event_id):
+    return EventInventoryShard.objects.filter(event_id=event_id).aggregate(total=Sum('available'))['total'] or 0
+
+
+def claim(event_id, shards, tickets):
+    """Take ``tickets`` from a random shard that still has them.
+
+    Falls back to draining several shards under a row lock when no single shard
+    can cover the request. Returns False when the shards together are short.
+    """
+    # Write before reading so SQLite takes the write lock up front instead of
+    # failing to upgrade a read lock under contention.
+    if EventInventoryShard.objects.filter(
+        event_id=event_id, index=random.randrange(shards), available__gte=tickets
+    ).update(available=F('available') - tickets):
+        cards.adjust_stock({event_id: -tickets})
+        return True
+
+    stocked = list(EventInventoryShard.objects.filter(
+        event_id=event_id, available__gte=tickets
+    ).values_list('index', flat=True))
+    if stocked and EventInventoryShard.objects.filter(
+        event_id=event_id, index=random.choice(stocked), available__gte=tickets
+    ).update(available=F('available') - tickets):
+        cards.adjust_stock({event_id: -tickets})
+        return True
+
+    with transaction.atomic():
+        candidates = list(
+            EventInventoryShard.objects.select_for_update()
+            .filter(event_id=event_id, available__gt=0)
+            .order_by('-available')
+        )
+        if sum(shard.available for shard in candidates) < tickets:
+            return False
+        remaining = tickets
+        for shard in candidates:
+            take = min(shard.available, remaining)
+            shard.available -= take
+            remaining -= take
+            if not remaining:
+                break
+        EventInventoryShard.objects.bulk_update(candidates, ['available'])
+        cards.adjust_stock({event_id: -tickets})
+    return True
+
+
+def release(event_id, shards, tickets):
+    """Return ``tickets`` to a random shard, False if the event has no shards any more."""
+    if not EventInventoryShard.objects.filter(event_id=event_id, index=random.randrange(shards)).update(
+        available=F('available') + tickets
+    ):
+        return False
+    cards.adjust_stock({event_id: tickets})
+    return True
+
+
+def rebalance(event_id):
+    """Even out the shards and move leftover event-row stock into them."""
+    with transaction.atomic():
+        event = Event.objects.select_for_update().get(pk=event_id)
+        shards = list(EventInventoryShard.objects.select_for_update().filter(event_id=event_id).order_by('index'))
+        if not shards:
+            return
+        stock = event.available_tickets + sum(shard.available for shard in shards)
+        for shard, available in zip(shards, _spread(stock, len(shards))):
+            shard.available = available
+        EventInventoryShard.objects.bulk_update(shards, ['available'])
+        Event.objects.filter(pk=event_id).update(available_tickets=0)
@@ -0,0 +1,65 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from events.models import Event
+from events.serializers import EventReader, EventSerializer
+from musicapp.benchmarking import create_event, create_users, scratch_database, timer
+from musicapp.prefetch import optimize
+from venue.models import Venue
+from venue.serializers import VenueReader, VenueSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare list page rendering through ModelSerializers and through the flat value readers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=20, help="Pages rendered per path.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['events'], options['page_size'], options['rounds'])
+
+    def run(self, count, page_size, rounds):
+        owners = create_users(count // 20 + 1)
+        for owner in owners:
+            create_event(owner, total_tickets=1000)
+        templates = list(Event.objects.select_related('artist', 'venue'))
+        start = timezone.now() + timedelta(days=30)
+        Event.objects.bulk_create(
+            Event(
+                artist=templates[i % len(templates)].artist, venue=templates[i % len(templates)].venue,
+                title=f'Night {i}', description='Benchmark event', date_time=start + timedelta(hours=i),
+                duration=120, ticket_price=Decimal('5000.00'), total_tickets=1000, available_tickets=1000,
+                status='published',
+            )
+            for i in range(count - len(templates))
+        )
+
+        self.stdout.write(f"page size:   {page_size}, {rounds} pages per path")
+        self.compare('events', Event.objects.order_by('date_time', 'pk'), EventSerializer, EventReader(),
+                     page_size, rounds)
+        self.compare('venues', Venue.objects.order_by('pk'), VenueSerializer, VenueReader(), page_size, rounds)
+
+    def compare(self, name, queryset, serializer_class, reader, page_size, rounds):
+        renderer = JSONRenderer()
+        pages = [slice(start, start + page_size) for start in range(0, queryset.count(), page_size)]
+        with timer() as serialized:
+            for page in range(rounds):
+                instances = optimize(queryset, serializer_class)[pages[page % len(pages)]]
+                expected = renderer.render(serializer_class(instances, many=True).data)
+        with timer() as flat:
+            for page in range(rounds):
+                rows = reader.rows(queryset)[pages[page % len(pages)]]
+                rendered = renderer.render(reader.render(rows))
+
+        self.stdout.write(f"{name + ':':<12} serializer {serialized['elapsed'] / rounds * 1000:.2f} ms/page, "
+                          f"flat {flat['elapsed'] / rounds * 1000:.2f} ms/page, "
+                          f"{serialized['elapsed'] / flat['elapsed']:.1f}x")
+        if rendered != expected:
+            self.stderr.write(self.style.ERROR(f"Flat {name} output differs from the serializer output"))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from events import inventory
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Spread leftover stock evenly over the shards of every sharded event."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help="Only rebalance this event.")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, rebalancing every INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            events = Event.objects.filter(inventory_shards__gt=0)
+            if options['event']:
+                events = events.filter(pk=options['event'])
+            for event_id in events.values_list('pk', flat=True):
+                inventory.rebalance(event_id)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from events import cards
+
+
+class Command(BaseCommand):
+    help = "Recompute every event card from its event, artist, venue and inventory shards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=cards.REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = cards.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} event cards"))
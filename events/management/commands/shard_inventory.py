@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events import inventory
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Split an event's ticket inventory into counter shards (0 shards turns sharding off)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if options['shards'] < 0:
+            raise CommandError("--shards must be 0 or more")
+        try:
+            inventory.enable_sharding(options['event_id'], options['shards'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event_id']} does not exist")
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Event {options['event_id']} now uses {options['shards']} inventory shards"
+        ))
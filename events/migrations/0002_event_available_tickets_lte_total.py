@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.CheckConstraint(check=models.Q(('available_tickets__lte', models.F('total_tickets'))), name='event_available_tickets_lte_total'),
+        ),
+    ]
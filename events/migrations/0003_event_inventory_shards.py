@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 13:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_event_available_tickets_lte_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='inventory_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of inventory counter shards, 0 keeps all stock on the event row'),
+        ),
+        migrations.CreateModel(
+            name='EventInventoryShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('available', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='events.event')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='eventinventoryshard',
+            constraint=models.UniqueConstraint(fields=('event', 'index'), name='event_inventory_shard_unique_index'),
+        ),
+    ]
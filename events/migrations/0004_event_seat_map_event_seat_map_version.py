@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_inventory_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='seat_map',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='seat_map_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_event_seat_map_event_seat_map_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'date_time', 'id'], name='event_status_date_time'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['venue', 'date_time', 'id'], name='event_venue_date_time'),
+        ),
+    ]
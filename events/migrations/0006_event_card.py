@@ -0,0 +1,63 @@
+# Generated by Django 4.2 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def build_cards(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    EventCard = apps.get_model('events', 'EventCard')
+    EventInventoryShard = apps.get_model('events', 'EventInventoryShard')
+    shard_stock = EventInventoryShard.objects.filter(event=models.OuterRef('pk')).values('event').annotate(
+        total=models.Sum('available')
+    ).values('total')
+    rows = Event.objects.annotate(
+        stock=models.F('available_tickets') + Coalesce(models.Subquery(shard_stock), 0)
+    ).values_list(
+        'pk', 'stock', 'status', 'title', 'date_time', 'ticket_price', 'artist_id', 'artist__name',
+        'artist__genres', 'venue_id', 'venue__name', 'venue__city',
+    )
+    EventCard.objects.bulk_create(
+        (EventCard(
+            event_id=pk, available_tickets=stock, status=status, title=title, date_time=date_time,
+            ticket_price=ticket_price, artist_id=artist_id, artist_name=artist_name, genres=genres,
+            venue_id=venue_id, venue_name=venue_name, venue_city=venue_city,
+        ) for pk, stock, status, title, date_time, ticket_price, artist_id, artist_name, genres, venue_id,
+            venue_name, venue_city in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artist', '0002_initial'),
+        ('venue', '0003_venue_version'),
+        ('events', '0005_event_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCard',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='events.event')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('published', 'Published'), ('cancelled', 'Cancelled'), ('completed', 'Completed')], max_length=20)),
+                ('title', models.CharField(max_length=255)),
+                ('date_time', models.DateTimeField()),
+                ('ticket_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('available_tickets', models.PositiveIntegerField(help_text='Stock including the inventory shards')),
+                ('artist_name', models.CharField(max_length=255)),
+                ('genres', models.JSONField(default=list)),
+                ('venue_name', models.CharField(max_length=255)),
+                ('venue_city', models.CharField(max_length=100)),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='artist.artist')),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='venue.venue')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='eventcard',
+            index=models.Index(fields=['status', 'date_time', 'event'], name='event_card_status_date_time'),
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 14:13
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_ends_at(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    events = list(Event.objects.only('date_time', 'duration'))
+    for event in events:
+        event.ends_at = event.date_time + timedelta(minutes=event.duration)
+    Event.objects.bulk_update(events, ['ends_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_event_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['artist', 'date_time', 'ends_at'], name='event_artist_interval'),
+        ),
+        migrations.RunPython(fill_ends_at, migrations.RunPython.noop),
+    ]
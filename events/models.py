@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.db import models
 from artist.models import Artist
 from venue.models import Venue
@@ -17,17 +19,93 @@ class Event(models.Model):
     description = models.TextField()
     date_time = models.DateTimeField()
     duration = models.PositiveIntegerField(help_text="Duration in minutes")
+    ends_at = models.DateTimeField(null=True, editable=False)  # date_time + duration, for overlap queries
     ticket_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_tickets = models.PositiveIntegerField()
     available_tickets = models.PositiveIntegerField()
     status = models.CharField(max_length=20, choices=EVENT_STATUS, default='draft')
+    inventory_shards = models.PositiveSmallIntegerField(
+        default=0, help_text="Number of inventory counter shards, 0 keeps all stock on the event row"
+    )
+    seat_map = models.BinaryField(null=True, blank=True, editable=False)  # Taken seats, see events.seating
+    seat_map_version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(available_tickets__lte=models.F('total_tickets')),
+                name='event_available_tickets_lte_total',
+            ),
+        ]
+        indexes = [  # Keyset pagination of the event lists
+            models.Index(fields=['status', 'date_time', 'id'], name='event_status_date_time'),
+            models.Index(fields=['venue', 'date_time', 'id'], name='event_venue_date_time'),
+            models.Index(fields=['artist', 'date_time', 'ends_at'], name='event_artist_interval'),
+        ]
+
     def __str__(self):
         return f"{self.title} at {self.venue.name}"
 
     def save(self, *args, **kwargs):
         if not self.pk:  # New event
+            if self.venue.seat_layout:  # Assigned seating sells exactly the venue's seats
+                from .seating import compile_layout
+                seatmap = compile_layout(self.venue.seat_layout)
+                self.seat_map = seatmap.empty()
+                self.total_tickets = seatmap.capacity
             self.available_tickets = self.total_tickets
-        super().save(*args, **kwargs)
\ No newline at end of file
+        self.ends_at = self.date_time + timedelta(minutes=self.duration)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date_time', 'duration'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'ends_at'}
+        super().save(*args, **kwargs)
+
+    def tickets_left(self):
+        # Sharded events keep part of their stock in EventInventoryShard rows
+        if not self.inventory_shards:
+            return self.available_tickets
+        if 'shards' in getattr(self, '_prefetched_objects_cache', {}):
+            sharded = sum(shard.available for shard in self.shards.all())
+        else:
+            sharded = self.shards.aggregate(total=models.Sum('available'))['total'] or 0
+        return self.available_tickets + sharded
+
+
+class EventCard(models.Model):
+    """What a catalog card shows of an event, copied from its artist and venue by events.cards."""
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    status = models.CharField(max_length=20, choices=Event.EVENT_STATUS)
+    title = models.CharField(max_length=255)
+    date_time = models.DateTimeField()
+    ticket_price = models.DecimalField(max_digits=10, decimal_places=2)
+    available_tickets = models.PositiveIntegerField(help_text="Stock including the inventory shards")
+    artist = models.ForeignKey(Artist, on_delete=models.CASCADE, related_name='+')
+    artist_name = models.CharField(max_length=255)
+    genres = models.JSONField(default=list)
+    venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='+')
+    venue_name = models.CharField(max_length=255)
+    venue_city = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'date_time', 'event'], name='event_card_status_date_time'),
+        ]
+
+    def __str__(self):
+        return f"Card of {self.title}"
+
+
+class EventInventoryShard(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='shards')
+    index = models.PositiveSmallIntegerField()
+    available = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'index'], name='event_inventory_shard_unique_index'),
+        ]
+
+    def __str__(self):
+        return f"Shard {self.index} of event #{self.event_id}"
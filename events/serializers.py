@@ -1,13 +1,18 @@
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
-from .models import Event
+from django.db.models import F, Sum
+from . import inventory
+from .models import Event, EventCard, EventInventoryShard
 from artist.serializers import ArtistSerializer
 from venue.serializers import VenueSerializer
 from artist.models import Artist
 from venue.models import Venue
+from musicapp.flat import FlatReader
+from musicapp.sparse import SparseFieldsMixin, sparse_params
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     artist = ArtistSerializer(read_only=True)
     venue = VenueSerializer(read_only=True)
     artist_id = serializers.PrimaryKeyRelatedField(
@@ -19,8 +24,16 @@ class EventSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Event
-        fields = '__all__'
-        read_only_fields = ['available_tickets', 'created_at', 'updated_at']
+        exclude = ['seat_map', 'seat_map_version']
+        read_only_fields = ['available_tickets', 'inventory_shards', 'created_at', 'updated_at']
+        prefetch_related = {'available_tickets': ['shards']}  # Read by to_representation for sharded events
+        required_columns = ['id', 'inventory_shards']
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        if instance.inventory_shards and 'available_tickets' in representation:
+            representation['available_tickets'] = instance.tickets_left()
+        return representation
 
     def validate(self, data):
         if 'date_time' in data and data['date_time'] <= timezone.now():
@@ -37,4 +50,129 @@ class EventSerializer(serializers.ModelSerializer):
             if conflicting_events.exists():
                 raise serializers.ValidationError("Venue is already booked for this date")
 
-        return data
\ No newline at end of file
+        total = data.get('total_tickets')
+        if self.instance is not None and total is not None and total != self.instance.total_tickets:
+            if self.instance.seat_map is not None:
+                raise serializers.ValidationError("Events with assigned seating sell exactly the venue's seats")
+            sold = self.instance.total_tickets - self.instance.tickets_left()
+            if total < sold:
+                raise serializers.ValidationError(f"Total tickets cannot be fewer than the {sold} already sold")
+
+        return data
+
+    def update(self, instance, validated_data):
+        # The rest of the row is saved without available_tickets, which bookings move concurrently
+        total = validated_data.pop('total_tickets', instance.total_tickets)
+        with transaction.atomic():
+            if total != instance.total_tickets:
+                self.resize(instance, total)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
+    def resize(self, instance, total):
+        """Move total_tickets and the unsold stock by the same delta in one guarded UPDATE."""
+        delta = total - instance.total_tickets
+        shards = instance.inventory_shards
+        if shards and delta < 0:
+            inventory.enable_sharding(instance.pk, 0)  # Gathers the unsold stock on the event row
+        resized = Event.objects.filter(pk=instance.pk, available_tickets__gte=max(0, -delta)).update(
+            total_tickets=F('total_tickets') + delta, available_tickets=F('available_tickets') + delta
+        )
+        if not resized:  # Tickets were sold since validate() looked
+            raise serializers.ValidationError("Total tickets cannot be fewer than the tickets already sold")
+        if shards and delta < 0:
+            inventory.enable_sharding(instance.pk, shards)
+        instance.refresh_from_db(fields=['total_tickets', 'available_tickets'])
+        getattr(instance, '_prefetched_objects_cache', {}).pop('shards', None)
+
+
+class EventReader(FlatReader):
+    serializer_class = EventSerializer
+
+    def finalize(self, items, rows):
+        # Same as EventSerializer.to_representation, one query for every sharded event on the page
+        pk, shards = self.lookups.index('id'), self.lookups.index('inventory_shards')
+        sharded = {row[pk]: item for row, item in zip(rows, items) if row[shards] and 'available_tickets' in item}
+        if not sharded:
+            return
+        totals = EventInventoryShard.objects.filter(event_id__in=sharded).values_list('event_id').annotate(
+            total=Sum('available')
+        )
+        for event_id, total in totals:
+            sharded[event_id]['available_tickets'] += total or 0
+
+
+class EventCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='event_id', read_only=True)
+
+    class Meta:
+        model = EventCard
+        fields = [
+            'id', 'title', 'date_time', 'ticket_price', 'available_tickets', 'artist', 'artist_name', 'genres',
+            'venue', 'venue_name', 'venue_city',
+        ]
+
+
+class EventCardReader(FlatReader):
+    serializer_class = EventCardSerializer
+
+
+# EventSerializer field: the EventCardSerializer field holding it, in the order EventSerializer renders them
+CARD_EVENT_FIELDS = {
+    'id': 'id',
+    'artist': 'artist',
+    'artist.id': 'artist',
+    'artist.name': 'artist_name',
+    'artist.genres': 'genres',
+    'venue': 'venue',
+    'venue.id': 'venue',
+    'venue.name': 'venue_name',
+    'venue.city': 'venue_city',
+    'title': 'title',
+    'date_time': 'date_time',
+    'ticket_price': 'ticket_price',
+    'available_tickets': 'available_tickets',
+}
+
+
+def card_fields(request):
+    """The request's ``?fields=`` of the event list when event cards hold them all, None otherwise.
+
+    The full event shape nests the artist's user and the venue's owner, which
+    no card holds, so only responses trimmed with ``?fields=`` come from cards.
+    """
+    spec = sparse_params(request)
+    if spec is None or spec[0] is None:
+        return None
+    fields, expand = spec
+    dotted = {name.split('.')[0] for name in fields if '.' in name}
+    # Expanding a relation without naming its fields, or naming it bare as well, renders all of it
+    if not fields <= CARD_EVENT_FIELDS.keys() or expand != dotted or fields & dotted:
+        return None
+    return fields
+
+
+class EventCardListReader(EventCardReader):
+    """Render event cards in the ``EventSerializer`` shape of ``fields``, as returned by ``card_fields``."""
+
+    def __init__(self, fields):
+        super().__init__()
+        self.fields = [
+            (name.split('.'), source) for name, source in CARD_EVENT_FIELDS.items() if name in fields
+        ]
+
+    def render(self, rows):
+        items = []
+        for card in super().render(rows):
+            item = {}
+            for path, source in self.fields:
+                value = card[source]
+                if len(path) == 1:
+                    item[path[0]] = value
+                else:
+                    # Artist.genres is in ArtistSerializer's empty_list_fields
+                    item.setdefault(path[0], {})[path[1]] = (value or []) if path[1] == 'genres' else value
+            items.append(item)
+        return items
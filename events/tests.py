@@ -1,3 +1,387 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from musicapp.benchmarking import create_event, create_users
+from musicapp.testing import BudgetTestCase, seed_catalogue
+
+from . import inventory, seating
+from .models import Event, EventCard
+
+
+class EventQueryBudgetTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=20, bookings_per_event=0)
+        cls.seated = cls.data['owners'][0].venues.get().events.first()
+        cls.sharded = cls.data['owners'][1].venues.get().events.get(inventory_shards__gt=0)
+
+    def test_list(self):
+        self.assertBudget('/api/events/', max_queries=4, max_seconds=0.3)
+
+    def test_retrieve_sharded(self):
+        self.assertBudget(f'/api/events/{self.sharded.pk}/', max_queries=3, max_seconds=0.1, paginated=False)
+
+    def test_artist_events(self):
+        self.assertBudget(f'/api/events/{self.seated.pk}/artist_events/', max_queries=2, max_seconds=0.1,
+                          paginated=False)
+
+    def test_seats(self):
+        self.assertBudget(f'/api/events/{self.seated.pk}/seats/', max_queries=2, max_seconds=0.1,
+                          paginated=False, count=4)
+
+
+class EventSparseFieldsTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=3, bookings_per_event=0)
+        cls.sharded = cls.data['owners'][1].venues.get().events.get(inventory_shards__gt=0)
+
+    def test_fields_skip_unrequested_columns(self):
+        response, sql, _ = self.request('/api/events/', fields='id,title')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title'})
+        self.assertNotIn('description', sql[-1])
+        self.assertNotIn('artist_artist', sql[-1])
+
+    def test_unexpanded_relations_collapse_to_ids(self):
+        response, _, _ = self.request(f'/api/events/{self.sharded.pk}/', expand='venue')
+        data = response.json()
+        self.assertEqual(data['artist'], self.sharded.artist_id)
+        self.assertEqual(data['venue']['owner'], self.sharded.venue.owner_id)
+        self.assertEqual(data['available_tickets'], self.sharded.tickets_left())
+
+    def test_dotted_fields_expand_their_parent(self):
+        response, _, _ = self.request('/api/events/', fields='title,venue.city')
+        self.assertEqual(response.json()['results'][0]['venue'], {'city': 'Lagos'})
+
+    def test_dotted_fields_on_retrieve(self):
+        response, _, _ = self.request(f'/api/events/{self.sharded.pk}/', fields='artist.name,venue.name')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {'artist': {'name': self.sharded.artist.name},
+                                           'venue': {'name': self.sharded.venue.name}})
+
+    def test_fields_held_by_cards_read_the_card_index(self):
+        for fields in ('id,title,date_time,ticket_price,available_tickets', 'id,artist,venue',
+                       'title,artist.name,artist.genres,venue.id,venue.name,venue.city'):
+            response, sql, _ = self.request('/api/events/', fields=fields, page_size=50)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertIn('events_eventcard', sql[-1])
+            self.assertNotIn('JOIN', sql[-1])
+            # Asking for a field no card holds as well serves the joined tables
+            full, sql, _ = self.request('/api/events/', fields=f'{fields},description', page_size=50)
+            self.assertNotIn('events_eventcard', sql[-1])
+            for item in full.json()['results']:
+                del item['description']
+            self.assertEqual(response.json()['results'], full.json()['results'])
+
+    def test_full_shape_without_parameters(self):
+        response, _, _ = self.request(f'/api/events/{self.sharded.pk}/')
+        self.assertEqual(response.json()['artist']['user']['id'], self.sharded.artist.user_id)
+
+
+class EventConditionalGetTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=3, bookings_per_event=0)
+        cls.sharded = cls.data['owners'][1].venues.get().events.get(inventory_shards__gt=0)
+
+    def test_unchanged_event_is_not_modified(self):
+        url = f'/api/events/{self.sharded.pk}/'
+        response, _, _ = self.request(url)
+        self.assertIn('max-age=0', response['Cache-Control'])
+        response, sql, _ = self.request(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(sql), 1)
+
+    def test_booking_a_shard_changes_the_etag(self):
+        from booking.services import reserve_tickets
+
+        url = f'/api/events/{self.sharded.pk}/'
+        etag = self.request(url)[0]['ETag']
+        reserve_tickets(self.sharded, 2)
+        self.assertEqual(self.request(url, headers={'If-None-Match': etag})[0].status_code, 200)
+
+    def test_saving_a_venue_changes_the_list_etag(self):
+        etag = self.request('/api/events/')[0]['ETag']
+        venue = self.sharded.venue
+        venue.name = 'Renamed Hall'
+        venue.save()
+        response, _, _ = self.request('/api/events/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_follows_updated_at(self):
+        response, _, _ = self.request('/api/events/')
+        response, _, _ = self.request('/api/events/', headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+
+class EventSingleFlightTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=2, bookings_per_event=0)
+        cls.sharded = cls.data['owners'][1].venues.get().events.get(inventory_shards__gt=0)
+
+    def test_concurrent_callers_share_one_computation(self):
+        import threading
+        import time
+
+        from musicapp.single_flight import coalesce
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 200, {'title': 'Night'}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(coalesce('single-flight:test', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [(200, {'title': 'Night'})] * 8)
+
+    def test_repeated_retrieve_only_runs_the_validator(self):
+        url = f'/api/events/{self.sharded.pk}/'
+        first, _, _ = self.request(url)
+        response, sql, _ = self.request(url)
+        self.assertEqual(response.json(), first.json())
+        self.assertEqual(len(sql), 1)
+
+    def test_changed_event_is_recomputed(self):
+        url = f'/api/events/{self.sharded.pk}/'
+        self.request(url)
+        self.sharded.title = 'Rescheduled'
+        self.sharded.save()
+        self.assertEqual(self.request(url)[0].json()['title'], 'Rescheduled')
+
+
+class EventCardTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=4, bookings_per_event=0)
+        cls.seated = cls.data['owners'][0].venues.get().events.first()
+        cls.sharded = cls.data['owners'][1].venues.get().events.get(inventory_shards__gt=0)
+        cls.general = cls.data['owners'][2].venues.get().events.first()
+
+    def card(self, event):
+        from events.models import EventCard
+
+        return EventCard.objects.get(pk=event.pk)
+
+    def test_list(self):
+        self.assertBudget('/api/events/cards/', max_queries=2, max_seconds=0.1)
+        self.assertBudget('/api/events/cards/', max_queries=1, max_seconds=0.1, cursor='')
+
+    def test_card_shape(self):
+        response, _, _ = self.request('/api/events/cards/', page_size=1)
+        event = self.seated
+        self.assertEqual(response.json()['results'][0], {
+            'id': event.pk, 'title': event.title, 'date_time': response.json()['results'][0]['date_time'],
+            'ticket_price': '5000.00', 'available_tickets': 100, 'artist': event.artist_id,
+            'artist_name': event.artist.name, 'genres': ['afrobeats'], 'venue': event.venue_id,
+            'venue_name': event.venue.name, 'venue_city': 'Lagos',
+        })
+
+    def test_bookings_move_card_stock(self):
+        from booking.services import cancel_booking, create_booking
+
+        for event in (self.seated, self.sharded, self.general):
+            booking = create_booking(event=event, user=self.data['customer'], tickets=3, payment_method='card')
+            self.assertEqual(self.card(event).available_tickets, event.tickets_left())
+            cancel_booking(booking)
+            self.assertEqual(self.card(event).available_tickets, 100)
+
+    def test_renaming_an_artist_updates_its_cards(self):
+        artist = self.general.artist
+        artist.name = 'Renamed'
+        artist.save()
+        self.assertEqual(self.card(self.general).artist_name, 'Renamed')
+
+    def test_rebuild_repairs_drift(self):
+        from django.core.management import call_command
+        from events.models import EventCard
+
+        EventCard.objects.update(available_tickets=0, title='')
+        call_command('rebuild_event_cards', stdout=StringIO())
+        self.assertEqual(self.card(self.sharded).available_tickets, self.sharded.tickets_left())
+        self.assertEqual(self.card(self.general).title, self.general.title)
+
+
+class EventResizeTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=2, bookings_per_event=0)
+        events = cls.data['owners'][1].venues.get().events
+        cls.event = events.filter(inventory_shards=0).first()
+        cls.sharded = events.get(inventory_shards__gt=0)
+        cls.seated = cls.data['owners'][0].venues.get().events.first()
+
+    def patch(self, event, **data):
+        self.client.force_authenticate(self.data['owners'][1])
+        return self.client.patch(f'/api/events/{event.pk}/', data, format='json')
+
+    def sell(self, event, tickets):
+        from booking.services import reserve_tickets
+        reserve_tickets(event, tickets)
+
+    def test_total_below_sold_is_rejected(self):
+        self.sell(self.event, 30)
+        response = self.patch(self.event, total_tickets=0)
+        self.assertEqual(response.status_code, 400)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.total_tickets, self.event.available_tickets), (100, 70))
+
+    def test_stock_moves_with_the_total(self):
+        self.sell(self.event, 30)
+        self.assertEqual(self.patch(self.event, total_tickets=40).status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.total_tickets, self.event.available_tickets), (40, 10))
+        self.assertEqual(self.patch(self.event, total_tickets=140, title='Bigger').json()['available_tickets'], 110)
+
+    def test_sharded_stock_is_gathered_before_shrinking(self):
+        self.sell(self.sharded, 10)
+        response = self.patch(self.sharded, total_tickets=20)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['available_tickets'], 10)
+        self.sharded.refresh_from_db()
+        self.assertEqual((self.sharded.available_tickets, self.sharded.tickets_left()), (0, 10))
+
+    def test_seated_total_follows_the_layout(self):
+        self.client.force_authenticate(self.data['owners'][0])
+        response = self.client.patch(f'/api/events/{self.seated.pk}/', {'total_tickets': 50}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class EventInventoryShardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner, = create_users(1)
+        cls.event = create_event(owner, total_tickets=10)
+
+    def shards(self):
+        return list(self.event.shards.order_by('index').values_list('available', flat=True))
+
+    def test_enabling_spreads_the_stock(self):
+        inventory.enable_sharding(self.event.pk, 4)
+        self.event.refresh_from_db()
+        self.assertEqual(self.shards(), [3, 3, 2, 2])
+        self.assertEqual((self.event.available_tickets, self.event.tickets_left()), (0, 10))
+
+        inventory.enable_sharding(self.event.pk, 0)
+        self.event.refresh_from_db()
+        self.assertEqual((self.shards(), self.event.available_tickets), ([], 10))
+
+    def test_claim_drains_several_shards_when_none_covers_it(self):
+        inventory.enable_sharding(self.event.pk, 4)
+        self.assertTrue(inventory.claim(self.event.pk, 4, 9))
+        self.assertEqual(sum(self.shards()), 1)
+        self.assertFalse(inventory.claim(self.event.pk, 4, 2))
+        self.assertEqual(sum(self.shards()), 1)
+
+    def test_release_and_rebalance(self):
+        from booking.services import release_tickets_bulk
+
+        inventory.enable_sharding(self.event.pk, 2)
+        self.assertTrue(inventory.claim(self.event.pk, 2, 5))
+        self.assertTrue(inventory.release(self.event.pk, 2, 2))
+        release_tickets_bulk({self.event.pk: 3})  # Gives stock back to the event row
+        inventory.rebalance(self.event.pk)
+        self.event.refresh_from_db()
+        self.assertEqual((self.shards(), self.event.available_tickets), ([5, 5], 0))
+
+    def test_reserve_falls_back_to_the_event_row(self):
+        from booking.services import SoldOut, release_tickets_bulk, reserve_tickets
+
+        inventory.enable_sharding(self.event.pk, 2)
+        inventory.claim(self.event.pk, 2, 10)
+        release_tickets_bulk({self.event.pk: 2})
+        self.event.refresh_from_db()
+        reserve_tickets(self.event, 2)
+        with self.assertRaises(SoldOut):
+            reserve_tickets(self.event, 1)
+
+    def test_seated_events_cannot_be_sharded(self):
+        venue = self.event.venue
+        venue.seat_layout = {'sections': [{'name': 'Stalls', 'rows': [{'label': 'A', 'seats': 4}]}]}
+        venue.save()
+        seated = Event.objects.create(
+            artist=self.event.artist, venue=venue, title='Seated', description='Seated show',
+            date_time=self.event.date_time + timedelta(days=1), duration=60, ticket_price=Decimal('10.00'),
+            total_tickets=0, status='published',
+        )
+        with self.assertRaises(ValueError):
+            inventory.enable_sharding(seated.pk, 2)
+
+
+class SeatingTests(TestCase):
+    LAYOUT = {'sections': [{'name': 'Floor', 'rows': [{'label': 'A', 'seats': 5}, {'label': 'B', 'seats': 4}]}]}
+
+    @classmethod
+    def setUpTestData(cls):
+        owner, = create_users(1)
+        venue = create_event(owner, total_tickets=9).venue
+        venue.seat_layout = cls.LAYOUT
+        venue.save()
+        cls.event = create_event(owner, total_tickets=0)
+
+    def stock(self):
+        return (Event.objects.get(pk=self.event.pk).available_tickets,
+                EventCard.objects.get(pk=self.event.pk).available_tickets)
+
+    def test_best_block_prefers_early_rows_and_the_middle(self):
+        seatmap = seating.compile_layout(self.LAYOUT)
+        self.assertEqual((seatmap.capacity, seatmap.size), (9, 11))
+        self.assertEqual(seatmap.best_block(0, 3), 1)
+        self.assertEqual(seatmap.best_block(0b1110, 2), 7)  # A has 2 seats left, but not together
+        self.assertEqual(seatmap.best_block(0b1110, 1), 0)
+        self.assertIsNone(seatmap.best_block(0, 6))  # Blocks never span rows
+        self.assertIsNone(seatmap.best_block(0, 0))
+        self.assertEqual([seatmap.label(seat) for seat in (0, 4, 6, 9)],
+                         ['Floor-A-1', 'Floor-A-5', 'Floor-B-1', 'Floor-B-4'])
+
+    def test_claim_and_release_move_seats_and_stock(self):
+        self.assertEqual(self.event.total_tickets, 9)
+        self.assertEqual(seating.claim(self.event.pk, 3), [1, 2, 3])
+        self.assertEqual(seating.claim(self.event.pk, 2), [7, 8])
+        self.assertIsNone(seating.claim(self.event.pk, 2))
+        self.assertEqual(seating.find_seats(self.event.pk, 1), [0])
+        self.assertEqual(self.stock(), (4, 4))
+
+        seating.release(self.event.pk, [1, 2, 3])
+        seating.release(self.event.pk, [1, 2])  # Already free, nothing to give back
+        self.assertEqual(self.stock(), (7, 7))
+        self.assertEqual(seating.claim(self.event.pk, 5), [0, 1, 2, 3, 4])
+
+    def test_claim_retries_after_losing_the_swap(self):
+        store = seating._store
+        raced = []
+
+        def concurrent_claim_first(*args):
+            if not raced:  # Another buyer takes the same seats between our read and our write
+                raced.append(None)
+                raced[0] = seating.claim(self.event.pk, 3)
+            return store(*args)
+
+        with mock.patch.object(seating, '_store', side_effect=concurrent_claim_first) as stored:
+            self.assertEqual(seating.claim(self.event.pk, 3), [6, 7, 8])
+        self.assertEqual(raced, [[1, 2, 3]])
+        self.assertEqual(stored.call_count, 3)  # Ours lost, the racer's, ours again
+        self.assertEqual(self.stock(), (3, 3))
+
+    def test_claim_gives_up_under_endless_contention(self):
+        with mock.patch.object(seating, '_store', return_value=0) as stored:
+            self.assertIsNone(seating.claim(self.event.pk, 1))
+            with self.assertRaises(RuntimeError):
+                seating.release(self.event.pk, [0])
+        self.assertEqual(stored.call_count, 2 * seating.MAX_CLAIM_ATTEMPTS)
+        self.assertEqual(self.stock(), (9, 9))
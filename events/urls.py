@@ -23,6 +23,14 @@ urlpatterns = [
         'get': 'list'
     }), name='event-list-create'),
 
+    path('api/events/nearby/', EventViewSet.as_view({
+        'get': 'nearby'
+    }), name='event-nearby'),
+
+    path('api/events/cards/', EventViewSet.as_view({
+        'get': 'cards'
+    }), name='event-cards'),
+
     path('api/events/<int:pk>/', EventViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
@@ -30,8 +38,12 @@ urlpatterns = [
         'delete': 'destroy'
     }), name='event-detail'),
 
+    path('api/events/<int:pk>/seats/', EventViewSet.as_view({
+        'get': 'seats'
+    }), name='event-seats'),
+
     path('api/events/<int:pk>/artist_events/', EventViewSet.as_view({
-        'get': 'artist_events'
+        'get': 'artists_events'
     }), name='event-artist-events'),
 
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
@@ -1,23 +1,28 @@
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Event
-from .serializers import EventSerializer
+from .models import Event, EventCard, EventInventoryShard
+from .serializers import (
+    EventCardListReader, EventCardReader, EventCardSerializer, EventSerializer, EventReader, card_fields
+)
+from musicapp.prefetch import optimize
+from musicapp.response_cache import cached_response
+from musicapp.conditional import conditional, user_version
+from musicapp.single_flight import single_flight
+from . import seating
 from artist.models import Artist
 from artist.serializers import ArtistSerializer
+from venue import geo
+from venue.models import Venue
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from rest_framework.pagination import PageNumberPagination
+from musicapp.pagination import StandardResultsSetPagination
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
 class EventViewSet(viewsets.ViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -26,12 +31,61 @@ class EventViewSet(viewsets.ViewSet):
         operation_summary="Retrieve a paginated list of published events.",
         responses={200: EventSerializer(many=True)}
     )
+    @conditional(lambda self, request: event_list_validators(self.published()), tags=('event', 'artist', 'venue', 'user'))
+    @cached_response('event', 'artist', 'venue', 'user')
     def list(self, request):
-        events = Event.objects.filter(status='published')
         paginator = StandardResultsSetPagination()
-        events = paginator.paginate_queryset(events, request)
-        serializer = EventSerializer(events, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        fields = card_fields(request)
+        if fields is not None:
+            # Same items and order from one scan of the card index, see events.cards
+            reader = EventCardListReader(fields)
+            rows = paginator.paginate_queryset(reader.rows(self.published_cards()), request)
+            return paginator.get_paginated_response(reader.render(rows))
+        reader = EventReader(request)
+        rows = paginator.paginate_queryset(reader.rows(self.published()), request)
+        return paginator.get_paginated_response(reader.render(rows))
+
+    def published(self):
+        return Event.objects.filter(status='published').order_by('date_time', 'pk')
+
+    def published_cards(self):
+        return EventCard.objects.filter(status='published').order_by('date_time', 'event_id')
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve a paginated list of catalog cards of published events.",
+        responses={200: EventCardSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    def cards(self, request):
+        # One scan of the card index, see events.cards
+        reader = EventCardReader(request)
+        paginator = StandardResultsSetPagination()
+        rows = paginator.paginate_queryset(reader.rows(self.published_cards()), request)
+        return paginator.get_paginated_response(reader.render(rows))
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve upcoming published events at venues within ?radius= km of ?near=lat,lng.",
+        responses={200: EventSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        point = geo.point_params(request)
+        if point is None:
+            return Response({"error": "near is required"}, status=status.HTTP_400_BAD_REQUEST)
+        venues = geo.within(Venue.objects.all(), *point).values('pk')
+        events = self.published().filter(date_time__gte=timezone.now(), venue__in=venues)
+
+        reader = EventReader(request)
+        paginator = StandardResultsSetPagination()
+        rows = paginator.paginate_queryset(events.values_list(*reader.lookups, 'venue_id'), request)
+        items = reader.render(rows)
+        venue_id = len(reader.lookups)
+        # Distances only for the venues on this page
+        page_venues = Venue.objects.filter(pk__in={row[venue_id] for row in rows})
+        distances = {pk: distance for distance, pk in geo.rank(page_venues, point[0], point[1])}
+        for item, row in zip(items, rows):
+            item['distance_km'] = round(distances[row[venue_id]], 3)
+        return paginator.get_paginated_response(items)
 
     @swagger_auto_schema(
         operation_summary="Create a new event.",
@@ -49,9 +103,11 @@ class EventViewSet(viewsets.ViewSet):
         operation_summary="Retrieve a specific event by ID.",
         responses={200: EventSerializer()}
     )
+    @conditional(lambda self, request, pk=None: event_validators(pk))
+    @single_flight
     def retrieve(self, request, pk=None):
-        event = get_object_or_404(Event.objects.all(), pk=pk)
-        serializer = EventSerializer(event)
+        event = get_object_or_404(optimize(Event.objects.all(), EventSerializer, request), pk=pk)
+        serializer = EventSerializer(event, context={'request': request})
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -60,7 +116,7 @@ class EventViewSet(viewsets.ViewSet):
         responses={200: EventSerializer()}
     )
     def update(self, request, pk=None):
-        event = get_object_or_404(Event.objects.all(), pk=pk)
+        event = get_object_or_404(optimize(Event.objects.all(), EventSerializer), pk=pk)
         serializer = EventSerializer(event, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -73,7 +129,7 @@ class EventViewSet(viewsets.ViewSet):
         responses={200: EventSerializer()}
     )
     def partial_update(self, request, pk=None):
-        event = get_object_or_404(Event.objects.all(), pk=pk)
+        event = get_object_or_404(optimize(Event.objects.all(), EventSerializer), pk=pk)
         serializer = EventSerializer(event, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -89,6 +145,31 @@ class EventViewSet(viewsets.ViewSet):
         event.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @swagger_auto_schema(
+        operation_summary="Find the best block of adjacent free seats for an event.",
+        responses={200: "Seat numbers and labels of the best block"}
+    )
+    @action(detail=True, methods=['get'])
+    def seats(self, request, pk=None):
+        event = get_object_or_404(Event.objects.select_related('venue'), pk=pk)
+        if event.seat_map is None:
+            return Response(
+                {"error": "This event has general admission, there is no seat map."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            count = int(request.query_params.get('count', 1))
+        except ValueError:
+            count = 0
+        if count < 1:
+            return Response({"error": "count must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+        seats = seating.find_seats(event.pk, count)
+        return Response({
+            "available_tickets": event.available_tickets,
+            "seats": seats,
+            "labels": seating.labels(event.venue.seat_layout, seats),
+        })
+
     @swagger_auto_schema(
         operation_summary="List artists for a specific event.",
         responses={200: ArtistSerializer(many=True)}
@@ -96,6 +177,35 @@ class EventViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['get'])
     def artists_events(self, request, pk=None):
         event = get_object_or_404(Event.objects.all(), pk=pk)
-        artists = Artist.objects.filter(events=event)
-        serializer = ArtistSerializer(artists, many=True)
+        artists = optimize(Artist.objects.filter(events=event), ArtistSerializer, request)
+        serializer = ArtistSerializer(artists, many=True, context={'request': request})
         return Response(serializer.data)
+
+
+def _with_shard_stock(events):
+    # Stock of sharded events lives in their shards, bookings do not touch available_tickets
+    stock = EventInventoryShard.objects.filter(event=OuterRef('pk')).values('event').annotate(
+        total=Sum('available')
+    ).values('total')
+    return events.annotate(shard_stock=Subquery(stock))
+
+
+def event_validators(pk):
+    row = _with_shard_stock(Event.objects.filter(pk=pk)).values_list(
+        'updated_at', 'available_tickets', 'shard_stock', 'seat_map_version', 'artist__updated_at',
+        'venue__version',
+    ).first()
+    if row is None:
+        return None
+    return (row, user_version()), max(row[0], row[4])
+
+
+def event_list_validators(events):
+    """Aggregates that change whenever an event in ``events`` or anything it embeds changes."""
+    totals = _with_shard_stock(events.order_by()).aggregate(
+        count=Count('pk'), last=Max('pk'), updated=Max('updated_at'), stock=Sum('available_tickets'),
+        shards=Sum('shard_stock'), seats=Sum('seat_map_version'), artists=Max('artist__updated_at'),
+        venues=Sum('venue__version'),
+    )
+    last_modified = max(filter(None, (totals['updated'], totals['artists'])), default=None)
+    return (sorted(totals.items()), user_version()), last_modified
@@ -0,0 +1,74 @@
+"""Helpers shared by the ``bench_*`` management commands."""
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+
+@contextmanager
+def scratch_database(alias=DEFAULT_DB_ALIAS):
+    """Run the benchmark against a throwaway copy of the schema, never the real database.
+
+    SQLite gets a file database so that worker threads share real file locks
+    instead of the shared-cache in-memory database Django uses for tests.
+    """
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    tmpdir = None
+    if connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@contextmanager
+def timer():
+    """Yield a dict whose ``elapsed`` key holds the wall time of the block in seconds."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['elapsed'] = time.perf_counter() - start
+
+
+def create_users(count, prefix='bench'):
+    from authentication.models import CustomUser
+
+    CustomUser.objects.bulk_create(
+        CustomUser(email=f'{prefix}{i}@example.com', last_name=f'User {i}', telephone='+2348031234567')
+        for i in range(count)
+    )
+    return list(CustomUser.objects.filter(email__startswith=prefix).order_by('pk'))
+
+
+def create_event(owner, total_tickets, ticket_price=Decimal('5000.00'), **fields):
+    from artist.models import Artist
+    from events.models import Event
+    from venue.models import Venue
+
+    artist, _ = Artist.objects.get_or_create(
+        user=owner, defaults={'name': 'Bench Artist', 'base_fee': Decimal('100000.00')}
+    )
+    venue, _ = Venue.objects.get_or_create(
+        owner=owner, name='Bench Arena',
+        defaults={'address': '1 Bench Road', 'city': 'Lagos', 'country': 'Nigeria', 'capacity': total_tickets},
+    )
+    fields.setdefault('date_time', timezone.now() + timedelta(days=30))
+    return Event.objects.create(
+        artist=artist, venue=venue, title='Bench Night', description='Benchmark event',
+        duration=120, ticket_price=ticket_price, total_tickets=total_tickets,
+        status='published', **fields
+    )
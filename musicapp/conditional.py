@@ -0,0 +1,87 @@
+"""Conditional GET for catalog endpoints.
+
+``@conditional(validator)`` asks the validator for a few cheap values that
+change whenever the response would, such as ``updated_at``, stock counters,
+the venue ``version`` and aggregates over a list's rows. It answers
+``If-None-Match``/``If-Modified-Since`` with a 304 before the view queries or
+serializes anything. Successful responses carry the ETag, the Last-Modified
+time when the validator has one, and a Cache-Control that lets clients and
+CDNs keep the body while revalidating it.
+
+List validators aggregate over every row the list filters, so they can be
+given the response cache tags of the list. They are then cached next to the
+response and invalidated with it, and a revalidation of a cached list runs no
+query at all. Like the cached response, a cached list validator can miss ticket
+stock for up to RESPONSE_CACHE_TTL.
+
+The ETag is the precise validator and takes precedence when a client sends
+both headers. Last-Modified only follows the ``updated_at`` columns, so it
+misses ticket stock and embedded users.
+"""
+import calendar
+import functools
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .response_cache import _cache, response_key, tag_versions
+
+
+def make_etag(request, parts):
+    # Also vary on everything else that shapes the body: parameters and the negotiated format
+    params = sorted(request.query_params.lists())
+    source = repr((request.path, params, getattr(request, 'accepted_media_type', None), parts))
+    return f'W/"{hashlib.sha1(source.encode()).hexdigest()}"'
+
+
+def user_version():
+    """Changes whenever a user embedded in catalog responses changes; users have no updated_at."""
+    return tag_versions(['user'])[0]
+
+
+def _validate(validator, tags, casefold, view, request, *args, **kwargs):
+    if not tags:
+        return validator(view, request, *args, **kwargs)
+    key = 'conditional:' + response_key(request, tags, casefold)
+    validated = _cache().get(key)
+    if validated is None:
+        validated = validator(view, request, *args, **kwargs)
+        if validated is not None:
+            _cache().set(key, validated, settings.RESPONSE_CACHE_TTL)
+    return validated
+
+
+def conditional(validator, tags=(), casefold=()):
+    """Serve 304s for a viewset GET method from ``validator(view, request, *args, **kwargs)``.
+
+    The validator returns ``(parts, last_modified)``, or None when the object
+    does not exist so the view runs and answers itself. With ``tags`` the
+    result is cached like ``cached_response`` caches a response.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(self, request, *args, **kwargs)
+            validated = _validate(validator, tags, casefold, self, request, *args, **kwargs)
+            if validated is None:
+                return view(self, request, *args, **kwargs)
+            parts, last_modified = validated
+            etag = make_etag(request, parts)
+            timestamp = calendar.timegm(last_modified.utctimetuple()) if last_modified else None
+
+            response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+            if response is None:
+                request.conditional_etag = etag  # Identifies the body for musicapp.single_flight
+                response = view(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_cache_control(response, public=True, max_age=settings.CATALOG_MAX_AGE, must_revalidate=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+"""Read-only fast path that renders ``.values_list()`` rows in a serializer's JSON shape.
+
+``FlatReader`` compiles a serializer class once into a plan of value lookups
+(nested serializers become joined lookups) and per-field converters taken from
+the serializer's own fields, so dates, decimals and choices come out exactly as
+the serializer writes them. Rendering a page is then a loop over tuples with no
+model instances and no serializer instantiation per row.
+
+Fields listed in a serializer's ``Meta.empty_list_fields`` render falsy values
+as ``[]``, the same as the serializer's ``to_representation``. Anything the plan
+cannot express, such as ``SerializerMethodField`` or many=True nesting, raises
+``ImproperlyConfigured`` when the plan is compiled.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+from .prefetch import MAX_SPARSE_PLANS
+from .sparse import sparse_params
+
+# Fields whose to_representation returns database values unchanged
+_PASSTHROUGH = (serializers.IntegerField, serializers.JSONField, serializers.ReadOnlyField, PrimaryKeyRelatedField)
+
+
+# Stands in for the converter of ISO 8601 DateTimeFields in the current timezone, which
+# _render formats itself so the timezone is looked up once per page instead of per value
+_DATETIME = object()
+
+
+def _converter(field):
+    if isinstance(field, _PASSTHROUGH) and not getattr(field, 'binary', False):
+        return None
+    if (isinstance(field, serializers.DateTimeField) and settings.USE_TZ and not hasattr(field, 'timezone')
+            and str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601):
+        return _DATETIME
+    return field.to_representation
+
+
+def _isoformat(value, tz):
+    value = value.astimezone(tz) if value.tzinfo is not None else timezone.make_aware(value, tz)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _compile(serializer, prefix, lookups):
+    """Return ``[(key, index, converter, empty list, subplan)]`` and append the lookups it reads."""
+    empty_list = set(getattr(getattr(serializer, 'Meta', None), 'empty_list_fields', ()))
+    plan = []
+    for key, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField,
+                              serializers.SerializerMethodField)) or field.source == '*':
+            raise ImproperlyConfigured(f"{type(serializer).__name__}.{key} cannot be read from flat rows")
+        lookup = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.BaseSerializer):
+            lookups.append(f'{lookup}__pk')
+            plan.append((key, len(lookups) - 1, None, False, _compile(field, f'{lookup}__', lookups)))
+            continue
+        lookups.append(lookup)
+        plan.append((key, len(lookups) - 1, _converter(field), key in empty_list, None))
+    return plan
+
+
+def _render(plan, row, tz):
+    item = {}
+    for key, index, convert, empty_list, subplan in plan:
+        value = row[index]
+        if subplan is not None:
+            value = None if value is None else _render(subplan, row, tz)
+        elif value is None or convert is None:
+            pass
+        elif convert is _DATETIME:
+            value = _isoformat(value, tz)
+        else:
+            value = convert(value)
+        item[key] = (value or []) if empty_list else value
+    return item
+
+
+class FlatReader:
+    """Render querysets of ``serializer_class``'s model without instantiating models or serializers.
+
+    Pass the request to honour its ``?fields=`` and ``?expand=`` (see
+    ``musicapp.sparse``). Subclasses set ``serializer_class`` and may override
+    ``finalize`` for values the serializer computes in code; the columns those
+    read go in the serializer's ``Meta.required_columns``.
+    """
+    serializer_class = None
+    _plans = {}
+
+    def __init__(self, request=None):
+        serializer = self.serializer_class(context={'request': request})
+        key = (type(self), sparse_params(request))
+        if key not in FlatReader._plans:
+            lookups = []
+            plan = _compile(serializer, '', lookups)
+            for column in getattr(serializer.Meta, 'required_columns', []):
+                if column not in lookups:
+                    lookups.append(column)
+            if key[1] is None or len(FlatReader._plans) < MAX_SPARSE_PLANS:
+                FlatReader._plans[key] = (plan, lookups)
+            self.plan, self.lookups = plan, lookups
+        else:
+            self.plan, self.lookups = FlatReader._plans[key]
+
+    def rows(self, queryset):
+        """``queryset`` as value tuples in plan order, still lazy so it can be paginated."""
+        return queryset.values_list(*self.lookups)
+
+    def render(self, rows):
+        plan, tz = self.plan, timezone.get_current_timezone()
+        items = [_render(plan, row, tz) for row in rows]
+        self.finalize(items, rows)
+        return items
+
+    def finalize(self, items, rows):
+        """Adjust rendered ``items`` in place; ``rows`` are the matching value tuples."""
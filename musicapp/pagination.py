@@ -0,0 +1,220 @@
+"""Pagination shared by the list endpoints.
+
+Page-number pagination (``?page=``) stays the default. Passing ``?cursor=``
+(empty for the first page) switches to keyset pagination: each page is read
+with ``WHERE (date_time, id) > (last seen values)`` on the queryset's own
+ordering, so deep pages cost the same as the first one and there is no
+``COUNT(*)``. Cursors are opaque tokens handed out in ``next``/``previous``.
+
+The ordering must end with the primary key and its columns must not be null.
+Lists that are not querysets, such as rows ranked in Python, are always
+paginated by page number, unless the view reads its rows itself through
+``paginate_keyset``.
+Cursor pages carry a total only when asked with ``?count=exact``,
+``?count=cached`` (an exact count reused for PAGINATION_COUNT_CACHE_TTL) or
+``?count=estimate`` (the query planner's row estimate on PostgreSQL, the
+cached count elsewhere).
+"""
+import base64
+import datetime
+import hashlib
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.db.models.query import ValuesIterable, ValuesListIterable
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def cached_count(queryset):
+    sql, params = queryset.query.sql_with_params()
+    key = 'pagination-count:' + hashlib.sha1(f'{sql}|{params}'.encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, settings.PAGINATION_COUNT_CACHE_TTL)
+
+
+def estimated_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return cached_count(queryset)
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+COUNTS = {'exact': lambda queryset: queryset.count(), 'cached': cached_count, 'estimate': estimated_count}
+
+
+def _ordering(queryset):
+    """``[(field, descending)]`` of ``queryset``, ending with the primary key."""
+    pk = queryset.model._meta.pk
+    ordering = []
+    for name in queryset.query.order_by or ['pk']:
+        if not isinstance(name, str):
+            raise ValueError("Keyset pagination needs an ordering of plain field names")
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        ordering.append((pk.attname if name in ('pk', pk.name) else name, descending))
+    if ordering[-1][0] != pk.attname:
+        ordering.append((pk.attname, ordering[-1][1]))
+    return ordering
+
+
+def _after(ordering, values):
+    """Q for rows strictly after ``values`` in ``ordering``.
+
+    The OR of the per-column conditions is ANDed with a non-strict bound on the
+    first column so the database can start an index range scan there.
+    """
+    condition, equal = Q(), Q()
+    for (field, descending), value in zip(ordering, values):
+        condition |= equal & Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+        equal &= Q(**{field: value})
+    (field, descending), value = ordering[0], values[0]
+    return Q(**{f'{field}__{"lte" if descending else "gte"}': value}) & condition
+
+
+def _cursor_value(value):
+    # Full precision, DjangoJSONEncoder would cut datetimes to milliseconds
+    if isinstance(value, (datetime.date, datetime.time, Decimal)):
+        return str(value) if isinstance(value, Decimal) else value.isoformat()
+    return value
+
+
+def _model_field(model, name):
+    """The field ``name`` refers to, following ``__`` through relations; None for annotations."""
+    field = None
+    for part in name.split('__'):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model
+    return field
+
+
+def _position_values(model, ordering, position):
+    """Cursor ``position`` converted by each ordering field, NotFound when it does not fit them."""
+    if len(position) != len(ordering):
+        raise NotFound("Invalid cursor.")
+    values = []
+    for (name, _), value in zip(ordering, position):
+        field = _model_field(model, name)
+        try:
+            values.append(value if field is None else field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound("Invalid cursor.")
+    return values
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params and isinstance(queryset, QuerySet)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = _ordering(queryset)
+        token = request.query_params[self.cursor_query_param]
+        reverse, position = self.decode_cursor(token) if token else (False, None)
+
+        self.count = None
+        count = request.query_params.get(self.count_query_param)
+        if count in COUNTS:
+            self.count = COUNTS[count](queryset)
+
+        if reverse:
+            ordering = [(field, not descending) for field, descending in ordering]
+        queryset = queryset.order_by(*(f'-{field}' if descending else field for field, descending in ordering))
+        if position is not None:
+            queryset = queryset.filter(_after(ordering, _position_values(queryset.model, ordering, position)))
+
+        # Value rows only hold the columns they select, so the ordering columns go on the end
+        fields = [field for field, _ in ordering]
+        if queryset._iterable_class is ValuesListIterable:
+            missing = [field for field in fields if field not in queryset._fields]
+            queryset = queryset.values_list(*queryset._fields, *missing)
+            keys = [queryset._fields.index(field) for field in fields]
+            key = lambda row: [_cursor_value(row[i]) for i in keys]
+        elif queryset._iterable_class is ValuesIterable:
+            queryset = queryset.values(*queryset._fields, *(f for f in fields if f not in queryset._fields))
+            key = lambda row: [_cursor_value(row[field]) for field in fields]
+        else:
+            key = lambda obj: [_cursor_value(getattr(obj, field)) for field in fields]
+
+        return self._keyset_page(lambda limit: list(queryset[:limit]), key, reverse, position, page_size)
+
+    def paginate_keyset(self, fetch, key, request):
+        """Cursor pages of a source that is not a queryset, such as ranked search results.
+
+        ``fetch(position, reverse, limit)`` returns up to ``limit`` rows after
+        ``position`` (None on the first page) in the source's order, or before
+        it in the opposite order when ``reverse``. ``key(row)`` is the position
+        of a row as a list of JSON values.
+        """
+        self.cursor_mode, self.request, self.count = True, request, None
+        token = request.query_params.get(self.cursor_query_param)
+        reverse, position = self.decode_cursor(token) if token else (False, None)
+        return self._keyset_page(
+            lambda limit: fetch(position, reverse, limit), key, reverse, position, self.get_page_size(request)
+        )
+
+    def _keyset_page(self, read, key, reverse, position, page_size):
+        rows = read(page_size + 1)
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+        has_next, has_previous = (True, more) if reverse else (more, position is not None)
+        self.next_position = key(rows[-1]) if rows and has_next else None
+        self.previous_position = key(rows[0]) if rows and has_previous else None
+        return rows
+
+    def encode_cursor(self, reverse, position):
+        payload = json.dumps([int(reverse), position], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            reverse, position = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            position = list(position)
+        except (TypeError, ValueError):
+            raise NotFound("Invalid cursor.")
+        if not all(isinstance(value, (str, int, float)) for value in position):
+            raise NotFound("Invalid cursor.")
+        return bool(reverse), position
+
+    def cursor_link(self, reverse, position):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(reverse, position))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.cursor_link(False, self.next_position)
+        response['previous'] = self.cursor_link(True, self.previous_position)
+        response['results'] = data
+        return Response(response)
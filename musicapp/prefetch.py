@@ -0,0 +1,133 @@
+"""Derive select_related/prefetch_related from a serializer's nested fields.
+
+``optimize(queryset, SerializerClass)`` walks the serializer's readable fields
+and joins every forward relation it renders (nested serializers and dotted
+sources such as ``event.title``), and prefetches every to-many relation with a
+queryset optimized the same way. The number of queries for a page then stays
+constant whatever the page size.
+
+Relations a serializer reaches in code (``SerializerMethodField``,
+``to_representation``) can be declared on its Meta as ``select_related`` or
+``prefetch_related``, either a list or a dict of lists keyed by the field that
+needs them. Columns it reads in code go in ``required_columns``.
+
+Given a serializer instance whose fields were pruned by ``?fields=`` or
+``?expand=`` (see ``musicapp.sparse``), the queryset also loads only the
+columns the response renders.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+_plans = {}
+MAX_SPARSE_PLANS = 1000  # ?fields= combinations are client input, so stop caching them at some point
+
+
+def _field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _relation(model, name):
+    field = _field(model, name)
+    return field if field is not None and field.is_relation else None
+
+
+def _hints(serializer, name):
+    hints = getattr(getattr(serializer, 'Meta', None), name, [])
+    if isinstance(hints, dict):
+        return [path for field, paths in hints.items() if field in serializer.fields for path in paths]
+    return list(hints)
+
+
+def _build_plan(serializer, model):
+    """Return ``(select paths, [(prefetch path, child serializer, child model)], only columns or None)``.
+
+    The columns are None when the serializer renders something the walk
+    cannot see into, such as a ``SerializerMethodField``.
+    """
+    select = _hints(serializer, 'select_related')
+    prefetch = [(path, None, None) for path in _hints(serializer, 'prefetch_related')]
+    columns = {'pk', *getattr(getattr(serializer, 'Meta', None), 'required_columns', [])}
+    for path in select:
+        parts = path.split('__')
+        columns.update('__'.join(parts[:i]) for i in range(1, len(parts) + 1))
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            columns = None
+            continue
+        path = field.source.split('.')
+        if isinstance(field, serializers.ListSerializer):
+            relation = _relation(model, path[0])
+            if relation is not None and len(path) == 1:
+                prefetch.append((path[0], field.child, relation.related_model))
+            continue
+
+        # Follow forward single-valued relations along the source path
+        current, joined = model, []
+        for name in path if isinstance(field, serializers.BaseSerializer) else path[:-1]:
+            relation = _relation(current, name)
+            if relation is None or relation.many_to_many or relation.one_to_many:
+                break
+            joined.append(name)
+            current = relation.related_model
+        else:
+            if columns is not None:
+                if isinstance(field, serializers.BaseSerializer) or _field(current, path[-1]) is not None:
+                    columns.add('__'.join(path))
+                else:  # A property or method of the model
+                    columns = None
+            if not joined:
+                continue
+            prefix = '__'.join(joined)
+            select.append(prefix)
+            if isinstance(field, serializers.BaseSerializer):
+                child_select, child_prefetch, child_columns = _build_plan(field, current)
+                select.extend(f'{prefix}__{child}' for child in child_select)
+                prefetch.extend((f'{prefix}__{child}', *rest) for child, *rest in child_prefetch)
+                if columns is not None and child_columns is not None:
+                    columns.update(f'{prefix}__{child}' for child in child_columns)
+                else:
+                    columns = None
+
+    return sorted(set(select)), prefetch, columns
+
+
+def _plan(serializer, model):
+    sparse_key = getattr(serializer, 'sparse_key', lambda: None)()
+    key = (type(serializer), model, sparse_key, sparse_key and serializer.sparse_path())
+    if key in _plans:
+        return _plans[key], sparse_key is not None
+    plan = _build_plan(serializer, model)
+    if sparse_key is None or len(_plans) < MAX_SPARSE_PLANS:
+        _plans[key] = plan
+    return plan, sparse_key is not None
+
+
+def optimize(queryset, serializer, request=None):
+    """Apply the joins and prefetches ``serializer`` (a class or an instance) needs to render ``queryset``.
+
+    With a serializer class, ``request`` selects the ``?fields=``/``?expand=`` it is rendered with.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer(context={'request': request})
+    elif isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    (select, prefetch, columns), sparse = _plan(serializer, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if sparse and columns is not None:
+        queryset = queryset.only(*(column.removesuffix('__pk') for column in sorted(columns) if column != 'pk'))
+    for path, child, child_model in prefetch:
+        if child is None:
+            queryset = queryset.prefetch_related(path)
+        else:
+            queryset = queryset.prefetch_related(
+                Prefetch(path, queryset=optimize(child_model._default_manager.all(), child))
+            )
+    return queryset
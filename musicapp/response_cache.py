@@ -0,0 +1,98 @@
+"""Cache of public catalog list responses, invalidated by tag.
+
+A cached response is stored under a key built from the host, the path, the
+normalized query parameters and the current version of every tag the
+response depends on (``event``, ``venue``, ``artist``, ``user``). Saving or
+deleting a model of a tag bumps that tag's version, so every entry built on
+the old version stops being reachable at once and ages out of the cache.
+
+Ticket stock moves through UPDATE statements on the booking path, which send
+no signals. RESPONSE_CACHE_TTL therefore also bounds how long a cached ticket
+count can lag behind. Invalidation only reaches other worker processes when
+CACHES points at a shared backend such as Redis or Memcached.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _tag_key(tag):
+    return f'response-cache-tag:{tag}'
+
+
+def tag_versions(tags):
+    cache = _cache()
+    versions = cache.get_many([_tag_key(tag) for tag in tags])
+    for tag in tags:
+        if _tag_key(tag) not in versions:
+            # A new version after an eviction must not match entries built before it
+            cache.add(_tag_key(tag), time.time_ns(), timeout=None)
+            versions[_tag_key(tag)] = cache.get(_tag_key(tag))
+    return [versions[_tag_key(tag)] for tag in tags]
+
+
+def invalidate(tag):
+    cache = _cache()
+    try:
+        cache.incr(_tag_key(tag))
+    except ValueError:
+        cache.set(_tag_key(tag), time.time_ns(), timeout=None)
+
+
+def invalidate_on_change(model, tag, condition=None):
+    """Bump ``tag`` whenever a ``model`` row is saved or deleted, again once the transaction commits.
+
+    The second bump drops entries that concurrent readers cached from the
+    pre-commit state in between. ``condition(instance)`` can limit the bumps
+    to rows that show up in cached responses.
+    """
+    def receiver(sender, instance, **kwargs):
+        if condition is not None and not condition(instance):
+            return
+        invalidate(tag)
+        transaction.on_commit(lambda: invalidate(tag))
+
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f'response-cache-save-{tag}')
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f'response-cache-delete-{tag}')
+
+
+def response_key(request, tags, casefold=()):
+    params = sorted(
+        (name, value.strip().casefold() if name in casefold else value.strip())
+        for name, values in request.query_params.lists() for value in values
+    )
+    parts = [request.get_host(), request.path, repr(params), repr(tag_versions(tags))]
+    return 'response-cache:' + hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def cached_response(*tags, casefold=()):
+    """Cache successful GET responses of a viewset method that depend on ``tags``.
+
+    Parameters in ``casefold`` are matched case-insensitively by the view, so
+    their case does not split the cache.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(self, request, *args, **kwargs)
+            key = response_key(request, tags, casefold)  # Versions read before the view runs
+            data = _cache().get(key)
+            if data is not None:
+                return Response(data)
+            response = view(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                _cache().set(key, response.data, settings.RESPONSE_CACHE_TTL)
+            return response
+        return wrapper
+    return decorator
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'events',
     'venue',
     'booking',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -97,6 +98,43 @@ SIMPLE_JWT = {
 
 }
 
+# How long a checkout hold keeps its tickets before the sweeper returns them
+TICKET_HOLD_TTL = timedelta(minutes=10)
+
+# Waiting room in front of booking creation, use booking.admission.InProcessAdmissionQueue
+# for a single worker without the database tables
+ADMISSION_QUEUE_BACKEND = 'booking.admission.DatabaseAdmissionQueue'
+
+# Stored responses for Idempotency-Key retries, and how long a retry waits on the original request
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+
+# SECURITY WARNING: shared secret the payment gateway signs its callbacks with
+PAYMENT_WEBHOOK_SECRET = 'django-insecure-payment-webhook-secret'
+
+# Event cancellation fan-out: bookings per chunk, and whether request workers start a
+# background thread (set False when a separate `run_cancellations` worker is running)
+CANCELLATION_CHUNK_SIZE = 500
+CANCELLATION_RUN_IN_PROCESS = True
+
+# Seconds a list total requested with ?count=cached (or estimated without planner stats) is reused
+PAGINATION_COUNT_CACHE_TTL = 60
+
+# Cached catalog list responses: cache alias, and seconds an entry lives, which is also
+# the longest a cached ticket count can lag behind bookings
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TTL = 15
+
+# max-age of catalog responses that carry ETags, 0 makes clients and CDNs revalidate every time
+CATALOG_MAX_AGE = 0
+
+# Coalesced detail responses: seconds a computed body is kept under its ETag, seconds a request
+# waits for another one computing the same body, and whether workers also wait on each other
+# through a lock in the RESPONSE_CACHE_ALIAS cache
+SINGLE_FLIGHT_CACHE_TTL = 60
+SINGLE_FLIGHT_TIMEOUT = 5
+SINGLE_FLIGHT_ACROSS_WORKERS = True
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
@@ -104,6 +142,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,  # seconds a writer waits on the SQLite lock before giving up
+        },
     }
 }
 
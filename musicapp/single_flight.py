@@ -0,0 +1,110 @@
+"""Single-flight rendering of hot detail endpoints.
+
+Identical requests that arrive together, such as thousands of clients
+opening a newly announced event, compute the body once. ``@single_flight``
+goes below ``@conditional`` and keys each body by the ETag the validator
+produced, so a key never outlives the data it was computed from and needs no
+invalidation.
+
+Within a worker, the first thread computes and the others wait for it on an
+event. Computed bodies are kept in the RESPONSE_CACHE_ALIAS cache for
+SINGLE_FLIGHT_CACHE_TTL. With SINGLE_FLIGHT_ACROSS_WORKERS, a worker that
+misses the cache takes a lock there before refilling it, and other workers
+poll for the body instead of refilling it as well. A waiter gives up after
+SINGLE_FLIGHT_TIMEOUT and computes the body itself, so a slow or crashed
+leader delays requests but never fails them.
+"""
+import functools
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from .response_cache import _cache
+
+POLL_INTERVAL = 0.02
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+def _in_worker(key, compute):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if flight.done.wait(settings.SINGLE_FLIGHT_TIMEOUT) and flight.result is not None:
+            return flight.result
+        return compute()  # The leader failed or is too slow
+    try:
+        flight.result = compute()
+        return flight.result
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _across_workers(key, compute):
+    cache = _cache()
+    result = cache.get(key)
+    if result is not None:
+        return result
+    if not settings.SINGLE_FLIGHT_ACROSS_WORKERS:
+        return _store(key, compute())
+
+    lock = f'{key}:lock'
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_TIMEOUT
+    while not cache.add(lock, True, timeout=settings.SINGLE_FLIGHT_TIMEOUT):
+        if time.monotonic() > deadline:
+            return compute()
+        time.sleep(POLL_INTERVAL)
+        result = cache.get(key)
+        if result is not None:
+            return result
+    try:
+        # Another worker may have refilled the cache between our miss and the lock
+        result = cache.get(key)
+        return result if result is not None else _store(key, compute())
+    finally:
+        cache.delete(lock)
+
+
+def _store(key, result):
+    if result[0] == 200:
+        _cache().set(key, result, settings.SINGLE_FLIGHT_CACHE_TTL)
+    return result
+
+
+def coalesce(key, compute):
+    """Return ``compute()``, sharing one call among concurrent callers with the same ``key``.
+
+    ``compute`` returns ``(status, data)``, only successful results are cached.
+    """
+    return _in_worker(key, lambda: _across_workers(key, compute))
+
+
+def single_flight(view):
+    """Coalesce concurrent identical GETs of a viewset method wrapped in ``@conditional``."""
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        etag = getattr(request, 'conditional_etag', None)
+        if etag is None:
+            return view(self, request, *args, **kwargs)
+
+        def compute():
+            response = view(self, request, *args, **kwargs)
+            return response.status_code, response.data
+
+        status, data = coalesce(f'single-flight:{etag}', compute)
+        return Response(data, status=status)
+    return wrapper
@@ -0,0 +1,73 @@
+"""``?fields=`` and ``?expand=`` for read responses.
+
+``?fields=title,date_time,venue.city`` limits a response to the listed fields;
+a dotted name selects inside a nested object and expands it. ``?expand=artist``
+renders that nested object in full, ``venue.owner`` one level further down.
+Once either parameter is given, nested objects that are not expanded collapse
+to their primary key. Requests without them keep the full response shape.
+
+``musicapp.prefetch.optimize`` and ``musicapp.flat.FlatReader`` read the pruned
+fields, so unrequested columns are deferred in SQL as well.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+def sparse_params(request):
+    """``(fields or None, expand)`` for a read request using the parameters, None otherwise."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    fields, expand = _split(params.get('fields')), _split(params.get('expand'))
+    if not fields and not expand:
+        return None
+    for name in fields | expand:  # venue.owner needs venue expanded too
+        parts = name.split('.')
+        expand.update('.'.join(parts[:i]) for i in range(1, len(parts)))
+    return (frozenset(fields) or None, frozenset(expand))
+
+
+class SparseFieldsMixin:
+    """Prune a ModelSerializer's fields to the request's ``?fields=`` and ``?expand=``.
+
+    The request comes from the serializer context, so views pass
+    ``context={'request': request}`` for responses that honour the parameters.
+    """
+
+    def sparse_key(self):
+        return sparse_params(self.context.get('request'))
+
+    def sparse_path(self):
+        names, node = [], self
+        while node is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self.sparse_key()
+        if spec is None:
+            return fields
+        wanted, expand = spec
+        path = self.sparse_path()
+        prefix = f'{path}.' if path else ''
+
+        if wanted is not None:
+            names = {name[len(prefix):].split('.')[0] for name in wanted if name.startswith(prefix)}
+            if names:
+                fields = {name: field for name, field in fields.items() if name in names}
+
+        for name, field in list(fields.items()):
+            if field.write_only or not isinstance(field, serializers.BaseSerializer) or prefix + name in expand:
+                continue
+            kwargs = {'read_only': True, 'many': isinstance(field, serializers.ListSerializer)}
+            if field._kwargs.get('source'):
+                kwargs['source'] = field._kwargs['source']
+            fields[name] = serializers.PrimaryKeyRelatedField(**kwargs)
+        return fields
@@ -0,0 +1,49 @@
+"""Name lists mirrored into indexed rows, such as artist genres and venue amenities.
+
+A model keeps its names as a JSON list for reading, and every save mirrors
+them into rows of a ``(owner, name)`` model with the names normalized, so
+filters run on an index instead of parsing JSON. ``sync`` diffs the rows
+against the lists, touching only the names that changed.
+"""
+MAX_NAME_LENGTH = 100
+
+
+def normalize(name):
+    return str(name).strip().casefold()[:MAX_NAME_LENGTH]
+
+
+def names(values):
+    return {normalize(name) for name in values or () if normalize(name)}
+
+
+def sync(model, owner, wanted, copied=None):
+    """Make the ``model`` rows of each owner match ``wanted``, a dict of owner pk to a set of names.
+
+    ``copied`` maps owner pk to ``{column: value}`` copied from the owner onto
+    each of its rows, such as a fee to range scan along with the name; rows
+    holding an old copy are updated in one statement per distinct value.
+    """
+    copied = copied or {}
+    columns = sorted(next(iter(copied.values()), {}))
+    owner_id = f'{owner}_id'
+    existing = {}
+    rows = model.objects.filter(**{f'{owner_id}__in': wanted}).values_list('pk', owner_id, 'name', *columns)
+    for pk, owner_pk, name, *values in rows:
+        existing.setdefault(owner_pk, {})[name] = (pk, values)
+    stale, moved = [], {}
+    for owner_pk, named in existing.items():
+        current = [copied[owner_pk][column] for column in columns]
+        for name, (pk, values) in named.items():
+            if name not in wanted[owner_pk]:
+                stale.append(pk)
+            elif values != current:
+                moved.setdefault(tuple(current), []).append(pk)
+    if stale:
+        model.objects.filter(pk__in=stale).delete()
+    for values, pks in moved.items():
+        model.objects.filter(pk__in=pks).update(**dict(zip(columns, values)))
+    model.objects.bulk_create(
+        model(**{owner_id: owner_pk, 'name': name, **copied.get(owner_pk, {})})
+        for owner_pk, owner_names in wanted.items()
+        for name in owner_names - existing.get(owner_pk, {}).keys()
+    )
@@ -0,0 +1,121 @@
+"""Query-count and latency budgets for the API test suites.
+
+``BudgetTestCase.assertBudget`` requests an endpoint at each page size and
+fails when it runs more queries or takes longer than its budget. The failure
+message carries a diff of the SQL against the smallest page size, with
+literals blanked out, so a query that repeats per row stands out as the
+added lines.
+"""
+import difflib
+import os
+import re
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+# Multiplies every wall-time budget, for slow CI machines
+LATENCY_BUDGET_SCALE = float(os.environ.get('LATENCY_BUDGET_SCALE', '1'))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql):
+    return _LITERALS.sub('?', sql)
+
+
+def seed_catalogue(owners=12, events_per_venue=3, bookings_per_event=4):
+    """Artists, venues and published events for ``owners`` users, plus bookings by a separate customer.
+
+    The first venue has a seat layout and the first event of the second venue
+    is sharded, so both inventory paths show up in list responses.
+    """
+    from artist.models import Artist
+    from authentication.models import CustomUser
+    from booking.models import Booking
+    from events import inventory
+    from events.models import Event
+    from venue.models import Venue
+
+    customer = CustomUser.objects.create_user(
+        email='customer@example.com', last_name='Customer', telephone='+2348031234567'
+    )
+    admin = CustomUser.objects.create_superuser(
+        email='admin@example.com', last_name='Admin', telephone='+2348031234567'
+    )
+    users = []
+    for i in range(owners):
+        owner = CustomUser.objects.create_user(
+            email=f'owner{i}@example.com', last_name=f'Owner {i}', telephone='+2348031234567'
+        )
+        users.append(owner)
+        artist = Artist.objects.create(
+            user=owner, name=f'Artist {i}', genres=['afrobeats'], base_fee=Decimal('100000.00')
+        )
+        layout = {'sections': [{'name': 'Stalls', 'rows': [{'label': 'A', 'seats': 50}, {'label': 'B', 'seats': 50}]}]}
+        venue = Venue.objects.create(
+            owner=owner, name=f'Venue {i}', address=f'{i} Marina Road', city='Lagos', country='Nigeria',
+            capacity=100, seat_layout=layout if i == 0 else None,
+        )
+        for j in range(events_per_venue):
+            event = Event.objects.create(
+                artist=artist, venue=venue, title=f'Night {i}.{j}', description='Live show',
+                date_time=timezone.now() + timedelta(days=30 + j), duration=120,
+                ticket_price=Decimal('5000.00'), total_tickets=100, status='published',
+            )
+            if i == 1 and j == 0:
+                inventory.enable_sharding(event.pk, 4)
+            for k in range(bookings_per_event):
+                Booking.objects.create(
+                    event=event, user=customer, tickets=1, transaction_id=f'tx-{event.pk}-{k}',
+                    payment_status='completed', payment_method='card',
+                )
+    return {'customer': customer, 'admin': admin, 'owners': users}
+
+
+class BudgetTestCase(TestCase):
+    """TestCase with ``assertBudget`` for endpoint query counts and latency."""
+
+    page_sizes = (1, 10, 50)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def request(self, url, user=None, headers=None, **params):
+        """GET ``url`` as ``user``; return the response, the executed SQL and the wall time."""
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.get(url, params, headers=headers)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        return response, [query['sql'] for query in queries.captured_queries], elapsed
+
+    def assertBudget(self, url, max_queries, max_seconds, user=None, paginated=True, **params):
+        """Fail when ``url`` runs more than ``max_queries`` or takes longer than ``max_seconds`` at any page size."""
+        baseline = None
+        for page_size in self.page_sizes if paginated else (None,):
+            query = dict(params, page_size=page_size) if page_size else params
+            response, sql, elapsed = self.request(url, user, **query)
+            self.assertEqual(response.status_code, 200, f"GET {url} {query} returned {response.status_code}")
+            if baseline is None:
+                baseline = (page_size, sql)
+            if len(sql) > max_queries:
+                diff = difflib.unified_diff(
+                    [normalize_sql(s) for s in baseline[1]], [normalize_sql(s) for s in sql],
+                    f'page_size={baseline[0]}', f'page_size={page_size}', lineterm='',
+                )
+                self.fail(
+                    f"GET {url} {query} ran {len(sql)} queries, budget is {max_queries}:\n"
+                    + ("\n".join(diff) if page_size != baseline[0] else "\n".join(sql))
+                )
+            budget = max_seconds * LATENCY_BUDGET_SCALE
+            self.assertLessEqual(
+                elapsed, budget, f"GET {url} {query} took {elapsed * 1000:.1f} ms, budget is {budget * 1000:.1f} ms"
+            )
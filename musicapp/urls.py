@@ -23,6 +23,7 @@ urlpatterns = [
     path('', include('artist.urls')),
     path('', include('venue.urls')),
     path('', include('events.urls')),
-    path('', include('booking.urls'))
+    path('', include('booking.urls')),
+    path('', include('search.urls')),
 
 ]
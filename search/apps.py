@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+
+
+def _install(using, **kwargs):
+    from . import index
+
+    if ('search', '0001_initial') in MigrationRecorder(connections[using]).applied_migrations():
+        index.install(using)
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'search'
+
+    def ready(self):
+        # Puts back the triggers of tables that migrations rebuilt, see search.index
+        post_migrate.connect(_install, sender=self, dispatch_uid='search-install')
@@ -0,0 +1,159 @@
+"""Full-text search over events, artists and venues with SQLite FTS5.
+
+Every searchable model has an FTS5 table, ``search_<type>``, over some of its
+text columns. It is an external content table: it holds only the inverted
+index and reads the text back from the model's own table, so nothing is
+stored twice. Triggers on the model's table keep the index in step with every
+INSERT, UPDATE and DELETE, including bulk writes and ``update()`` calls that
+send no signals.
+
+A query is split into words that must all match. Words of MIN_PREFIX or more
+characters also match as prefixes, so ``burn bo`` finds "Burna Boy"; the
+tables index 2 and 3 character prefixes so short prefixes stay cheap. Matches
+are ranked with bm25, weighting titles and names above longer text, and read
+in ``(rank, type, id)`` order so pages can follow each other by keyset.
+
+Search needs SQLite; on other databases nothing is installed. Migrations that
+rebuild a model table on SQLite, as most ALTERs do there, drop its triggers
+together with the old table. ``install`` runs after every ``migrate`` to put
+back missing triggers, and rebuilds the indexes that were missing any.
+"""
+import re
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Type: (model, indexed columns with their bm25 weight, SQL condition on the model ``{table}`` for visible rows)
+INDEXES = {
+    'artist': ('artist.Artist', {'name': 10.0, 'bio': 1.0}, None),
+    'event': ('events.Event', {'title': 10.0, 'description': 1.0}, "{table}.status = 'published'"),
+    'venue': ('venue.Venue', {'name': 10.0, 'city': 4.0, 'address': 1.0}, None),
+}
+MIN_PREFIX = 2
+MAX_TERMS = 8
+TOKENIZE = 'unicode61 remove_diacritics 2'
+
+
+def table(kind):
+    return f'search_{kind}'
+
+
+def _source(kind):
+    label, columns, condition = INDEXES[kind]
+    model = apps.get_model(label)
+    return model._meta.db_table, model._meta.pk.column, columns, condition
+
+
+def _create_table(kind):
+    source, pk, columns, _ = _source(kind)
+    fts = table(kind)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, content='{source}', content_rowid='{pk}', "
+        f"tokenize='{TOKENIZE}', prefix='2 3')",
+        # Makes the hidden rank column bm25 with the column weights
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({', '.join(map(str, columns.values()))})')",
+    ]
+
+
+def _triggers(kind):
+    """``{trigger name: CREATE TRIGGER statement}`` keeping ``kind``'s index in step with its table."""
+    source, pk, columns, _ = _source(kind)
+    fts = table(kind)
+    names = ', '.join(columns)
+
+    def values(row):
+        return ', '.join([f'{row}.{pk}', *(f'{row}.{column}' for column in columns)])
+
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES ({values('new')});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', {values('old')});"
+    changed = ' OR '.join(f'old.{column} IS NOT new.{column}' for column in columns)
+    return {
+        f'{fts}_insert': f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {source} BEGIN {insert} END",
+        f'{fts}_delete': f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {source} BEGIN {delete} END",
+        f'{fts}_update': (
+            f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {source} WHEN {changed} "
+            f"BEGIN {delete} {insert} END"
+        ),
+    }
+
+
+def install(using=DEFAULT_DB_ALIAS):
+    """Create the missing search tables and triggers; return the types whose index was rebuilt."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    rebuilt = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {name for name, in cursor.fetchall()}
+        for kind in INDEXES:
+            statements = [] if table(kind) in existing else _create_table(kind)
+            statements += [sql for name, sql in _triggers(kind).items() if name not in existing]
+            if not statements:
+                continue
+            for sql in statements:
+                cursor.execute(sql)
+            _rebuild(cursor, kind)
+            rebuilt.append(kind)
+    return rebuilt
+
+
+def uninstall(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for kind in INDEXES:
+            for name in _triggers(kind):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {table(kind)}')
+
+
+def _rebuild(cursor, kind):
+    cursor.execute(f"INSERT INTO {table(kind)}({table(kind)}) VALUES ('rebuild')")
+
+
+def rebuild(kinds=None, using=DEFAULT_DB_ALIAS):
+    """Reindex ``kinds`` (every type by default) from their tables."""
+    with connections[using].cursor() as cursor:
+        for kind in kinds or INDEXES:
+            _rebuild(cursor, kind)
+
+
+def expression(query):
+    """FTS5 MATCH expression of the words in ``query``, None when it has none.
+
+    Every word is quoted, so the query syntax of FTS5 (operators, column
+    filters, parentheses) is never interpreted from user input.
+    """
+    words = re.findall(r'\w+', query.casefold())[:MAX_TERMS]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' if len(word) >= MIN_PREFIX else f'"{word}"' for word in words)
+
+
+def search(match, kinds, position=None, reverse=False, limit=20, using=DEFAULT_DB_ALIAS):
+    """``[(rank, type, id)]`` of the best ``limit`` matches of ``match`` after ``position``.
+
+    ``position`` is the ``[rank, type, id]`` of the last row of the previous
+    page; with ``reverse`` the rows before it are read, in reverse order.
+    """
+    branches, params = [], []
+    for kind in sorted(kinds):
+        source, pk, _, condition = _source(kind)
+        fts = table(kind)
+        sql = f"SELECT {fts}.rank, %s, {fts}.rowid FROM {fts}"
+        where = [f'{fts} MATCH %s']
+        params += [kind, match]
+        if condition:
+            sql += f' JOIN {source} ON {source}.{pk} = {fts}.rowid'
+            where.append(condition.format(table=source))
+        if position is not None:
+            where.append(f"({fts}.rank, %s, {fts}.rowid) {'<' if reverse else '>'} (%s, %s, %s)")
+            params += [kind, *position]
+        branches.append(f"{sql} WHERE {' AND '.join(where)}")
+    direction = 'DESC' if reverse else 'ASC'
+    sql = f"{' UNION ALL '.join(branches)} ORDER BY 1 {direction}, 2 {direction}, 3 {direction} LIMIT %s"
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return cursor.fetchall()
@@ -0,0 +1,100 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import and_, or_
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from artist.models import Artist
+from events.models import Event
+from musicapp.benchmarking import create_users, scratch_database, timer
+from search import index
+from search.views import RESULTS, SearchViewSet
+from venue.models import Venue
+
+INSERT_BATCH = 10000
+SYLLABLES = ['ba', 'da', 'fe', 'ko', 'la', 'mi', 'na', 'ol', 'pu', 're', 'sa', 'ti', 'wu', 'yo', 'zi', 'ke']
+
+
+class Command(BaseCommand):
+    help = "Time full-text searches over many events, artists and venues, against a LIKE scan of the text columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=100000)
+        parser.add_argument('--artists', type=int, default=20000)
+        parser.add_argument('--venues', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=10, help="Searches timed per query.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['events'], options['artists'], options['venues'], options['repeat'])
+
+    def run(self, events, artists, venues, repeat):
+        rng = random.Random(0)
+        words = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(3000)})
+        # Zipf-like: a few words are everywhere, most are rare
+        weights = [1 / (rank + 1) for rank in range(len(words))]
+
+        def text(count):
+            return ' '.join(rng.choices(words, weights, k=count))
+
+        with timer() as seeded:
+            users = create_users(artists)
+            for start in range(0, artists, INSERT_BATCH):
+                Artist.objects.bulk_create(
+                    Artist(user=user, name=text(2).title(), bio=text(30), base_fee=Decimal('100000.00'))
+                    for user in users[start:start + INSERT_BATCH]
+                )
+            Venue.objects.bulk_create(
+                Venue(owner=users[i % len(users)], name=f'{text(2).title()} Hall', address=f'{i} {text(2)} Road',
+                      city=rng.choice(['Lagos', 'Abuja', 'Accra', 'Nairobi']), country='Nigeria', capacity=1000)
+                for i in range(venues)
+            )
+            artist_ids = list(Artist.objects.values_list('pk', flat=True))
+            venue_ids = list(Venue.objects.values_list('pk', flat=True))
+            begins = timezone.now() + timedelta(days=30)
+            for start in range(0, events, INSERT_BATCH):
+                Event.objects.bulk_create(
+                    Event(artist_id=rng.choice(artist_ids), venue_id=rng.choice(venue_ids), title=text(3).title(),
+                          description=text(40), date_time=begins + timedelta(hours=i), duration=120,
+                          ticket_price=Decimal('5000.00'), total_tickets=100, available_tickets=100,
+                          status='published')
+                    for i in range(start, min(start + INSERT_BATCH, events))
+                )
+        self.stdout.write(f"seeded:      {events} events, {artists} artists, {venues} venues, indexed by the "
+                          f"triggers, in {seeded['elapsed']:.1f}s")
+
+        queries = {
+            'common word': words[0],
+            'rare word': words[-1],
+            'prefix': words[1][:3],
+            'two words': f'{words[2]} {words[40]}',
+        }
+        self.stdout.write(f"{'query':<14} {'text':<22} {'LIKE scan':>11} {'FTS5':>10}")
+        view = SearchViewSet()
+        for label, query in queries.items():
+            match = index.expression(query)
+            with timer() as fts:
+                for _ in range(repeat):
+                    view.results(index.search(match, index.INDEXES, limit=20))
+            with timer() as scan:
+                for _ in range(repeat):
+                    self.like_scan(query)
+            self.stdout.write(f"{label:<14} {query:<22} {scan['elapsed'] / repeat * 1000:>8.1f} ms "
+                              f"{fts['elapsed'] / repeat * 1000:>7.1f} ms")
+
+    def like_scan(self, query):
+        """Pages of 20 of every type with all the words somewhere in their text, unranked."""
+        for kind, (_, columns, _) in index.INDEXES.items():
+            model, reader_class = RESULTS[kind]
+            matches = reduce(and_, (
+                reduce(or_, (Q(**{f'{column}__icontains': word}) for column in columns)) for word in query.split()
+            ))
+            rows = model.objects.filter(matches)
+            if kind == 'event':
+                rows = rows.filter(status='published')
+            reader = reader_class()
+            reader.render(reader.rows(rows.order_by('pk'))[:20])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from search import index
+
+
+class Command(BaseCommand):
+    help = "Create any missing search tables and triggers, then reindex searchable types from their tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('types', nargs='*', help=f"Types to reindex, all by default: {', '.join(index.INDEXES)}.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['types']) - set(index.INDEXES)
+        if unknown:
+            raise CommandError(f"Unknown types: {', '.join(sorted(unknown))}")
+        installed = index.install()
+        kinds = [kind for kind in options['types'] or index.INDEXES if kind not in installed]
+        index.rebuild(kinds)
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {', '.join(sorted({*installed, *kinds}))}"))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 18:00
+
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from search import index
+    index.install(schema_editor.connection.alias)
+
+
+def uninstall(apps, schema_editor):
+    from search import index
+    index.uninstall(schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('artist', '0003_artist_genre'),
+        ('events', '0007_event_ends_at'),
+        ('venue', '0005_venue_amenity'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1 @@
+# No models: the FTS5 tables are created by search.index, in the 0001 migration and after every migrate
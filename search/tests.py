@@ -0,0 +1,82 @@
+from django.db import connection
+
+from musicapp.testing import BudgetTestCase, seed_catalogue
+from search import index
+
+
+class SearchTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=6, bookings_per_event=0)
+        owner = cls.data['owners'][0]
+        cls.artist = owner.artist_profile
+        cls.artist.name = 'Burna Boy'
+        cls.artist.save()
+        cls.headline, cls.support, *_ = owner.venues.get().events.order_by('pk')
+        cls.headline.title = 'Burna Boy Live'
+        cls.headline.save()
+        cls.support.description = 'Opening for burna boy'
+        cls.support.save()
+
+    def results(self, **params):
+        response, _, _ = self.request('/api/search/', **params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(item['type'], item['id']) for item in response.json()['results']]
+
+    def matches(self, query):
+        # Straight from the index, bulk writes send no signal to invalidate cached responses
+        return [(kind, pk) for _, kind, pk in index.search(index.expression(query), index.INDEXES)]
+
+    def test_prefixes_ranked_by_bm25(self):
+        self.assertEqual(self.results(q='burn bo', type='event'),
+                         [('event', self.headline.pk), ('event', self.support.pk)])
+        self.assertEqual(self.results(q='BURNÁ', type='artist'), [('artist', self.artist.pk)])
+
+    def test_types_are_searched_together(self):
+        self.assertEqual({kind for kind, _ in self.results(q='burna')}, {'artist', 'event'})
+        self.assertEqual({kind for kind, _ in self.results(q='lagos', page_size=50)}, {'venue'})
+
+    def test_cursor_pages_cover_every_match_once(self):
+        everything = self.results(q='venue', page_size=50)
+        self.assertEqual(len(everything), 6)
+        pages, url, params = [], '/api/search/', {'q': 'venue', 'page_size': 4}
+        while url:
+            response, _, _ = self.request(url, **params)
+            pages.append(response.json())
+            url, params = response.json()['next'], {}
+        self.assertEqual([(item['type'], item['id']) for page in pages for item in page['results']], everything)
+
+        response, _, _ = self.request(pages[-1]['previous'])
+        self.assertEqual(response.json()['results'], pages[0]['results'])
+
+    def test_triggers_follow_bulk_writes(self):
+        from events.models import Event
+
+        Event.objects.filter(pk=self.support.pk).update(title='Zanku Night')
+        self.assertEqual(self.matches('zanku'), [('event', self.support.pk)])
+        Event.objects.filter(pk=self.support.pk).update(status='draft')
+        self.assertEqual(self.matches('zanku'), [])
+        Event.objects.filter(pk=self.support.pk).delete()
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO search_event(search_event, rank) VALUES ('integrity-check', 1)")
+
+    def test_install_puts_back_dropped_triggers(self):
+        from events.models import Event
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER search_event_update')  # As rebuilding events_event in a migration does
+        Event.objects.filter(pk=self.support.pk).update(title='Zanku Night')
+        self.assertEqual(self.matches('zanku'), [])
+        self.assertEqual(index.install(), ['event'])
+        self.assertEqual(self.matches('zanku'), [('event', self.support.pk)])
+        self.assertEqual(index.install(), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.results(q='title:burna OR "boy* NEAR('), [])
+        for params in ({'q': ' ?! '}, {'q': 'burna', 'type': 'booking'}):
+            response, _, _ = self.request('/api/search/', **params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+    def test_budget(self):
+        self.assertBudget('/api/search/', max_queries=5, max_seconds=0.2, q='live')
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import SearchViewSet
+
+urlpatterns = [
+    path('api/search/', SearchViewSet.as_view({
+        'get': 'list'
+    }), name='search'),
+]
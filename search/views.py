@@ -0,0 +1,63 @@
+from rest_framework import viewsets, status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from artist.models import Artist
+from artist.serializers import ArtistReader
+from events.models import Event
+from events.serializers import EventReader
+from venue.models import Venue
+from venue.serializers import VenueReader
+from musicapp.pagination import StandardResultsSetPagination
+from musicapp.response_cache import cached_response
+from . import index
+
+# Type: (model, reader rendering its results)
+RESULTS = {
+    'artist': (Artist, ArtistReader),
+    'event': (Event, EventReader),
+    'venue': (Venue, VenueReader),
+}
+
+
+class SearchViewSet(viewsets.ViewSet):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    @swagger_auto_schema(
+        operation_summary="Search published events, artists and venues by ?q=, optionally only the ?type=s given.",
+        responses={200: "Cursor page of results, best first, each with its type"}
+    )
+    @cached_response('event', 'artist', 'venue', 'user', casefold=('q',))
+    def list(self, request):
+        match = index.expression(request.query_params.get('q', ''))
+        if match is None:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = set(filter(None, request.query_params.get('type', '').split(','))) or set(index.INDEXES)
+        if not kinds <= set(index.INDEXES):
+            return Response(
+                {"error": f"type must be one of {', '.join(index.INDEXES)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def fetch(position, reverse, limit):
+            if position is not None and (len(position) != 3 or position[1] not in index.INDEXES):
+                raise NotFound("Invalid cursor.")
+            return index.search(match, kinds, position, reverse, limit)
+
+        paginator = StandardResultsSetPagination()
+        hits = paginator.paginate_keyset(fetch, list, request)
+        return paginator.get_paginated_response(self.results(hits))
+
+    def results(self, hits):
+        """Render ``(rank, type, id)`` hits with the list reader of their type, one query per type."""
+        items = {}
+        for kind, (model, reader_class) in RESULTS.items():
+            ids = [pk for _, hit_kind, pk in hits if hit_kind == kind]
+            if ids:
+                reader = reader_class()
+                rows = reader.rows(model.objects.filter(pk__in=ids))
+                items.update(((kind, item['id']), {'type': kind, **item}) for item in reader.render(rows))
+        # A row deleted since the search matched it is left out
+        return [items[kind, pk] for _, kind, pk in hits if (kind, pk) in items]
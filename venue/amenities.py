@@ -0,0 +1,61 @@
+"""Amenity filters of the venue list.
+
+``Venue.amenities`` stays a JSON list for reading, and every save mirrors it
+into ``VenueAmenity`` rows with the names normalized. Filters then run on the
+``(name, venue)`` unique index instead of parsing the JSON of every venue.
+
+How a filter runs depends on how common the amenities are. Rare ones drive
+the query: their rows are read from the index and the venues fetched by
+primary key. Common ones are checked per venue with an index probe, so the
+city/country index or the primary key order drives instead, and a page of
+venues that almost all match is found without reading every match first.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from musicapp import tags
+from musicapp.pagination import cached_count
+
+from .models import Venue, VenueAmenity
+
+DRIVING_FRACTION = 0.05  # Amenities on at most this share of venues drive the query
+
+
+def sync(venues):
+    """Make the amenity rows of ``venues`` match their ``amenities`` lists."""
+    tags.sync(VenueAmenity, 'venue', {venue.pk: tags.names(venue.amenities) for venue in venues})
+
+
+def _frequency(names):
+    # Cached like list totals, the share of venues with an amenity changes slowly
+    return cached_count(VenueAmenity.objects.filter(name__in=names))
+
+
+def _rows(names):
+    return VenueAmenity.objects.filter(name__in=names)
+
+
+def _probe(names):
+    return Exists(_rows(names).filter(venue=OuterRef('pk')))
+
+
+def having(queryset, amenities, match_all=True):
+    """Venues of ``queryset`` that have all (or with ``match_all=False`` any) of ``amenities``."""
+    wanted = sorted(tags.names(amenities))
+    if not wanted:
+        return queryset
+    driving = cached_count(Venue.objects.all()) * DRIVING_FRACTION
+    if not match_all:
+        if _frequency(wanted) <= driving:
+            return queryset.filter(pk__in=_rows(wanted).values('venue'))
+        return queryset.filter(_probe(wanted))
+
+    frequencies = {name: _frequency([name]) for name in wanted}
+    wanted.sort(key=frequencies.get)
+    rarest = wanted[0]
+    conditions = Q()
+    if frequencies[rarest] <= driving:
+        conditions &= Q(pk__in=_rows([rarest]).values('venue'))
+        wanted = wanted[1:]
+    for name in wanted:
+        conditions &= Q(_probe([name]))
+    return queryset.filter(conditions)
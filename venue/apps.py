@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VenueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'venue'
+
+    def ready(self):
+        from musicapp.response_cache import invalidate_on_change
+        invalidate_on_change(self.get_model('Venue'), 'venue')
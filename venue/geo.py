@@ -0,0 +1,183 @@
+"""Proximity search over venue coordinates.
+
+Every venue with coordinates stores its geohash in an indexed column. A
+search for venues within ``radius`` km of a point runs in three steps:
+
+1. cover the bounding box of the circle with a handful of geohash cells, at
+   the finest precision that needs at most MAX_CELLS of them, and read the
+   venues whose geohash falls in one of the cells as index range scans;
+2. drop candidates outside the bounding box on the coordinates themselves;
+3. compute the exact great-circle distance of the few that are left and
+   keep those inside the circle, nearest first.
+
+``within`` runs the third step in the database instead, for filtering other
+tables by the venues in the circle without reading the venues first.
+
+Only the rows near the point are read, whatever the size of the catalogue.
+"""
+import math
+
+from django.db.models import FloatField, Q
+from django.db.models.functions import Cast, Cos, Power, Radians, Sin
+from rest_framework.exceptions import ValidationError
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # About 5 m cells
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_CELLS = 16
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, ``precision`` characters long."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, index, bit, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        index <<= 1
+        if value >= middle:
+            index |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[index])
+            index, bit = 0, 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """``(height, width)`` in degrees of a geohash cell."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(latitude, longitude, radius):
+    """``(south, north, [(west, east), ...])`` around the circle, split at the antimeridian."""
+    delta_lat = math.degrees(radius / EARTH_RADIUS_KM)
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    if south == -90.0 or north == 90.0:  # The circle covers a pole
+        return south, north, [(-180.0, 180.0)]
+    ratio = math.sin(radius / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+    delta_lng = math.degrees(math.asin(min(1.0, ratio)))
+    west, east = longitude - delta_lng, longitude + delta_lng
+    if delta_lng >= 180.0:
+        return south, north, [(-180.0, 180.0)]
+    if west < -180.0:
+        return south, north, [(west + 360.0, 180.0), (-180.0, east)]
+    if east > 180.0:
+        return south, north, [(west, 180.0), (-180.0, east - 360.0)]
+    return south, north, [(west, east)]
+
+
+def covering_cells(south, north, spans):
+    """The fewest-character geohash prefixes that cover the box with at most MAX_CELLS cells."""
+    cells = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = _cell_size(precision)
+        rows = math.floor((north + 90.0) / height) - math.floor((south + 90.0) / height) + 1
+        columns = sum(math.floor((east + 180.0) / width) - math.floor((west + 180.0) / width) + 1
+                      for west, east in spans)
+        if rows * columns > MAX_CELLS and cells is not None:
+            break
+        cells = set()
+        for west, east in spans:
+            lat = south
+            while True:
+                lng = west
+                while True:
+                    cells.add(encode(min(lat, 90.0 - 1e-9), min(lng, 180.0 - 1e-9), precision))
+                    if lng >= east:
+                        break
+                    lng = min(lng + width, east)
+                if lat >= north:
+                    break
+                lat = min(lat + height, north)
+    return sorted(cells)
+
+
+def candidates(queryset, latitude, longitude, radius):
+    """``queryset`` narrowed to the venues in the bounding box of the circle, through the geohash index."""
+    south, north, spans = bounding_box(latitude, longitude, radius)
+    cells = Q()
+    for prefix in covering_cells(south, north, spans):
+        # '{' sorts right after 'z', the last geohash character
+        cells |= Q(geohash__gte=prefix, geohash__lt=prefix + '{')
+    box = Q()
+    for west, east in spans:
+        box |= Q(longitude__gte=west, longitude__lte=east)
+    return queryset.filter(cells, box, latitude__gte=south, latitude__lte=north)
+
+
+def _half_chord_limit(radius):
+    return 1.0 if radius is None else math.sin(radius / EARTH_RADIUS_KM / 2) ** 2
+
+
+def distances(rows, latitude, longitude, radius=None):
+    """``[(distance, pk)]`` of the ``(pk, latitude, longitude)`` rows within ``radius``, nearest first.
+
+    Without a radius every row is kept.
+    """
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    cos_lat1 = math.cos(lat1)
+    # Haversine, compared on the half-chord so only the matches pay for asin
+    limit = _half_chord_limit(radius)
+    sin, cos, radians = math.sin, math.cos, math.radians
+    matches = []
+    for pk, lat2, lng2 in rows:
+        lat2 = radians(lat2)
+        h = sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos(lat2) * sin((radians(lng2) - lng1) / 2) ** 2
+        if h <= limit:
+            matches.append((2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h)), pk))
+    matches.sort()
+    return matches
+
+
+def rank(queryset, latitude, longitude, radius=None):
+    """``[(distance in km, pk)]`` of the venues of ``queryset`` within ``radius`` km, nearest first."""
+    # Read as floats, converting every coordinate to a Decimal first costs more than the distances
+    rows = queryset.values_list('pk', Cast('latitude', FloatField()), Cast('longitude', FloatField()))
+    return distances(rows, latitude, longitude, radius)
+
+
+def nearby(queryset, latitude, longitude, radius):
+    """``rank`` over the candidates of ``queryset``."""
+    return rank(candidates(queryset, latitude, longitude, radius), latitude, longitude, radius)
+
+
+def within(queryset, latitude, longitude, radius):
+    """The candidates of ``queryset`` inside the circle, filtered in SQL so it can be used as a subquery.
+
+    The haversine half-chord of ``distances`` is computed by the database on
+    the candidates only, the index has already narrowed them to the box.
+    """
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    lat2, lng2 = Radians(Cast('latitude', FloatField())), Radians(Cast('longitude', FloatField()))
+    half_chord = (Power(Sin((lat2 - lat1) / 2), 2)
+                  + math.cos(lat1) * Cos(lat2) * Power(Sin((lng2 - lng1) / 2), 2))
+    return candidates(queryset, latitude, longitude, radius).alias(half_chord=half_chord).filter(
+        half_chord__lte=_half_chord_limit(radius)
+    )
+
+
+def point_params(request):
+    """``(latitude, longitude, radius)`` from ``?near=lat,lng&radius=km``, None without ``near``."""
+    near = request.query_params.get('near')
+    if not near:
+        return None
+    try:
+        latitude, longitude = (float(value) for value in near.split(','))
+        radius = float(request.query_params.get('radius', DEFAULT_RADIUS_KM))
+    except ValueError:
+        raise ValidationError({'error': "near must be 'latitude,longitude' and radius a number of km"})
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValidationError({'error': "near is outside the valid latitude and longitude ranges"})
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise ValidationError({'error': f"radius must be between 0 and {MAX_RADIUS_KM} km"})
+    return latitude, longitude, radius
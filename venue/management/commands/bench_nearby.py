@@ -0,0 +1,62 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from musicapp.benchmarking import create_users, scratch_database, timer
+from venue import geo
+from venue.models import Venue
+
+INSERT_BATCH = 10000
+# Venues spread over Nigeria, searched around central Lagos
+SOUTH, NORTH, WEST, EAST = 4.3, 13.9, 2.7, 14.7
+CENTRE = (6.5244, 3.3792)
+
+
+class Command(BaseCommand):
+    help = "Compare a full-scan haversine with the geohash-indexed proximity search over many venues."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--venues', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5, help="Searches timed per radius.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['venues'], options['repeat'])
+
+    def run(self, count, repeat):
+        owner = create_users(1)[0]
+        rng = random.Random(0)
+        with timer() as seeded:
+            for start in range(0, count, INSERT_BATCH):
+                venues = []
+                for i in range(start, min(start + INSERT_BATCH, count)):
+                    # Half the venues cluster around Lagos like a real catalogue would
+                    if i % 2:
+                        latitude, longitude = rng.gauss(CENTRE[0], 0.2), rng.gauss(CENTRE[1], 0.2)
+                    else:
+                        latitude, longitude = rng.uniform(SOUTH, NORTH), rng.uniform(WEST, EAST)
+                    latitude, longitude = Decimal(f'{latitude:.6f}'), Decimal(f'{longitude:.6f}')
+                    venues.append(Venue(
+                        owner=owner, name=f'Venue {i}', address='1 Bench Road', city='Lagos', country='Nigeria',
+                        capacity=500, latitude=latitude, longitude=longitude, geohash=geo.encode(latitude, longitude),
+                    ))
+                Venue.objects.bulk_create(venues)
+        self.stdout.write(f"seeded:      {count} venues in {seeded['elapsed']:.1f}s")
+
+        everything = Venue.objects.all()
+        self.stdout.write(f"{'radius':>8} {'matches':>8} {'full scan':>12} {'geohash':>10}")
+        for radius in (1, 5, 25, 100):
+            scan, expected = self.measure(lambda: geo.rank(everything, *CENTRE, radius), repeat)
+            indexed, found = self.measure(lambda: geo.nearby(everything, *CENTRE, radius), repeat)
+            if found != expected:
+                self.stderr.write(self.style.ERROR(f"Radius {radius} km differs between the two searches"))
+            self.stdout.write(
+                f"{radius:>5} km {len(found):>8} {scan * 1000:>9.1f} ms {indexed * 1000:>7.1f} ms"
+            )
+
+    def measure(self, search, repeat):
+        with timer() as elapsed:
+            for _ in range(repeat):
+                result = search()
+        return elapsed['elapsed'] / repeat, result
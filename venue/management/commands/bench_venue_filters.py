@@ -0,0 +1,75 @@
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from musicapp.benchmarking import create_users, scratch_database, timer
+from venue import amenities
+from venue.models import Venue
+from venue.views import VenueViewSet
+
+INSERT_BATCH = 10000
+COMMON = ['wifi', 'parking', 'bar', 'stage lighting', 'air conditioning']
+# Each size adds the same number of rare venues, so these filters match a constant number of rows
+RARE_PER_SIZE = 50
+FILTERS = {
+    'amenity AND': {'amenity': 'rooftop,wifi'},
+    'amenity OR': {'amenity': 'rooftop,sauna', 'amenity_match': 'any'},
+    'city + capacity + amenity': {'city': 'ibadan', 'min_capacity': '800', 'amenity': 'wifi'},
+}
+
+
+class Command(BaseCommand):
+    help = "Time selective venue list filters as the number of venues grows, against a JSON scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000])
+        parser.add_argument('--repeat', type=int, default=10, help="Queries timed per filter and size.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options['sizes'], options['repeat'])
+
+    def run(self, sizes, repeat):
+        owner = create_users(1)[0]
+        rng = random.Random(0)
+        factory = APIRequestFactory()
+        created = 0
+        self.stdout.write(f"{'venues':>8} {'filter':<28} {'matches':>8} {'latency':>10}")
+        for size in sizes:
+            while created < size:
+                batch = min(INSERT_BATCH, size - created)
+                last = created + batch == size
+                venues = [self.venue(owner, rng, created + i, rare=last and i >= batch - RARE_PER_SIZE)
+                          for i in range(batch)]
+                amenities.sync(Venue.objects.bulk_create(venues))
+                created += batch
+
+            seconds, count = self.measure(lambda: Venue.objects.extra(  # The JSON scan filters replaced
+                where=["EXISTS (SELECT 1 FROM json_each(venue_venue.amenities) WHERE value = %s)"],
+                params=['rooftop'],
+            ).order_by('pk'), repeat)
+            self.stdout.write(f"{size:>8} {'JSON scan (rooftop)':<28} {count:>8} {seconds * 1000:>7.2f} ms")
+            for label, params in FILTERS.items():
+                request = Request(factory.get('/', params))
+                seconds, count = self.measure(lambda: VenueViewSet().filtered(request), repeat)
+                self.stdout.write(f"{size:>8} {label:<28} {count:>8} {seconds * 1000:>7.2f} ms")
+
+    def venue(self, owner, rng, i, rare):
+        names = rng.sample(COMMON, 2)
+        if rare:
+            names += ['rooftop', 'sauna'] if i % 2 else ['rooftop']
+        return Venue(
+            owner=owner, name=f'Venue {i}', address='1 Bench Road', country='Nigeria',
+            city='Ibadan' if rare else rng.choice(['Lagos', 'Abuja', 'Port Harcourt', 'Kano']),
+            capacity=rng.randrange(50, 2000), amenities=names,
+        )
+
+    def measure(self, queryset, repeat):
+        """Time the total and the first page of 20, the same queries the list endpoint runs."""
+        with timer() as elapsed:
+            for _ in range(repeat):
+                count = queryset().count()
+                list(queryset().values_list('pk', flat=True)[:20])
+        return elapsed['elapsed'] / repeat, count
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venue',
+            name='seat_layout',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0002_venue_seat_layout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venue',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
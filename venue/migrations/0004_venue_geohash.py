@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+from venue.geo import encode
+
+
+def fill_geohashes(apps, schema_editor):
+    Venue = apps.get_model('venue', 'Venue')
+    venues = list(Venue.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for venue in venues:
+        venue.geohash = encode(venue.latitude, venue.longitude)
+    Venue.objects.bulk_update(venues, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0003_venue_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venue',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-18 14:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+# Frozen copy of musicapp.tags.names as of this migration, so it keeps running whatever the app code becomes
+def names(amenities):
+    normalized = (str(name).strip().casefold()[:100] for name in amenities or ())
+    return {name for name in normalized if name}
+
+
+def fill_amenities(apps, schema_editor):
+    Venue = apps.get_model('venue', 'Venue')
+    VenueAmenity = apps.get_model('venue', 'VenueAmenity')
+    VenueAmenity.objects.bulk_create(
+        (VenueAmenity(venue_id=pk, name=name)
+         for pk, amenities in Venue.objects.values_list('pk', 'amenities').iterator()
+         for name in names(amenities)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0004_venue_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueAmenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(django.db.models.functions.text.Lower('city'), models.F('capacity'), name='venue_city_capacity'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(django.db.models.functions.text.Lower('country'), models.F('capacity'), name='venue_country_capacity'),
+        ),
+        migrations.AddField(
+            model_name='venueamenity',
+            name='venue',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='amenity_rows', to='venue.venue'),
+        ),
+        migrations.AddConstraint(
+            model_name='venueamenity',
+            constraint=models.UniqueConstraint(fields=('name', 'venue'), name='venue_amenity_unique_name'),
+        ),
+        migrations.RunPython(fill_amenities, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Lower
+
+from .geo import encode
 
 
 class Venue(models.Model):
@@ -13,6 +16,40 @@ class Venue(models.Model):
     photos = models.JSONField(default=list)  # URLs to images
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)  # See venue.geo
+    seat_layout = models.JSONField(null=True, blank=True)  # {'sections': [{'name': '', 'rows': [{'label': '', 'seats': 0}]}]}
+    version = models.PositiveIntegerField(default=0, editable=False)  # Bumped on every save, for ETags
+
+    class Meta:
+        indexes = [  # Case-insensitive city/country filters of the venue list, see VenueViewSet.filtered
+            models.Index(Lower('city'), 'capacity', name='venue_city_capacity'),
+            models.Index(Lower('country'), 'capacity', name='venue_country_capacity'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}, {self.city}"
+
+    def save(self, *args, **kwargs):
+        self.version += 1
+        self.geohash = '' if self.latitude is None or self.longitude is None else encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', 'geohash'}
+        super().save(*args, **kwargs)
+        if update_fields is None or 'amenities' in update_fields:
+            from .amenities import sync
+            sync([self])
+
+
+class VenueAmenity(models.Model):
+    """One amenity of a venue, normalized from ``Venue.amenities`` so filters can use an index."""
+    venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='amenity_rows')
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'venue'], name='venue_amenity_unique_name'),
+        ]
 
     def __str__(self):
-        return f"{self.name}, {self.city}"
\ No newline at end of file
+        return f"{self.name} at venue {self.venue_id}"
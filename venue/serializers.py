@@ -1,17 +1,45 @@
 from rest_framework import serializers
 from .models import Venue
 from authentication.serializers import CustomUserSerializer
+from musicapp.flat import FlatReader
+from musicapp.sparse import SparseFieldsMixin
 
 
-class VenueSerializer(serializers.ModelSerializer):
+class VenueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner = CustomUserSerializer(read_only=True)
 
     class Meta:
         model = Venue
-        fields = '__all__'
+        exclude = ['version', 'geohash']
+        empty_list_fields = ['amenities', 'photos']
+
+    def validate_seat_layout(self, value):
+        # Seat maps are bitmaps over the layout's seat positions, a new layout would reassign sold seats
+        if (self.instance is not None and value != self.instance.seat_layout
+                and self.instance.events.filter(seat_map__isnull=False).exists()):
+            raise serializers.ValidationError("The seat layout cannot change while events sell seats from it.")
+        if value is None:
+            return value
+        try:
+            for section in value['sections']:
+                str(section['name'])
+                for row in section['rows']:
+                    if int(row['seats']) < 1:
+                        raise ValueError
+                    str(row['label'])
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError(
+                "Expected {'sections': [{'name': ..., 'rows': [{'label': ..., 'seats': n}]}]}"
+            )
+        return value
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['amenities'] = instance.amenities or []
-        representation['photos'] = instance.photos or []
+        for field in self.Meta.empty_list_fields:
+            if field in representation:  # Unless left out by ?fields=
+                representation[field] = representation[field] or []
         return representation
+
+
+class VenueReader(FlatReader):
+    serializer_class = VenueSerializer
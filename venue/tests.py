@@ -1,3 +1,211 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db.models.functions import Lower
+
+from musicapp.testing import BudgetTestCase, seed_catalogue
+
+
+class VenueQueryBudgetTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(events_per_venue=60, bookings_per_event=0)
+        cls.venue = cls.data['owners'][1].venues.get()
+
+    def test_list(self):
+        self.assertBudget('/api/venues/', max_queries=3, max_seconds=0.2)
+
+    def test_retrieve(self):
+        self.assertBudget(f'/api/venues/{self.venue.pk}/', max_queries=2, max_seconds=0.1, paginated=False)
+
+    def test_retrieve_sparse_fields(self):
+        response, _, _ = self.request(f'/api/venues/{self.venue.pk}/', fields='name')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {'name': self.venue.name})
+
+    def test_events(self):
+        self.assertBudget(f'/api/venues/{self.venue.pk}/events/', max_queries=5, max_seconds=0.3)
+
+
+class VenueResponseCacheTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=3, bookings_per_event=0)
+
+    def test_repeated_list_is_served_from_cache(self):
+        self.request('/api/venues/', city='Lagos')
+        response, sql, _ = self.request('/api/venues/', city=' lagos')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sql, [])
+
+    def test_saving_a_venue_invalidates_cached_lists(self):
+        self.request('/api/venues/')
+        venue = self.data['owners'][0].venues.get()
+        venue.name = 'Renamed Hall'
+        venue.save()
+        response, _, _ = self.request('/api/venues/')
+        self.assertEqual(response.json()['results'][0]['name'], 'Renamed Hall')
+
+    def test_saving_an_owner_invalidates_cached_lists(self):
+        self.request('/api/venues/')
+        owner = self.data['owners'][0]
+        owner.city = 'Abuja'
+        owner.save()
+        response, _, _ = self.request('/api/venues/')
+        self.assertEqual(response.json()['results'][0]['owner']['city'], 'Abuja')
+
+
+class VenueProximityTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        import random
+        from decimal import Decimal
+
+        from venue.models import Venue
+
+        cls.data = seed_catalogue(owners=2, bookings_per_event=0)
+        cls.lagos = cls.data['owners'][0].venues.get()
+        cls.lagos.latitude, cls.lagos.longitude = Decimal('6.524400'), Decimal('3.379200')
+        cls.lagos.save()
+        rng = random.Random(22)
+        for i in range(300):
+            Venue.objects.create(
+                owner=cls.data['owners'][1], name=f'Spot {i}', address='Somewhere', city='Lagos',
+                country='Nigeria', capacity=100,
+                latitude=Decimal(f'{rng.uniform(5.5, 7.5):.6f}'), longitude=Decimal(f'{rng.uniform(2.5, 4.5):.6f}'),
+            )
+
+    def test_geohash(self):
+        from venue.geo import encode
+
+        self.assertEqual(encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(self.lagos.geohash, encode(6.5244, 3.3792))
+
+    def test_matches_a_full_scan(self):
+        from venue import geo
+        from venue.models import Venue
+
+        for radius in (1, 15, 60, 200):
+            everything = geo.rank(Venue.objects.exclude(geohash=''), 6.6, 3.4, radius)
+            self.assertEqual(geo.nearby(Venue.objects.all(), 6.6, 3.4, radius), everything)
+
+    def test_list_is_nearest_first(self):
+        response, _, _ = self.request('/api/venues/', near='6.5244,3.3792', radius=30, page_size=50)
+        results = response.json()['results']
+        self.assertEqual(results[0]['id'], self.lagos.pk)
+        self.assertEqual(results[0]['distance_km'], 0)
+        distances = [item['distance_km'] for item in results]
+        self.assertEqual(distances, sorted(distances))
+        self.assertLessEqual(distances[-1], 30)
+
+    def test_events_near_a_point(self):
+        response, _, _ = self.request('/api/events/nearby/', near='6.53,3.38', radius=5)
+        results = response.json()['results']
+        self.assertEqual({item['venue']['id'] for item in results}, {self.lagos.pk})
+        self.assertEqual(len(results), 3)
+        self.assertAlmostEqual(results[0]['distance_km'], 0.63, places=2)
+
+    def test_within_matches_the_ranked_circle(self):
+        from venue import geo
+        from venue.models import Venue
+
+        for radius in (1, 15, 60, 200):
+            ranked = {pk for _, pk in geo.nearby(Venue.objects.all(), 6.6, 3.4, radius)}
+            self.assertEqual(set(geo.within(Venue.objects.all(), 6.6, 3.4, radius).values_list('pk', flat=True)),
+                             ranked)
+
+    def test_nearby_events_skip_the_corners_of_the_box(self):
+        from events.models import Event
+        from venue.models import Venue
+
+        corner = Venue.objects.create(owner=self.lagos.owner, name='Corner', address='Lekki', city='Lagos',
+                                      country='Nigeria', capacity=10, latitude=6.57, longitude=3.42)
+        template = self.lagos.events.first()
+        Event.objects.create(artist=template.artist, venue=corner, title='Corner Night', description='Live show',
+                             date_time=template.date_time, duration=120, ticket_price=template.ticket_price,
+                             total_tickets=10, status='published')
+        response, sql, _ = self.request('/api/events/nearby/', near='6.53,3.38', radius=5, page_size=50)
+        self.assertEqual({item['venue']['id'] for item in response.json()['results']}, {self.lagos.pk})
+        self.assertTrue(any('geohash' in query and 'events_event' in query for query in sql))
+
+    def test_invalid_point(self):
+        response, _, _ = self.request('/api/venues/', near='6.5', radius=5)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        self.assertEqual(self.request('/api/events/nearby/')[0].status_code, 400)
+
+    def test_antimeridian(self):
+        from venue import geo
+        from venue.models import Venue
+
+        Venue.objects.create(owner=self.lagos.owner, name='Fiji', address='Suva', city='Suva', country='Fiji',
+                             capacity=10, latitude=-17.0, longitude=-179.95)
+        self.assertEqual(len(geo.nearby(Venue.objects.all(), -17.0, 179.95, 20)), 1)
+
+
+class VenueAmenityFilterTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=6, bookings_per_event=0)
+        cls.venues = [owner.venues.get() for owner in cls.data['owners']]
+        for venue, names in zip(cls.venues, [['WiFi', 'Parking'], ['wifi'], ['parking', 'rooftop'], [], ['Wifi '], []]):
+            venue.amenities = names
+            venue.save()
+
+    def ids(self, **params):
+        response, _, _ = self.request('/api/venues/', page_size=50, **params)
+        return {item['id'] for item in response.json()['results']}
+
+    def test_all_amenities(self):
+        self.assertEqual(self.ids(amenity='wifi,parking'), {self.venues[0].pk})
+
+    def test_any_amenity(self):
+        self.assertEqual(self.ids(amenity='rooftop,wifi', amenity_match='any'),
+                         {self.venues[i].pk for i in (0, 1, 2, 4)})
+
+    def test_common_and_rare_plans_agree(self):
+        from venue import amenities
+        from venue.models import Venue
+
+        results = []
+        for fraction in (1, 0):  # Driven by the rarest amenity, then probed per venue
+            with mock.patch.object(amenities, 'DRIVING_FRACTION', fraction):
+                venues = amenities.having(Venue.objects.all(), ['parking', 'wifi'])
+                self.assertEqual('IN (SELECT' in str(venues.query), bool(fraction))
+                results.append(set(venues.values_list('pk', flat=True)))
+        self.assertEqual(results[0], results[1])
+
+    def test_saving_resyncs_amenities(self):
+        venue = self.venues[1]
+        venue.amenities = ['rooftop']
+        venue.save(update_fields=['amenities'])
+        self.assertNotIn(venue.pk, self.ids(amenity='wifi'))
+        self.assertIn(venue.pk, self.ids(amenity='ROOFTOP'))
+
+    def test_city_filter_uses_the_expression_index(self):
+        from venue.models import Venue
+
+        plan = Venue.objects.alias(city_lower=Lower('city')).filter(city_lower='lagos', capacity__gte=10).explain()
+        self.assertIn('venue_city_capacity', plan)
+        self.assertEqual(len(self.ids(city='LAGOS', min_capacity=10)), 6)
+
+
+class VenueSeatLayoutTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalogue(owners=2, bookings_per_event=0)
+        cls.seated, cls.standing = (owner.venues.get() for owner in cls.data['owners'])
+
+    def patch(self, venue, layout):
+        self.client.force_authenticate(venue.owner)
+        return self.client.patch(f'/api/venues/{venue.pk}/', {'seat_layout': layout}, format='json')
+
+    def test_layout_is_locked_while_events_sell_its_seats(self):
+        layout = {'sections': [{'name': 'Balcony', 'rows': [{'label': 'A', 'seats': 10}]}]}
+        response = self.patch(self.seated, layout)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('seat_layout', response.json())
+        self.assertEqual(self.patch(self.seated, None).status_code, 400)
+        self.assertEqual(self.patch(self.seated, self.seated.seat_layout).status_code, 200)
+
+        self.assertEqual(self.patch(self.standing, layout).status_code, 200)
+        self.assertEqual(self.patch(self.standing, {'sections': [{'rows': []}]}).status_code, 400)
@@ -30,6 +30,10 @@ urlpatterns = [
         'delete': 'destroy'
     }), name='venue-detail'),
 
+    path('api/venues/<int:pk>/events/', VenueViewSet.as_view({
+        'get': 'events'
+    }), name='venue-events'),
+
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     re_path(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     re_path(r'^redoc/$', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
@@ -5,18 +5,20 @@ from rest_framework.viewsets import ViewSet
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
 from drf_yasg.utils import swagger_auto_schema
 from .models import Venue
+from . import amenities, geo
 from events.models import Event
-from events.serializers import EventSerializer
-from rest_framework.pagination import PageNumberPagination
-from .serializers import VenueSerializer
+from events.views import event_list_validators
+from events.serializers import EventSerializer, EventReader
+from musicapp.pagination import StandardResultsSetPagination
+from .serializers import VenueSerializer, VenueReader
+from musicapp.prefetch import optimize
+from musicapp.response_cache import cached_response
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Lower
 from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.authentication import JWTAuthentication
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from musicapp.conditional import conditional, user_version
+from musicapp.single_flight import single_flight
 
 
 class VenueViewSet(ViewSet):
@@ -31,39 +33,66 @@ class VenueViewSet(ViewSet):
         return [permission() for permission in permission_classes]
 
     @swagger_auto_schema(
-        operation_summary="Retrieve a list of all venues with optional filtering.",
+        operation_summary="Retrieve a list of all venues with optional filtering, nearest first with ?near=.",
         responses={200: VenueSerializer(many=True)}
     )
+    @conditional(
+        lambda self, request: venue_list_validators(self.filtered(request)),
+        tags=('venue', 'user'), casefold=('city', 'country'),
+    )
+    @cached_response('venue', 'user', casefold=('city', 'country'))
     def list(self, request):
-        venues = Venue.objects.all()
-        city = request.query_params.get('city', None)
+        reader = VenueReader(request)
+        paginator = StandardResultsSetPagination()
+        point = geo.point_params(request)
+        if point is None:
+            rows = paginator.paginate_queryset(reader.rows(self.filtered(request)), request)
+            return paginator.get_paginated_response(reader.render(rows))
+
+        # Nearest first, the page is ranked in Python and then read by primary key
+        page = paginator.paginate_queryset(geo.rank(self.filtered(request), *point), request)
+        rows = Venue.objects.filter(pk__in=[pk for _, pk in page]).values_list(*reader.lookups, 'pk')
+        rows = {row[-1]: row for row in rows}
+        items = reader.render([rows[pk] for _, pk in page])
+        for item, (distance, _) in zip(items, page):
+            item['distance_km'] = round(distance, 3)
+        return paginator.get_paginated_response(items)
+
+    def filtered(self, request):
+        venues = Venue.objects.order_by('pk')
+        point = geo.point_params(request)
+        if point:
+            venues = geo.candidates(venues, *point)
+
+        # Compared lowercased so the Lower(city)/Lower(country) indexes apply
+        city = request.query_params.get('city', '').strip()
         if city:
-            venues = venues.filter(city__iexact=city)
+            venues = venues.alias(city_lower=Lower('city')).filter(city_lower=city.lower())
 
-        country = request.query_params.get('country', None)
+        country = request.query_params.get('country', '').strip()
         if country:
-            venues = venues.filter(country__iexact=country)
+            venues = venues.alias(country_lower=Lower('country')).filter(country_lower=country.lower())
 
         min_capacity = request.query_params.get('min_capacity', None)
         if min_capacity:
             venues = venues.filter(capacity__gte=min_capacity)
 
-        amenity = request.query_params.get('amenity', None)
-        if amenity:
-            venues = venues.filter(amenities__contains=[amenity])
-
-        paginator = StandardResultsSetPagination()
-        result_page = paginator.paginate_queryset(venues, request)
-        serializer = VenueSerializer(result_page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        # ?amenity=wifi,parking (or repeated) wants all of them, ?amenity_match=any wants one
+        wanted = [name for value in request.query_params.getlist('amenity') for name in value.split(',')]
+        if wanted:
+            match_all = request.query_params.get('amenity_match', 'all') != 'any'
+            venues = amenities.having(venues, wanted, match_all)
+        return venues
 
     @swagger_auto_schema(
         operation_summary="Retrieve details of a specific venue.",
         responses={200: VenueSerializer()}
     )
+    @conditional(lambda self, request, pk=None: venue_validators(pk))
+    @single_flight
     def retrieve(self, request, pk=None):
-        venue = get_object_or_404(Venue, pk=pk)
-        serializer = VenueSerializer(venue)
+        venue = get_object_or_404(optimize(Venue.objects.all(), VenueSerializer, request), pk=pk)
+        serializer = VenueSerializer(venue, context={'request': request})
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -84,7 +113,7 @@ class VenueViewSet(ViewSet):
         responses={200: VenueSerializer()}
     )
     def update(self, request, pk=None):
-        venue = get_object_or_404(Venue, pk=pk)
+        venue = get_object_or_404(optimize(Venue.objects.all(), VenueSerializer), pk=pk)
         if venue.owner != request.user and not request.user.is_staff:
             return Response(
                 {"error": "You do not have permission to perform this action."},
@@ -103,7 +132,7 @@ class VenueViewSet(ViewSet):
         responses={200: VenueSerializer()}
     )
     def partial_update(self, request, pk=None):
-        venue = get_object_or_404(Venue, pk=pk)
+        venue = get_object_or_404(optimize(Venue.objects.all(), VenueSerializer), pk=pk)
 
         # Check if user is owner or admin
         if venue.owner != request.user and not request.user.is_staff:
@@ -140,9 +169,20 @@ class VenueViewSet(ViewSet):
         responses={200: EventSerializer(many=True)}
     )
     @action(detail=True, methods=['get'])
+    @conditional(
+        lambda self, request, pk=None: event_list_validators(self.venue_events(request, pk)),
+        tags=('event', 'artist', 'venue', 'user'),
+    )
+    @cached_response('event', 'artist', 'venue', 'user')
     def events(self, request, pk=None):
-        venue = get_object_or_404(Venue, pk=pk)
-        events = Event.objects.filter(venue=venue)
+        get_object_or_404(Venue, pk=pk)
+        reader = EventReader(request)
+        paginator = StandardResultsSetPagination()
+        rows = paginator.paginate_queryset(reader.rows(self.venue_events(request, pk)), request)
+        return paginator.get_paginated_response(reader.render(rows))
+
+    def venue_events(self, request, pk):
+        events = Event.objects.filter(venue_id=pk).order_by('date_time', 'pk')
         status = request.query_params.get('status', None)
         if status:
             events = events.filter(status=status)
@@ -150,8 +190,14 @@ class VenueViewSet(ViewSet):
         date = request.query_params.get('date', None)
         if date:
             events = events.filter(date_time__date=date)
+        return events
 
-        paginator = StandardResultsSetPagination()
-        result_page = paginator.paginate_queryset(events, request)
-        serializer = EventSerializer(result_page, many=True)
-        return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
+
+def venue_validators(pk):
+    version = Venue.objects.filter(pk=pk).values_list('version', flat=True).first()
+    return None if version is None else ((version, user_version()), None)
+
+
+def venue_list_validators(venues):
+    totals = venues.aggregate(count=Count('pk'), last=Max('pk'), versions=Sum('version'))
+    return (sorted(totals.items()), user_version()), None